@@ -160,6 +160,10 @@ DATABASES = {
 # Classes used to implement DB routing behavior.
 DATABASE_ROUTERS = []
 
+# Database aliases that models with a Meta.shard_key are spread over. The
+# order matters: changing it moves rows to different shards.
+DATABASE_SHARDS = []
+
 # The email backend to use. For possible shortcuts see django.core.mail.
 # The default is to use the SMTP backend.
 # Third-party backends can be specified by providing a Python path
@@ -472,6 +476,9 @@ CACHES = {
 CACHE_MIDDLEWARE_KEY_PREFIX = ''
 CACHE_MIDDLEWARE_SECONDS = 600
 CACHE_MIDDLEWARE_ALIAS = 'default'
+CACHE_MIDDLEWARE_SINGLE_KEY = False
+CACHE_MIDDLEWARE_STALE_WHILE_REVALIDATE = 0
+CACHE_MIDDLEWARE_STALE_IF_ERROR = 0
 
 ####################
 # COMMENTS         #
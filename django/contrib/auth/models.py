@@ -84,6 +84,8 @@ class Permission(models.Model):
     def natural_key(self):
         return (self.codename,) + self.content_type.natural_key()
     natural_key.dependencies = ['contenttypes.contenttype']
+    natural_key.fields = ['codename', 'content_type__app_label',
+                          'content_type__model']
 
 
 class GroupManager(models.Manager):
@@ -125,6 +127,7 @@ class Group(models.Model):
 
     def natural_key(self):
         return (self.name,)
+    natural_key.fields = ['name']
 
 
 class UserManager(models.Manager):
@@ -263,6 +266,7 @@ class User(models.Model):
 
     def natural_key(self):
         return (self.username,)
+    natural_key.fields = ['username']
 
     def get_absolute_url(self):
         return "/users/%s/" % urllib.quote(smart_str(self.username))
@@ -19,7 +19,8 @@ from urlparse import parse_qsl
 from django.conf import settings
 from django.core import signals
 from django.core.cache.backends.base import (
-    InvalidCacheBackendError, CacheKeyWarning, BaseCache)
+    InvalidCacheBackendError, CacheKeyWarning, BaseCache, reset_request_stats,
+    send_request_stats)
 from django.core.exceptions import ImproperlyConfigured
 from django.utils import importlib
 
@@ -150,6 +151,9 @@ def get_cache(backend, **kwargs):
         })
 
     """
+    # The statistics of caches are aggregated by alias, or by backend for
+    # caches which aren't defined in settings, and key prefix.
+    name = backend
     try:
         if '://' in backend:
             # for backwards compatibility
@@ -168,6 +172,9 @@ def get_cache(backend, **kwargs):
         raise InvalidCacheBackendError(
             "Could not find backend '%s': %s" % (backend, e))
     cache = backend_cls(location, params)
+    if cache.key_prefix:
+        name = '%s:%s' % (name, cache.key_prefix)
+    cache.name = name
     # Some caches -- python-memcached in particular -- need to do a cleanup at the
     # end of a request cycle. If the cache provides a close() method, wire it up
     # here.
@@ -177,3 +184,6 @@ def get_cache(backend, **kwargs):
 
 cache = get_cache(DEFAULT_CACHE_ALIAS)
 
+signals.request_started.connect(reset_request_stats)
+signals.request_finished.connect(send_request_stats)
+
@@ -1,7 +1,14 @@
 "Base Cache class."
 
+import math
+import random
+import threading
+import time
 import warnings
+import zlib
 
+from django.core.cache.serializers import SERIALIZERS
+from django.core.signals import cache_stats
 from django.core.exceptions import ImproperlyConfigured, DjangoRuntimeWarning
 from django.utils.encoding import smart_str
 from django.utils.importlib import import_module
@@ -15,6 +22,11 @@ class CacheKeyWarning(DjangoRuntimeWarning):
 # Memcached does not accept keys longer than this.
 MEMCACHE_MAX_KEY_LENGTH = 250
 
+# How long get_or_set() waits for another process to compute a missing value
+# before computing it too, and how often it checks the cache meanwhile.
+GET_OR_SET_WAIT = 0.5
+GET_OR_SET_POLL_INTERVAL = 0.05
+
 def default_key_func(key, key_prefix, version):
     """
     Default function to generate keys.
@@ -40,6 +52,69 @@ def get_key_func(key_func):
             return getattr(key_func_module, key_func_name)
     return default_key_func
 
+def get_serializer(serializer):
+    """
+    Returns an instance of the serializer named by ``serializer``, one of the
+    keys of SERIALIZERS, a dotted path to a class or a class.
+    """
+    if serializer in SERIALIZERS:
+        serializer = SERIALIZERS[serializer]
+    elif isinstance(serializer, basestring):
+        try:
+            module_path, class_name = serializer.rsplit('.', 1)
+            serializer = getattr(import_module(module_path), class_name)
+        except (ValueError, ImportError, AttributeError), e:
+            raise ImproperlyConfigured("Could not find cache serializer '%s': %s"
+                                       % (serializer, e))
+    return serializer()
+
+# The OPTIONS of caches which control how values are serialized.
+SERIALIZATION_OPTIONS = ('SERIALIZER', 'COMPRESS_MIN_LENGTH', 'COMPRESS_LEVEL')
+
+# The first byte of the values stored by caches which compress large values.
+RAW_FLAG = '-'
+COMPRESSED_FLAG = 'z'
+
+# The operations timed and counted in the statistics of the caches.
+INSTRUMENTED_OPERATIONS = ('get', 'get_many', 'set', 'set_many', 'add',
+                           'delete', 'delete_many', 'incr', 'decr', '_cull')
+
+# Statistics of the caches since the process started, by cache name.
+_process_stats = {}
+
+# The statistics of the current request and the operations in progress, by
+# thread.
+_local = threading.local()
+
+_missing = object()
+
+def _new_stats():
+    return {'hits': 0, 'misses': 0, 'bytes_read': 0, 'bytes_written': 0,
+            'calls': {}, 'time': {}}
+
+def get_request_stats():
+    """
+    Returns the statistics of the caches used since the current request
+    started, by cache name.
+    """
+    stats = getattr(_local, 'request_stats', None)
+    if stats is None:
+        stats = _local.request_stats = {}
+    return stats
+
+def reset_request_stats(**kwargs):
+    _local.request_stats = {}
+
+def send_request_stats(**kwargs):
+    """
+    Sends the cache_stats signal with the statistics of the caches used by
+    the request which just finished.
+    """
+    stats = get_request_stats()
+    _local.request_stats = {}
+    if stats:
+        cache_stats.send(sender=None, stats=stats)
+
 class BaseCache(object):
     def __init__(self, params):
         timeout = params.get('timeout', params.get('TIMEOUT', 300))
@@ -62,10 +137,99 @@ class BaseCache(object):
         except (ValueError, TypeError):
             self._cull_frequency = 3
 
+        self._serializer = get_serializer(options.get('SERIALIZER', 'pickle'))
+        self._dumps_errors = tuple(getattr(self._serializer, 'dumps_errors', ()))
+        self._loads_errors = tuple(getattr(self._serializer, 'loads_errors', ()))
+        compress_min_length = options.get('COMPRESS_MIN_LENGTH')
+        try:
+            self._compress_min_length = int(compress_min_length)
+        except (ValueError, TypeError):
+            self._compress_min_length = None
+        self._compress_level = options.get('COMPRESS_LEVEL', 6)
+
         self.key_prefix = smart_str(params.get('KEY_PREFIX', ''))
         self.version = params.get('VERSION', 1)
         self.key_func = get_key_func(params.get('KEY_FUNCTION', None))
 
+        # The name of the statistics of the cache, set by get_cache().
+        self.name = '%s.%s' % (self.__class__.__module__, self.__class__.__name__)
+        for operation in INSTRUMENTED_OPERATIONS:
+            method = getattr(self, operation, None)
+            if method is not None:
+                setattr(self, operation, self._instrument(operation, method))
+
+    def _instrument(self, operation, method):
+        """
+        Returns ``method`` wrapped to time and count its calls, hits, misses
+        and the size of the values it reads and writes. Only the outermost
+        operation of a cache is counted when operations call each other,
+        except culls, which happen during writes.
+        """
+        def instrumented(*args, **kwargs):
+            operations = getattr(_local, 'operations', None)
+            if operations is None:
+                operations = _local.operations = {}
+            nested = id(self) in operations
+            if nested and operation != '_cull':
+                return method(*args, **kwargs)
+            counters = {'hits': 0, 'misses': 0, 'bytes_read': 0, 'bytes_written': 0}
+            if not nested:
+                operations[id(self)] = counters
+            start = time.time()
+            try:
+                if operation == 'get':
+                    return self._instrumented_get(method, counters, *args, **kwargs)
+                result = method(*args, **kwargs)
+                if operation == 'get_many':
+                    keys = kwargs.get('keys', args[0] if args else ())
+                    counters['hits'] = len(result)
+                    counters['misses'] = len(keys) - len(result)
+                return result
+            finally:
+                if not nested:
+                    del operations[id(self)]
+                self._record(operation, time.time() - start, counters)
+        instrumented.__name__ = method.__name__
+        instrumented.__doc__ = method.__doc__
+        return instrumented
+
+    def _instrumented_get(self, method, counters, key, default=None, version=None):
+        value = method(key, _missing, version=version)
+        if value is _missing:
+            counters['misses'] = 1
+            return default
+        counters['hits'] = 1
+        return value
+
+    def _record(self, operation, elapsed, counters):
+        request_stats = get_request_stats()
+        for all_stats in (_process_stats, request_stats):
+            stats = all_stats.get(self.name)
+            if stats is None:
+                stats = all_stats[self.name] = _new_stats()
+            for counter, value in counters.iteritems():
+                if value:
+                    stats[counter] += value
+            calls, times = stats['calls'], stats['time']
+            calls[operation] = calls.get(operation, 0) + 1
+            times[operation] = times.get(operation, 0) + elapsed
+
+    def _count_bytes(self, counter, data):
+        counters = getattr(_local, 'operations', {}).get(id(self))
+        if counters is not None:
+            counters[counter] += len(data)
+
+    def stats(self):
+        """
+        Returns the statistics of the caches named like this one since the
+        process started: the number of hits and misses, the size of the
+        values read and written (when the backend serializes them), and the
+        number of calls and the time spent by operation. The counters aren't
+        updated under a lock and may miss increments under concurrency.
+        """
+        stats = _process_stats.get(self.name, _new_stats())
+        return dict(stats, calls=dict(stats['calls']), time=dict(stats['time']))
+
     def make_key(self, key, version=None):
         """Constructs the key used by all other methods. By default it
         uses the key_func to generate a key (which, by default,
@@ -80,6 +244,35 @@ class BaseCache(object):
         new_key = self.key_func(key, self.key_prefix, version)
         return new_key
 
+    def _encode(self, value):
+        """
+        Returns ``value`` serialized and, if it's at least COMPRESS_MIN_LENGTH
+        bytes long, compressed. A flag is prepended to the data of the caches
+        which compress values.
+        """
+        data = self._serializer.dumps(value)
+        if self._compress_min_length is not None:
+            flag = RAW_FLAG
+            if len(data) >= self._compress_min_length:
+                compressed = zlib.compress(data, self._compress_level)
+                if len(compressed) < len(data):
+                    flag, data = COMPRESSED_FLAG, compressed
+            data = flag + data
+        self._count_bytes('bytes_written', data)
+        return data
+
+    def _decode(self, data):
+        """
+        Returns the value stored in ``data`` by _encode().
+        """
+        self._count_bytes('bytes_read', data)
+        if self._compress_min_length is not None:
+            if data[:1] == COMPRESSED_FLAG:
+                data = zlib.decompress(data[1:])
+            else:
+                data = data[1:]
+        return self._serializer.loads(data)
+
     def add(self, key, value, timeout=None, version=None):
         """
         Set a value in the cache if the key does not already exist. If
@@ -131,6 +324,56 @@ class BaseCache(object):
         """
         return self.get(key, version=version) is not None
 
+    def get_or_set(self, key, default, timeout=None, version=None, beta=1.0,
+                   lock_timeout=None, wait=GET_OR_SET_WAIT):
+        """
+        Fetch a given key from the cache. If the key does not exist, set it
+        to ``default``, or to the value returned by ``default`` if it's a
+        callable, and return that value.
+
+        To avoid a stampede of processes computing the same value when a
+        popular key expires, the value may be recomputed before it expires,
+        all the earlier as it took long to compute and ``beta`` is high
+        (probabilistic early expiration, ``beta=0`` disables it). Only the
+        process which adds a lock key, for ``lock_timeout`` seconds, calls
+        ``default``; the others return the current value, or wait up to
+        ``wait`` seconds for the new one before computing it themselves.
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        if lock_timeout is None:
+            lock_timeout = timeout
+        meta_key = '%s:meta' % key
+        lock_key = '%s:lock' % key
+        values = self.get_many([key, meta_key], version=version)
+        if key in values:
+            meta = values.get(meta_key)
+            if meta is None:
+                return values[key]
+            expires, delta = meta
+            if beta <= 0 or time.time() - delta * beta * math.log(1 - random.random()) < expires:
+                return values[key]
+        locked = self.add(lock_key, True, lock_timeout, version=version)
+        if not locked:
+            if key in values:
+                return values[key]
+            deadline = time.time() + wait
+            while time.time() < deadline:
+                time.sleep(GET_OR_SET_POLL_INTERVAL)
+                value = self.get(key, version=version)
+                if value is not None:
+                    return value
+        try:
+            start = time.time()
+            value = default() if callable(default) else default
+            delta = time.time() - start
+            self.set_many({key: value, meta_key: (start + delta + timeout, delta)},
+                          timeout, version=version)
+        finally:
+            if locked:
+                self.delete(lock_key, version=version)
+        return value
+
     def incr(self, key, delta=1, version=None):
         """
         Add delta to value in the cache. If the key does not exist, raise a
@@ -1,17 +1,21 @@
 "Database cache backend."
 import base64
+import random
 import time
 from datetime import datetime
 
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
-
 from django.conf import settings
 from django.core.cache.backends.base import BaseCache
 from django.db import connections, router, transaction, DatabaseError
 from django.utils import timezone
+from django.utils.encoding import force_unicode
+
+# Column types of the binary values of cache tables, by database vendor.
+BINARY_COLUMN_TYPES = {
+    'postgresql': 'bytea',
+    'mysql': 'longblob',
+}
+DEFAULT_BINARY_COLUMN_TYPE = 'BLOB'
 
 
 class Options(object):
@@ -51,48 +55,117 @@ class DatabaseCache(BaseDatabaseCache):
     # We work around this problem by always using naive datetimes when writing
     # expiration values, in UTC when USE_TZ = True and in local time otherwise.
 
+    def __init__(self, table, params):
+        BaseDatabaseCache.__init__(self, table, params)
+        options = params.get('OPTIONS', {})
+        cull_probability = params.get('cull_probability',
+                                      options.get('CULL_PROBABILITY', 0.01))
+        try:
+            self._cull_probability = float(cull_probability)
+        except (ValueError, TypeError):
+            self._cull_probability = 0.01
+        # Whether the cache table stores binary values, by database alias.
+        # Tables created before Django 1.5 store base64-encoded values in a
+        # text column named "value" instead of a binary column named "data".
+        self._binary_tables = {}
+
     def get(self, key, default=None, version=None):
         key = self.make_key(key, version=version)
         self.validate_key(key)
+        values = self._get_many([key])
+        return values.get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = dict((self.make_key(key, version=version), key) for key in keys)
+        for key in keys:
+            self.validate_key(key)
+        values = self._get_many(keys.keys())
+        return dict((keys[key], value) for key, value in values.iteritems())
+
+    def _get_many(self, keys):
+        """
+        Returns a dictionary mapping the given internal keys to their values,
+        and deletes the expired entries found along the way.
+        """
         db = router.db_for_read(self.cache_model_class)
-        table = connections[db].ops.quote_name(self._table)
-        cursor = connections[db].cursor()
+        connection = connections[db]
+        table = connection.ops.quote_name(self._table)
+        column = connection.ops.quote_name(self._value_column(db))
+        cursor = connection.cursor()
 
-        cursor.execute("SELECT cache_key, value, expires FROM %s "
-                       "WHERE cache_key = %%s" % table, [key])
-        row = cursor.fetchone()
-        if row is None:
-            return default
+        # The database returns the keys as unicode strings.
+        keys = dict((force_unicode(key), key) for key in keys)
+        rows = []
+        try:
+            for batch in self._batches(db, keys.keys()):
+                cursor.execute("SELECT cache_key, %s, expires FROM %s "
+                               "WHERE cache_key IN (%s)" %
+                               (column, table, ', '.join(['%s'] * len(batch))),
+                               batch)
+                rows.extend(cursor.fetchall())
+        except DatabaseError:
+            # The table may have been recreated with another value column.
+            self._binary_tables.pop(db, None)
+            raise
         now = timezone.now()
-        if row[2] < now:
-            db = router.db_for_write(self.cache_model_class)
-            cursor = connections[db].cursor()
-            cursor.execute("DELETE FROM %s "
-                           "WHERE cache_key = %%s" % table, [key])
-            transaction.commit_unless_managed(using=db)
-            return default
-        value = connections[db].ops.process_clob(row[1])
-        return pickle.loads(base64.decodestring(value))
+        values = {}
+        expired = []
+        for key, value, expires in rows:
+            key = keys[force_unicode(key)]
+            if expires < now:
+                expired.append(key)
+            else:
+                try:
+                    values[key] = self._from_db(connection, value)
+                except self._loads_errors:
+                    pass
+        if expired:
+            self._delete_many(expired)
+        return values
 
     def set(self, key, value, timeout=None, version=None):
         key = self.make_key(key, version=version)
         self.validate_key(key)
-        self._base_set('set', key, value, timeout)
+        self._base_set('set', {key: value}, timeout)
+
+    def set_many(self, data, timeout=None, version=None):
+        items = {}
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            items[key] = value
+        if items:
+            self._base_set('set', items, timeout)
 
     def add(self, key, value, timeout=None, version=None):
         key = self.make_key(key, version=version)
         self.validate_key(key)
-        return self._base_set('add', key, value, timeout)
+        return self._base_set('add', {key: value}, timeout)
 
-    def _base_set(self, mode, key, value, timeout=None):
+    def _base_set(self, mode, items, timeout=None):
+        """
+        Stores ``items``, a dictionary mapping internal keys to values, with
+        one query to find the existing entries per batch of keys and batched
+        UPDATE and INSERT statements.
+        """
         if timeout is None:
             timeout = self.default_timeout
         db = router.db_for_write(self.cache_model_class)
-        table = connections[db].ops.quote_name(self._table)
-        cursor = connections[db].cursor()
+        connection = connections[db]
+        table = connection.ops.quote_name(self._table)
+        column = connection.ops.quote_name(self._value_column(db))
+        cursor = connection.cursor()
+
+        # Values which can't be serialized aren't stored.
+        values = {}
+        for key, value in items.iteritems():
+            try:
+                values[force_unicode(key)] = self._to_db(connection, value)
+            except self._dumps_errors:
+                pass
+        if not values:
+            return False
 
-        cursor.execute("SELECT COUNT(*) FROM %s" % table)
-        num = cursor.fetchone()[0]
         now = timezone.now()
         now = now.replace(microsecond=0)
         if settings.USE_TZ:
@@ -100,40 +173,61 @@ class DatabaseCache(BaseDatabaseCache):
         else:
             exp = datetime.fromtimestamp(time.time() + timeout)
         exp = exp.replace(microsecond=0)
-        if num > self._max_entries:
+        exp = connection.ops.value_to_db_datetime(exp)
+        if random.random() < self._cull_probability:
             self._cull(db, cursor, now)
-        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
-        encoded = base64.encodestring(pickled).strip()
-        cursor.execute("SELECT cache_key, expires FROM %s "
-                       "WHERE cache_key = %%s" % table, [key])
         try:
-            result = cursor.fetchone()
-            if result and (mode == 'set' or
-                    (mode == 'add' and result[1] < now)):
-                cursor.execute("UPDATE %s SET value = %%s, expires = %%s "
-                               "WHERE cache_key = %%s" % table,
-                               [encoded, connections[db].ops.value_to_db_datetime(exp), key])
-            else:
-                cursor.execute("INSERT INTO %s (cache_key, value, expires) "
-                               "VALUES (%%s, %%s, %%s)" % table,
-                               [key, encoded, connections[db].ops.value_to_db_datetime(exp)])
+            existing = {}
+            for batch in self._batches(db, values.keys()):
+                cursor.execute("SELECT cache_key, expires FROM %s "
+                               "WHERE cache_key IN (%s)" %
+                               (table, ', '.join(['%s'] * len(batch))), batch)
+                existing.update((force_unicode(key), expires)
+                                for key, expires in cursor.fetchall())
+            updates = []
+            inserts = []
+            for key, value in values.iteritems():
+                if key not in existing:
+                    inserts.append((key, value, exp))
+                elif mode == 'set' or existing[key] < now:
+                    updates.append((value, exp, key))
+            if updates:
+                cursor.executemany("UPDATE %s SET %s = %%s, expires = %%s "
+                                   "WHERE cache_key = %%s" % (table, column),
+                                   updates)
+            if inserts:
+                cursor.executemany("INSERT INTO %s (cache_key, %s, expires) "
+                                   "VALUES (%%s, %%s, %%s)" % (table, column),
+                                   inserts)
         except DatabaseError:
             # To be threadsafe, updates/inserts are allowed to fail silently
             transaction.rollback_unless_managed(using=db)
+            self._binary_tables.pop(db, None)
             return False
         else:
             transaction.commit_unless_managed(using=db)
-            return True
+            return bool(updates or inserts)
 
     def delete(self, key, version=None):
         key = self.make_key(key, version=version)
         self.validate_key(key)
+        self._delete_many([key])
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        if keys:
+            self._delete_many(keys)
 
+    def _delete_many(self, keys):
         db = router.db_for_write(self.cache_model_class)
         table = connections[db].ops.quote_name(self._table)
         cursor = connections[db].cursor()
 
-        cursor.execute("DELETE FROM %s WHERE cache_key = %%s" % table, [key])
+        for batch in self._batches(db, keys):
+            cursor.execute("DELETE FROM %s WHERE cache_key IN (%s)" %
+                           (table, ', '.join(['%s'] * len(batch))), batch)
         transaction.commit_unless_managed(using=db)
 
     def has_key(self, key, version=None):
@@ -155,17 +249,23 @@ class DatabaseCache(BaseDatabaseCache):
         return cursor.fetchone() is not None
 
     def _cull(self, db, cursor, now):
-        if self._cull_frequency == 0:
-            self.clear()
-        else:
-            # When USE_TZ is True, 'now' will be an aware datetime in UTC.
-            now = now.replace(tzinfo=None)
-            table = connections[db].ops.quote_name(self._table)
-            cursor.execute("DELETE FROM %s WHERE expires < %%s" % table,
-                           [connections[db].ops.value_to_db_datetime(now)])
-            cursor.execute("SELECT COUNT(*) FROM %s" % table)
-            num = cursor.fetchone()[0]
-            if num > self._max_entries:
+        """
+        Removes the expired entries, then 1/CULL_FREQUENCY of the entries if
+        there are more than MAX_ENTRIES left. Writes only call it with a
+        probability of CULL_PROBABILITY, to avoid counting the entries every
+        time; MAX_ENTRIES is a soft limit as a consequence.
+        """
+        # When USE_TZ is True, 'now' will be an aware datetime in UTC.
+        now = now.replace(tzinfo=None)
+        table = connections[db].ops.quote_name(self._table)
+        cursor.execute("DELETE FROM %s WHERE expires < %%s" % table,
+                       [connections[db].ops.value_to_db_datetime(now)])
+        cursor.execute("SELECT COUNT(*) FROM %s" % table)
+        num = cursor.fetchone()[0]
+        if num > self._max_entries:
+            if self._cull_frequency == 0:
+                self.clear()
+            else:
                 cull_num = num / self._cull_frequency
                 if connections[db].vendor == 'oracle':
                     # Oracle doesn't support LIMIT + OFFSET
@@ -188,6 +288,46 @@ WHERE counter > %%s AND COUNTER <= %%s""" % table, [cull_num, cull_num + 1])
         cursor = connections[db].cursor()
         cursor.execute('DELETE FROM %s' % table)
 
+    def _batches(self, db, keys):
+        """
+        Splits ``keys`` in lists small enough to be used as query parameters.
+        """
+        batch_size = connections[db].features.max_query_params or 1000
+        keys = list(keys)
+        for i in range(0, len(keys), batch_size):
+            yield keys[i:i + batch_size]
+
+    def _value_column(self, db):
+        """
+        Returns the name of the column holding the values, which tells how
+        they are stored.
+        """
+        if db not in self._binary_tables:
+            connection = connections[db]
+            cursor = connection.cursor()
+            columns = connection.introspection.get_table_description(cursor, self._table)
+            self._binary_tables[db] = 'data' in [column[0].lower() for column in columns]
+        return 'data' if self._binary_tables[db] else 'value'
+
+    def _to_db(self, connection, value):
+        data = self._encode(value)
+        if self._binary_tables[connection.alias]:
+            # Third-party backends don't necessarily expose their driver.
+            Database = getattr(connection, 'Database', None)
+            if hasattr(Database, 'Binary'):
+                return Database.Binary(data)
+            return buffer(data)
+        return base64.encodestring(data).strip()
+
+    def _from_db(self, connection, value):
+        if not self._binary_tables[connection.alias]:
+            value = connection.ops.process_clob(value)
+            return self._decode(base64.decodestring(value))
+        if hasattr(value, 'read'):
+            # Oracle returns BLOBs as LOB objects.
+            value = value.read()
+        return self._decode(str(value))
+
 # For backwards compatibility
 class CacheClass(DatabaseCache):
     pass
@@ -3,7 +3,11 @@
 import hashlib
 import os
 import shutil
+import sqlite3
+import tempfile
+import threading
 import time
+from contextlib import contextmanager
 try:
     import cPickle as pickle
 except ImportError:
@@ -11,10 +15,69 @@ except ImportError:
 
 from django.core.cache.backends.base import BaseCache
 
+# The name of the SQLite database indexing the entries of a cache directory.
+INDEX_NAME = 'index.sqlite'
+# How long to wait for another process to release the index, in seconds.
+INDEX_TIMEOUT = 10
+# The number of reads after which a process records their access times in the
+# index, even if it doesn't write to the cache.
+MAX_PENDING_ACCESSES = 1000
+
+INDEX_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS entries (
+        path TEXT PRIMARY KEY,
+        expires REAL NOT NULL,
+        size INTEGER NOT NULL,
+        accessed REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)",
+    "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)",
+    """CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY,
+        entries INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+    BEGIN
+        UPDATE totals SET entries = entries + 1, size = size + new.size;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+    BEGIN
+        UPDATE totals SET entries = entries - 1, size = size - old.size;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+    BEGIN
+        UPDATE totals SET size = size - old.size + new.size;
+    END""",
+)
+
+# SQLite connections to the indexes, per thread and index path, along with the
+# id of the process that opened them.
+_connections = threading.local()
+# Access times of the entries read by this process and not yet recorded in the
+# index, per index path.
+_pending_accesses = {}
+
+
 class FileBasedCache(BaseCache):
+    """
+    Stores each entry in its own file, with its expiry time.
+
+    A SQLite database in the cache directory indexes the entries with their
+    size, expiry and last access times. It is updated in a transaction with
+    every write, so that the number of entries is known without scanning the
+    directory and culling removes the expired entries, then the least
+    recently used ones. Reads only touch the entry's file; their access times
+    are recorded in the index by the next write of the process.
+
+    Files are written to a temporary name and renamed, so that other
+    processes never read partially written entries.
+    """
     def __init__(self, dir, params):
         BaseCache.__init__(self, params)
         self._dir = dir
+        self._dir_prefix = os.path.join(self._dir, '')
+        self._index_path = os.path.join(self._dir, INDEX_NAME)
         if not os.path.exists(self._dir):
             self._createdir()
 
@@ -38,10 +101,14 @@ class FileBasedCache(BaseCache):
                 if exp < now:
                     self._delete(fname)
                 else:
-                    return pickle.load(f)
+                    value = self._decode(f.read())
+                    self._record_access(fname, now)
+                    return value
             finally:
                 f.close()
-        except (IOError, OSError, EOFError, pickle.PickleError):
+        except (IOError, OSError, EOFError, pickle.PickleError, sqlite3.Error):
+            pass
+        except self._loads_errors:
             pass
         return default
 
@@ -55,20 +122,33 @@ class FileBasedCache(BaseCache):
         if timeout is None:
             timeout = self.default_timeout
 
-        self._cull()
-
         try:
-            if not os.path.exists(dirname):
-                os.makedirs(dirname)
-
-            f = open(fname, 'wb')
+            # Recreates the cache directory if it has been removed.
+            self._connect()
+            now = time.time()
+            fd, tmp_name = tempfile.mkstemp(dir=self._dir, prefix='.tmp_')
+            renamed = False
             try:
-                now = time.time()
-                pickle.dump(now + timeout, f, pickle.HIGHEST_PROTOCOL)
-                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                f = os.fdopen(fd, 'wb')
+                try:
+                    pickle.dump(now + timeout, f, pickle.HIGHEST_PROTOCOL)
+                    f.write(self._encode(value))
+                    size = f.tell()
+                finally:
+                    f.close()
+                with self._index() as cursor:
+                    self._cull(cursor, fname)
+                    if not os.path.exists(dirname):
+                        os.makedirs(dirname)
+                    os.rename(tmp_name, fname)
+                    renamed = True
+                    self._index_entry(cursor, fname, now + timeout, size, now)
             finally:
-                f.close()
-        except (IOError, OSError):
+                if not renamed:
+                    os.unlink(tmp_name)
+        except (IOError, OSError, sqlite3.Error):
+            pass
+        except self._dumps_errors:
             pass
 
     def delete(self, key, version=None):
@@ -76,10 +156,19 @@ class FileBasedCache(BaseCache):
         self.validate_key(key)
         try:
             self._delete(self._key_to_file(key))
-        except (IOError, OSError):
+        except (IOError, OSError, sqlite3.Error):
             pass
 
     def _delete(self, fname):
+        with self._index() as cursor:
+            cursor.execute("DELETE FROM entries WHERE path = ?",
+                           (self._relative_path(fname),))
+            try:
+                self._remove_file(fname)
+            except (IOError, OSError):
+                pass
+
+    def _remove_file(self, fname):
         os.remove(fname)
         try:
             # Remove the 2 subdirs if they're empty
@@ -105,28 +194,41 @@ class FileBasedCache(BaseCache):
                     return True
             finally:
                 f.close()
-        except (IOError, OSError, EOFError, pickle.PickleError):
+        except (IOError, OSError, EOFError, pickle.PickleError, sqlite3.Error):
             return False
 
-    def _cull(self):
-        if int(self._num_entries) < self._max_entries:
+    def _cull(self, cursor, fname):
+        """
+        Makes room for the entry stored in ``fname`` if the cache is full, by
+        removing the expired entries, then the least recently used ones.
+        """
+        path = self._relative_path(fname)
+        cursor.execute("SELECT entries FROM totals")
+        num_entries = cursor.fetchone()[0]
+        if num_entries < self._max_entries:
             return
-
-        try:
-            filelist = sorted(os.listdir(self._dir))
-        except (IOError, OSError):
+        cursor.execute("SELECT 1 FROM entries WHERE path = ?", (path,))
+        if cursor.fetchone() is not None:
+            # Replacing an entry doesn't add one.
             return
 
         if self._cull_frequency == 0:
-            doomed = filelist
-        else:
-            doomed = [os.path.join(self._dir, k) for (i, k) in enumerate(filelist) if i % self._cull_frequency == 0]
-
-        for topdir in doomed:
+            self._clear(cursor)
+            return
+        count = max(num_entries // self._cull_frequency, 1)
+        cursor.execute("SELECT path FROM entries WHERE expires < ? AND path != ? "
+                       "LIMIT ?", (time.time(), path, count))
+        doomed = [row[0] for row in cursor.fetchall()]
+        if len(doomed) < count:
+            cursor.execute("SELECT path FROM entries WHERE expires >= ? "
+                           "AND path != ? ORDER BY accessed LIMIT ?",
+                           (time.time(), path, count - len(doomed)))
+            doomed.extend(row[0] for row in cursor.fetchall())
+        cursor.executemany("DELETE FROM entries WHERE path = ?",
+                           [(path,) for path in doomed])
+        for path in doomed:
             try:
-                for root, _, files in os.walk(topdir):
-                    for f in files:
-                        self._delete(os.path.join(root, f))
+                self._remove_file(os.path.join(self._dir, path))
             except (IOError, OSError):
                 pass
 
@@ -149,19 +251,124 @@ class FileBasedCache(BaseCache):
         path = os.path.join(path[:2], path[2:4], path[4:])
         return os.path.join(self._dir, path)
 
+    def _relative_path(self, fname):
+        return fname[len(self._dir_prefix):]
+
     def _get_num_entries(self):
-        count = 0
-        for _,_,files in os.walk(self._dir):
-            count += len(files)
-        return count
+        with self._index() as cursor:
+            cursor.execute("SELECT entries FROM totals")
+            return cursor.fetchone()[0]
     _num_entries = property(_get_num_entries)
 
     def clear(self):
         try:
-            shutil.rmtree(self._dir)
-        except (IOError, OSError):
+            with self._index() as cursor:
+                self._clear(cursor)
+        except (IOError, OSError, sqlite3.Error):
             pass
 
+    def _clear(self, cursor):
+        cursor.execute("DELETE FROM entries")
+        _pending_accesses.pop(self._index_path, None)
+        for name in os.listdir(self._dir):
+            path = os.path.join(self._dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _connect(self):
+        """
+        Returns the connection of the current thread to the index, creating
+        the index if it doesn't exist yet.
+        """
+        connections = getattr(_connections, 'connections', None)
+        if connections is None or _connections.pid != os.getpid():
+            # Connections inherited from a parent process can't be used.
+            connections = _connections.connections = {}
+            _connections.pid = os.getpid()
+        connection = connections.get(self._index_path)
+        if connection is not None and not os.path.exists(self._index_path):
+            # The cache directory was removed.
+            connection.close()
+            connection = None
+        if connection is None:
+            if not os.path.exists(self._dir):
+                self._createdir()
+            # Transactions are started explicitly, see _index().
+            connection = sqlite3.connect(self._index_path,
+                timeout=INDEX_TIMEOUT, isolation_level=None)
+            cursor = connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for sql in INDEX_SCHEMA:
+                    cursor.execute(sql)
+                cursor.execute("SELECT 1 FROM totals")
+                if cursor.fetchone() is None:
+                    cursor.execute("INSERT INTO totals VALUES (0, 0, 0)")
+                    self._index_files(cursor)
+            except:
+                cursor.execute("ROLLBACK")
+                connection.close()
+                raise
+            cursor.execute("COMMIT")
+            connections[self._index_path] = connection
+        return connection
+
+    @contextmanager
+    def _index(self):
+        """
+        Runs the enclosed block in a transaction on the index, which excludes
+        other writers until it ends. Pending access times are recorded first.
+        """
+        cursor = self._connect().cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            accesses = _pending_accesses.pop(self._index_path, None)
+            if accesses:
+                cursor.executemany("UPDATE entries SET accessed = ? WHERE path = ?",
+                                   [(accessed, path) for path, accessed in accesses.iteritems()])
+            yield cursor
+        except:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+    def _index_entry(self, cursor, fname, expires, size, accessed):
+        path = self._relative_path(fname)
+        cursor.execute("UPDATE entries SET expires = ?, size = ?, accessed = ? "
+                       "WHERE path = ?", (expires, size, accessed, path))
+        if not cursor.rowcount:
+            cursor.execute("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                           (path, expires, size, accessed))
+
+    def _index_files(self, cursor):
+        """
+        Adds the entries already stored in the directory, for instance by a
+        version of Django that didn't index them, to a new index.
+        """
+        for dirpath, dirnames, filenames in os.walk(self._dir):
+            if dirpath == self._dir:
+                # The index and temporary files.
+                continue
+            for name in filenames:
+                fname = os.path.join(dirpath, name)
+                try:
+                    f = open(fname, 'rb')
+                    try:
+                        expires = pickle.load(f)
+                    finally:
+                        f.close()
+                    stat = os.stat(fname)
+                except (IOError, OSError, EOFError, pickle.PickleError):
+                    continue
+                self._index_entry(cursor, fname, expires, stat.st_size, stat.st_mtime)
+
+    def _record_access(self, fname, now):
+        accesses = _pending_accesses.setdefault(self._index_path, {})
+        accesses[self._relative_path(fname)] = now
+        if len(accesses) >= MAX_PENDING_ACCESSES:
+            with self._index():
+                pass
+
 # For backwards compatibility
 class CacheClass(FileBasedCache):
     pass
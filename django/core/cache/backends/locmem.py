@@ -1,10 +1,7 @@
 "Thread-safe in-memory cache backend."
 
 import time
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
+from collections import deque
 
 from django.core.cache.backends.base import BaseCache
 from django.utils.synch import RWLock
@@ -13,14 +10,32 @@ from django.utils.synch import RWLock
 # multiple named local memory caches.
 _caches = {}
 _expire_info = {}
+_accessed = {}
+_order = {}
+_queued = {}
+_stats = {}
 _locks = {}
 
 class LocMemCache(BaseCache):
+    """
+    Entries are kept in insertion order and evicted with the CLOCK algorithm,
+    an approximation of LRU: reading an entry only sets its reference bit,
+    without taking the write lock, and culling gives referenced entries a
+    second chance by moving them to the end instead of evicting them.
+
+    The insertion order is kept in a deque of keys. Deleted keys stay in it
+    until the clock hand reaches them or the deque is compacted.
+    """
     def __init__(self, name, params):
         BaseCache.__init__(self, params)
-        global _caches, _expire_info, _locks
+        global _caches, _expire_info, _accessed, _order, _queued, _stats, _locks
         self._cache = _caches.setdefault(name, {})
         self._expire_info = _expire_info.setdefault(name, {})
+        self._accessed = _accessed.setdefault(name, set())
+        self._order = _order.setdefault(name, deque())
+        # The keys in self._order, deleted ones included.
+        self._queued = _queued.setdefault(name, set())
+        self._stats = _stats.setdefault(name, {'evictions': 0})
         self._lock = _locks.setdefault(name, RWLock())
 
     def add(self, key, value, timeout=None, version=None):
@@ -30,10 +45,10 @@ class LocMemCache(BaseCache):
             exp = self._expire_info.get(key)
             if exp is None or exp <= time.time():
                 try:
-                    pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                    pickled = self._encode(value)
                     self._set(key, pickled, timeout)
                     return True
-                except pickle.PickleError:
+                except self._dumps_errors:
                     pass
             return False
 
@@ -47,33 +62,46 @@ class LocMemCache(BaseCache):
             elif exp > time.time():
                 try:
                     pickled = self._cache[key]
-                    return pickle.loads(pickled)
-                except pickle.PickleError:
+                    # Adding to a set is atomic, the write lock isn't needed.
+                    self._accessed.add(key)
+                    return self._decode(pickled)
+                except self._loads_errors:
                     return default
         with self._lock.writer():
-            try:
-                del self._cache[key]
-                del self._expire_info[key]
-            except KeyError:
-                pass
+            self._delete(key)
             return default
 
     def _set(self, key, value, timeout=None):
-        if len(self._cache) >= self._max_entries:
+        if key in self._cache:
+            self._accessed.add(key)
+        elif len(self._cache) >= self._max_entries:
             self._cull()
         if timeout is None:
             timeout = self.default_timeout
         self._cache[key] = value
         self._expire_info[key] = time.time() + timeout
+        if key not in self._queued:
+            self._queued.add(key)
+            self._order.append(key)
+            if len(self._order) > 2 * self._max_entries:
+                self._compact()
+
+    def _compact(self):
+        # Drop the deleted keys from the insertion order.
+        order = [key for key in self._order if key in self._cache]
+        self._order.clear()
+        self._order.extend(order)
+        self._queued.clear()
+        self._queued.update(order)
 
     def set(self, key, value, timeout=None, version=None):
         key = self.make_key(key, version=version)
         self.validate_key(key)
         with self._lock.writer():
             try:
-                pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                pickled = self._encode(value)
                 self._set(key, pickled, timeout)
-            except pickle.PickleError:
+            except self._dumps_errors:
                 pass
 
     def incr(self, key, delta=1, version=None):
@@ -84,9 +112,9 @@ class LocMemCache(BaseCache):
         key = self.make_key(key, version=version)
         with self._lock.writer():
             try:
-                pickled = pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL)
+                pickled = self._encode(new_value)
                 self._cache[key] = pickled
-            except pickle.PickleError:
+            except self._dumps_errors:
                 pass
         return new_value
 
@@ -101,30 +129,38 @@ class LocMemCache(BaseCache):
                 return True
 
         with self._lock.writer():
-            try:
-                del self._cache[key]
-                del self._expire_info[key]
-            except KeyError:
-                pass
+            self._delete(key)
             return False
 
     def _cull(self):
         if self._cull_frequency == 0:
+            self._stats['evictions'] += len(self._cache)
             self.clear()
-        else:
-            doomed = [k for (i, k) in enumerate(self._cache) if i % self._cull_frequency == 0]
-            for k in doomed:
-                self._delete(k)
+            return
+        # Remove 1/CULL_FREQUENCY of the entries: expired entries and the
+        # unreferenced ones reached by the clock hand.
+        now = time.time()
+        count = max(len(self._cache) // self._cull_frequency, 1)
+        while count > 0 and self._order:
+            key = self._order.popleft()
+            if key not in self._cache:
+                # Deleted since it was queued.
+                self._queued.discard(key)
+                continue
+            if self._expire_info.get(key, 0) > now:
+                if key in self._accessed:
+                    self._accessed.discard(key)
+                    self._order.append(key)
+                    continue
+                self._stats['evictions'] += 1
+            self._queued.discard(key)
+            self._delete(key)
+            count -= 1
 
     def _delete(self, key):
-        try:
-            del self._cache[key]
-        except KeyError:
-            pass
-        try:
-            del self._expire_info[key]
-        except KeyError:
-            pass
+        self._cache.pop(key, None)
+        self._expire_info.pop(key, None)
+        self._accessed.discard(key)
 
     def delete(self, key, version=None):
         key = self.make_key(key, version=version)
@@ -135,6 +171,19 @@ class LocMemCache(BaseCache):
     def clear(self):
         self._cache.clear()
         self._expire_info.clear()
+        self._accessed.clear()
+        self._order.clear()
+        self._queued.clear()
+
+    def stats(self):
+        """
+        Adds the number of evictions since the process started and the
+        current number of entries of the memory store to the statistics.
+        """
+        stats = super(LocMemCache, self).stats()
+        stats['evictions'] = self._stats['evictions']
+        stats['entries'] = len(self._cache)
+        return stats
 
 # For backwards compatibility
 class CacheClass(LocMemCache):
@@ -1,17 +1,70 @@
 "Memcached cache backend"
 
+import bisect
+import hashlib
+import struct
 import time
 from threading import local
 
-from django.core.cache.backends.base import BaseCache, InvalidCacheBackendError
+from django.core.cache.backends.base import (BaseCache,
+    InvalidCacheBackendError, SERIALIZATION_OPTIONS)
+from django.core.cache.serializers import PickleSerializer
+from django.utils.encoding import smart_str
+
+# The OPTIONS of memcached caches which aren't passed to the library.
+DJANGO_OPTIONS = SERIALIZATION_OPTIONS + ('EJECT_TIMEOUT',)
+
+# The time when servers which failed will be used again, by server.
+_dead_servers = {}
+
+# Consistent hash rings, by tuple of servers.
+_rings = {}
+
+class ConsistentHashRing(object):
+    """
+    Maps keys to servers like libketama: each server is placed at 160 points
+    of a circle of 32 bit hashes, and a key belongs to the server at the first
+    point after the hash of the key. Adding or removing one of N servers only
+    moves about 1/N of the keys to other servers.
+    """
+    def __init__(self, servers):
+        points = []
+        for server in servers:
+            for i in range(40):
+                digest = hashlib.md5('%s-%d' % (server, i)).digest()
+                for j in range(4):
+                    points.append((_hash.unpack_from(digest, j * 4)[0], server))
+        points.sort()
+        self._hashes = [point for point, server in points]
+        self._servers = [server for point, server in points]
+
+    def get_server(self, key):
+        point = _hash.unpack_from(hashlib.md5(smart_str(key)).digest())[0]
+        return self._servers[bisect.bisect(self._hashes, point) % len(self._hashes)]
+
+_hash = struct.Struct('<I')
+
+def get_ring(servers):
+    ring = _rings.get(servers)
+    if ring is None:
+        ring = _rings[servers] = ConsistentHashRing(servers)
+    return ring
 
 class BaseMemcachedCache(BaseCache):
-    def __init__(self, server, params, library, value_not_found_exception):
+    """
+    Distributes keys over the servers with consistent hashing, with one
+    client of the library per server. Operations on several keys make one
+    call per server. A server which fails is ejected from the ring for
+    EJECT_TIMEOUT seconds, and its keys are moved to the other servers
+    meanwhile.
+    """
+    def __init__(self, server, params, library, value_not_found_exception,
+                 server_error_exception=()):
         super(BaseMemcachedCache, self).__init__(params)
         if isinstance(server, basestring):
-            self._servers = server.split(';')
+            self._servers = tuple(server.split(';'))
         else:
-            self._servers = server
+            self._servers = tuple(server)
 
         # The exception type to catch from the underlying library for a key
         # that was not found. This is a ValueError for python-memcache,
@@ -19,18 +72,99 @@ class BaseMemcachedCache(BaseCache):
         # raising an exception.
         self.LibraryValueNotFoundException = value_not_found_exception
 
+        # The exception type raised by the underlying library when a server
+        # fails. python-memcache doesn't raise exceptions, but marks the
+        # server as dead instead.
+        self.LibraryServerError = server_error_exception
+
         self._lib = library
         self._options = params.get('OPTIONS', None)
+        self._clients = {}
+
+        options = self._options or {}
+        eject_timeout = options.get('EJECT_TIMEOUT', 30)
+        try:
+            self._eject_timeout = int(eject_timeout)
+        except (ValueError, TypeError):
+            self._eject_timeout = 30
+
+        # The memcached libraries pickle values themselves; values are only
+        # serialized here when another serializer or compression is used.
+        self._serialize = (type(self._serializer) is not PickleSerializer or
+                           self._compress_min_length is not None)
+
+    def _to_memcache(self, value):
+        # Integers are stored as is to allow incrementing them.
+        if not self._serialize or (isinstance(value, (int, long)) and
+                                    not isinstance(value, bool)):
+            return value
+        return self._encode(value)
+
+    def _from_memcache(self, value):
+        if self._serialize and isinstance(value, str):
+            return self._decode(value)
+        return value
+
+    def _client(self, server):
+        """
+        Returns the client of the library connected to ``server``.
+        """
+        client = self._clients.get(server)
+        if client is None:
+            client = self._clients[server] = self._lib.Client([server])
+        return client
 
-    @property
-    def _cache(self):
+    def _is_dead(self, client):
         """
-        Implements transparent thread-safe access to a memcached client.
+        Returns True if the library marked the server of ``client`` as dead.
         """
-        if getattr(self, '_client', None) is None:
-            self._client = self._lib.Client(self._servers)
+        # python-memcache marks the hosts it failed to reach as dead until
+        # they can be tried again.
+        return any(host.deaduntil > time.time() for host in client.servers)
 
-        return self._client
+    def _live_servers(self):
+        if not _dead_servers:
+            return self._servers
+        now = time.time()
+        servers = tuple(server for server in self._servers
+                        if _dead_servers.get(server, 0) <= now)
+        # If every server failed, try them all again.
+        return servers or self._servers
+
+    def _server(self, key, servers=None):
+        if servers is None:
+            servers = self._live_servers()
+        if len(servers) == 1:
+            return servers[0]
+        return get_ring(servers).get_server(key)
+
+    def _group(self, keys):
+        """
+        Returns a dictionary mapping servers to the keys they hold.
+        """
+        servers = self._live_servers()
+        groups = {}
+        for key in keys:
+            groups.setdefault(self._server(key, servers), []).append(key)
+        return groups
+
+    def _call(self, server, method, *args):
+        """
+        Calls ``method`` of the client of ``server`` with ``args``, and ejects
+        the server if it fails. Returns None when the server fails.
+        """
+        client = self._client(server)
+        try:
+            result = getattr(client, method)(*args)
+        except self.LibraryServerError, e:
+            if isinstance(e, self.LibraryValueNotFoundException):
+                raise
+            result = None
+            _dead_servers[server] = time.time() + self._eject_timeout
+        else:
+            if self._is_dead(client):
+                _dead_servers[server] = time.time() + self._eject_timeout
+        return result
 
     def _get_memcache_timeout(self, timeout):
         """
@@ -50,41 +184,57 @@ class BaseMemcachedCache(BaseCache):
 
     def add(self, key, value, timeout=0, version=None):
         key = self.make_key(key, version=version)
-        return self._cache.add(key, value, self._get_memcache_timeout(timeout))
+        try:
+            value = self._to_memcache(value)
+        except self._dumps_errors:
+            return False
+        return self._call(self._server(key), 'add', key, value,
+                          self._get_memcache_timeout(timeout))
 
     def get(self, key, default=None, version=None):
         key = self.make_key(key, version=version)
-        val = self._cache.get(key)
+        val = self._call(self._server(key), 'get', key)
         if val is None:
             return default
-        return val
+        try:
+            return self._from_memcache(val)
+        except self._loads_errors:
+            return default
 
     def set(self, key, value, timeout=0, version=None):
         key = self.make_key(key, version=version)
-        self._cache.set(key, value, self._get_memcache_timeout(timeout))
+        try:
+            value = self._to_memcache(value)
+        except self._dumps_errors:
+            return
+        self._call(self._server(key), 'set', key, value,
+                   self._get_memcache_timeout(timeout))
 
     def delete(self, key, version=None):
         key = self.make_key(key, version=version)
-        self._cache.delete(key)
+        self._call(self._server(key), 'delete', key)
 
     def get_many(self, keys, version=None):
-        new_keys = map(lambda x: self.make_key(x, version=version), keys)
-        ret = self._cache.get_multi(new_keys)
-        if ret:
-            _ = {}
-            m = dict(zip(new_keys, keys))
-            for k, v in ret.items():
-                _[m[k]] = v
-            ret = _
+        new_keys = dict((self.make_key(key, version=version), key) for key in keys)
+        ret = {}
+        for server, server_keys in self._group(new_keys).items():
+            values = self._call(server, 'get_multi', server_keys)
+            if values:
+                for k, v in values.items():
+                    try:
+                        ret[new_keys[k]] = self._from_memcache(v)
+                    except self._loads_errors:
+                        pass
         return ret
 
     def close(self, **kwargs):
-        self._cache.disconnect_all()
+        for client in self._clients.values():
+            client.disconnect_all()
 
     def incr(self, key, delta=1, version=None):
         key = self.make_key(key, version=version)
         try:
-            val = self._cache.incr(key, delta)
+            val = self._call(self._server(key), 'incr', key, delta)
 
         # python-memcache responds to incr on non-existent keys by
         # raising a ValueError, pylibmc by raising a pylibmc.NotFound
@@ -99,7 +249,7 @@ class BaseMemcachedCache(BaseCache):
     def decr(self, key, delta=1, version=None):
         key = self.make_key(key, version=version)
         try:
-            val = self._cache.decr(key, delta)
+            val = self._call(self._server(key), 'decr', key, delta)
 
         # python-memcache responds to incr on non-existent keys by
         # raising a ValueError, pylibmc by raising a pylibmc.NotFound
@@ -115,15 +265,23 @@ class BaseMemcachedCache(BaseCache):
         safe_data = {}
         for key, value in data.items():
             key = self.make_key(key, version=version)
-            safe_data[key] = value
-        self._cache.set_multi(safe_data, self._get_memcache_timeout(timeout))
+            try:
+                safe_data[key] = self._to_memcache(value)
+            except self._dumps_errors:
+                pass
+        timeout = self._get_memcache_timeout(timeout)
+        for server, keys in self._group(safe_data).items():
+            self._call(server, 'set_multi',
+                       dict((key, safe_data[key]) for key in keys), timeout)
 
     def delete_many(self, keys, version=None):
-        l = lambda x: self.make_key(x, version=version)
-        self._cache.delete_multi(map(l, keys))
+        keys = [self.make_key(key, version=version) for key in keys]
+        for server, server_keys in self._group(keys).items():
+            self._call(server, 'delete_multi', server_keys)
 
     def clear(self):
-        self._cache.flush_all()
+        for server in self._servers:
+            self._call(server, 'flush_all')
 
 class CacheClass(BaseMemcachedCache):
     def __init__(self, server, params):
@@ -157,21 +315,33 @@ class PyLibMCCache(BaseMemcachedCache):
         self._local = local()
         super(PyLibMCCache, self).__init__(server, params,
                                            library=pylibmc,
-                                           value_not_found_exception=pylibmc.NotFound)
+                                           value_not_found_exception=pylibmc.NotFound,
+                                           server_error_exception=pylibmc.Error)
 
-    @property
-    def _cache(self):
+    def _client(self, server):
         # PylibMC uses cache options as the 'behaviors' attribute.
         # It also needs to use threadlocals, because some versions of
         # PylibMC don't play well with the GIL.
-        client = getattr(self._local, 'client', None)
+        clients = getattr(self._local, 'clients', None)
+        if clients is None:
+            clients = self._local.clients = {}
+        client = clients.get(server)
         if client:
             return client
 
-        client = self._lib.Client(self._servers)
+        client = self._lib.Client([server])
         if self._options:
-            client.behaviors = self._options
+            client.behaviors = dict((name, value) for name, value in self._options.items()
+                                    if name not in DJANGO_OPTIONS)
 
-        self._local.client = client
+        clients[server] = client
 
         return client
+
+    def _is_dead(self, client):
+        # pylibmc raises exceptions when servers fail.
+        return False
+
+    def close(self, **kwargs):
+        for client in getattr(self._local, 'clients', {}).values():
+            client.disconnect_all()
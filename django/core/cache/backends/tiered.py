@@ -0,0 +1,197 @@
+"Two-tier cache backend: a local-memory cache in front of a shared cache."
+
+import time
+
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# The key of the shared cache incremented on every write, which tells the
+# other processes to clear their local-memory cache.
+GENERATION_KEY = 'django.core.cache.backends.tiered.generation'
+GENERATION_TIMEOUT = 30 * 24 * 3600
+
+# Generation of the shared cache last seen by this process, and when to check
+# it again, by local-memory cache name.
+_generations = {}
+
+def raw_key_func(key, key_prefix, version):
+    """
+    Key function of the local-memory and shared caches, which get keys
+    already made by the tiered cache.
+    """
+    return key
+
+class TieredCache(BaseCache):
+    """
+    Reads values from a small local-memory cache first and from the cache
+    named by LOCATION on misses. Writes go through to the shared cache and
+    increment its generation key; every process checks this key at most once
+    per CHECK_INTERVAL milliseconds and clears its local-memory cache when it
+    changed, so local values are stale for CHECK_INTERVAL milliseconds at
+    most after a write, and L1_TIMEOUT seconds at most in any case.
+    """
+    def __init__(self, location, params):
+        BaseCache.__init__(self, params)
+        options = params.get('OPTIONS', {})
+        l1_timeout = options.get('L1_TIMEOUT', 5)
+        try:
+            self._l1_timeout = int(l1_timeout)
+        except (ValueError, TypeError):
+            self._l1_timeout = 5
+        check_interval = options.get('CHECK_INTERVAL', 1000)
+        try:
+            self._check_interval = float(check_interval) / 1000
+        except (ValueError, TypeError):
+            self._check_interval = 1.0
+
+        self._location = location
+        self._l2_cache = None
+        # The keys are made by this cache, with its prefix, version and key
+        # function, and used as is by the local-memory and the shared caches.
+        name = 'tiered:%s' % location
+        self._l1 = LocMemCache(name, {
+            'TIMEOUT': self._l1_timeout,
+            'KEY_FUNCTION': raw_key_func,
+            'OPTIONS': {
+                'MAX_ENTRIES': self._max_entries,
+                'CULL_FREQUENCY': self._cull_frequency,
+            },
+        })
+        self._l1.name = name
+        self._generation = _generations.setdefault(name, {'value': None, 'next_check': 0})
+
+    @property
+    def _l2(self):
+        # The shared cache is loaded lazily to allow the tiered cache to be
+        # the default cache, loaded while django.core.cache is imported.
+        if self._l2_cache is None:
+            from django.core.cache import get_cache
+            self._l2_cache = get_cache(self._location, KEY_FUNCTION=raw_key_func)
+        return self._l2_cache
+
+    def _check_generation(self):
+        now = time.time()
+        if now < self._generation['next_check']:
+            return
+        generation = self._l2.get(GENERATION_KEY)
+        if generation != self._generation['value']:
+            self._l1.clear()
+            self._generation['value'] = generation
+        self._generation['next_check'] = now + self._check_interval
+
+    def _increment_generation(self):
+        try:
+            generation = self._l2.incr(GENERATION_KEY)
+        except ValueError:
+            # Start from the current time in milliseconds rather than zero,
+            # so that a generation key evicted from the shared cache doesn't
+            # take a value which other processes have already seen.
+            generation = int(time.time() * 1000)
+            if not self._l2.add(GENERATION_KEY, generation, GENERATION_TIMEOUT):
+                generation = self._l2.incr(GENERATION_KEY)
+        if self._generation['value'] is None or generation != self._generation['value'] + 1:
+            # Other processes wrote too; the local values may be stale.
+            self._l1.clear()
+        self._generation['value'] = generation
+        self._generation['next_check'] = time.time() + self._check_interval
+
+    def _local_timeout(self, timeout):
+        return min(timeout, self._l1_timeout)
+
+    def add(self, key, value, timeout=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if timeout is None:
+            timeout = self.default_timeout
+        if not self._l2.add(key, value, timeout):
+            return False
+        self._increment_generation()
+        self._l1.set(key, value, self._local_timeout(timeout))
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._check_generation()
+        value = self._l1.get(key)
+        if value is None:
+            value = self._l2.get(key)
+            if value is None:
+                return default
+            self._l1.set(key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = dict((self.make_key(key, version=version), key) for key in keys)
+        for key in keys:
+            self.validate_key(key)
+        self._check_generation()
+        values = {}
+        missing = []
+        for key, original_key in keys.items():
+            value = self._l1.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                values[original_key] = value
+        if missing:
+            for key, value in self._l2.get_many(missing).items():
+                self._l1.set(key, value)
+                values[keys[key]] = value
+        return values
+
+    def set(self, key, value, timeout=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if timeout is None:
+            timeout = self.default_timeout
+        self._l2.set(key, value, timeout)
+        self._increment_generation()
+        self._l1.set(key, value, self._local_timeout(timeout))
+
+    def set_many(self, data, timeout=None, version=None):
+        data = dict((self.make_key(key, version=version), value)
+                    for key, value in data.items())
+        for key in data:
+            self.validate_key(key)
+        if timeout is None:
+            timeout = self.default_timeout
+        self._l2.set_many(data, timeout)
+        self._increment_generation()
+        for key, value in data.items():
+            self._l1.set(key, value, self._local_timeout(timeout))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self._l2.incr(key, delta)
+        self._increment_generation()
+        self._l1.delete(key)
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._check_generation()
+        return self._l1.has_key(key) or self._l2.has_key(key)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._l2.delete(key)
+        self._increment_generation()
+        self._l1.delete(key)
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        self._l2.delete_many(keys)
+        self._increment_generation()
+        for key in keys:
+            self._l1.delete(key)
+
+    def clear(self):
+        self._l2.clear()
+        self._l1.clear()
+        self._increment_generation()
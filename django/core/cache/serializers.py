@@ -0,0 +1,74 @@
+"""
+Serializers of the values stored by the cache backends.
+
+A serializer is a class with a ``dumps()`` method, which turns a value into a
+bytestring, and a ``loads()`` method, which does the opposite. Its
+``dumps_errors`` attribute is the tuple of the exceptions ``dumps()`` raises
+for values that can't be stored, and its ``loads_errors`` attribute the tuple
+of those ``loads()`` raises for data that can't be read; the cache backends
+ignore those. The
+serializer of a cache is set by the ``SERIALIZER`` option, either as one of
+the names below or as the dotted path of a class.
+"""
+
+import marshal
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.utils import simplejson
+
+
+class PickleSerializer(object):
+    """
+    Stores any picklable value. This is the default serializer.
+    """
+    # Values which can't be pickled for other reasons, such as locks or
+    # open files, raise TypeError: that's a programming error.
+    dumps_errors = (pickle.PickleError,)
+    loads_errors = (pickle.PickleError, TypeError, ValueError, EOFError)
+
+    def dumps(self, value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        return pickle.loads(data)
+
+
+class MarshalSerializer(object):
+    """
+    Stores values made of the builtin types (numbers, strings, lists, tuples,
+    dicts and sets), faster than pickle.
+    """
+    dumps_errors = (ValueError,)
+    loads_errors = (ValueError, TypeError, EOFError)
+
+    def dumps(self, value):
+        return marshal.dumps(value, 2)
+
+    def loads(self, data):
+        return marshal.loads(data)
+
+
+class JSONSerializer(object):
+    """
+    Stores values which can be represented as JSON, readable by other
+    programs. Strings are returned as unicode strings and tuples as lists.
+    """
+    dumps_errors = (TypeError, ValueError)
+    loads_errors = (ValueError,)
+
+    def dumps(self, value):
+        return simplejson.dumps(value, separators=(',', ':'))
+
+    def loads(self, data):
+        return simplejson.loads(data)
+
+
+SERIALIZERS = {
+    'pickle': PickleSerializer,
+    'marshal': MarshalSerializer,
+    'json': JSONSerializer,
+}
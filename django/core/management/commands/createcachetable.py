@@ -1,10 +1,16 @@
 from optparse import make_option
 
-from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.cache.backends.db import (BaseDatabaseCache,
+    BINARY_COLUMN_TYPES, DEFAULT_BINARY_COLUMN_TYPE)
 from django.core.management.base import LabelCommand
 from django.db import connections, router, transaction, models, DEFAULT_DB_ALIAS
 from django.db.utils import DatabaseError
 
+class BinaryField(models.Field):
+    def db_type(self, connection):
+        return BINARY_COLUMN_TYPES.get(connection.vendor, DEFAULT_BINARY_COLUMN_TYPE)
+
+
 class Command(LabelCommand):
     help = "Creates the table needed to use the SQL cache backend."
     args = "<tablename>"
@@ -28,7 +34,7 @@ class Command(LabelCommand):
         fields = (
             # "key" is a reserved word in MySQL, so use "cache_key" instead.
             models.CharField(name='cache_key', max_length=255, unique=True, primary_key=True),
-            models.TextField(name='value'),
+            BinaryField(name='data'),
             models.DateTimeField(name='expires', db_index=True),
         )
         table_output = []
@@ -1,11 +1,17 @@
+import os
+from multiprocessing import Pool
+
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management.base import BaseCommand, CommandError
 from django.core import serializers
-from django.db import router, DEFAULT_DB_ALIAS
+from django.db import connections, router, DEFAULT_DB_ALIAS
 from django.utils.datastructures import SortedDict
 
 from optparse import make_option
 
+# The number of objects fetched per query by dumpdata.
+CHUNK_SIZE = 2000
+
 class Command(BaseCommand):
     option_list = BaseCommand.option_list + (
         make_option('--format', default='json', dest='format',
@@ -21,6 +27,11 @@ class Command(BaseCommand):
             help='Use natural keys if they are available.'),
         make_option('-a', '--all', action='store_true', dest='use_base_manager', default=False,
             help="Use Django's base manager to dump all models stored in the database, including those that would otherwise be filtered or modified by a custom manager."),
+        make_option('--parallel', dest='parallel', type='int', default=0,
+            help='Dumps the models concurrently with this many processes, '
+                'into one fixture per model in the directory given by --output-dir.'),
+        make_option('--output-dir', dest='output_dir', default=None,
+            help='The directory in which --parallel writes the fixtures.'),
     )
     help = ("Output the contents of the database as a fixture of the given "
             "format (using each model's default manager unless --all is "
@@ -37,6 +48,12 @@ class Command(BaseCommand):
         show_traceback = options.get('traceback')
         use_natural_keys = options.get('use_natural_keys')
         use_base_manager = options.get('use_base_manager')
+        parallel = options.get('parallel')
+        output_dir = options.get('output_dir')
+        verbosity = int(options.get('verbosity', 1))
+
+        if parallel and not output_dir:
+            raise CommandError("--parallel requires --output-dir.")
 
         excluded_apps = set()
         excluded_models = set()
@@ -97,24 +114,129 @@ class Command(BaseCommand):
         except KeyError:
             raise CommandError("Unknown serialization format: %s" % format)
 
-        # Now collate the objects to be serialized.
-        objects = []
-        for model in sort_dependencies(app_list.items()):
-            if model in excluded_models:
-                continue
-            if not model._meta.proxy and router.allow_syncdb(using, model):
-                if use_base_manager:
-                    objects.extend(model._base_manager.using(using).all())
-                else:
-                    objects.extend(model._default_manager.using(using).all())
+        def get_models():
+            for model in sort_dependencies(app_list.items()):
+                if model in excluded_models:
+                    continue
+                if not model._meta.proxy and router.allow_syncdb(using, model):
+                    yield model
+
+        if parallel:
+            self.dump_parallel(list(get_models()), parallel, output_dir,
+                format, using, verbosity, show_traceback, indent=indent,
+                use_natural_keys=use_natural_keys,
+                use_base_manager=use_base_manager)
+            return
+
+        def get_objects():
+            # Collate the objects to be serialized. They are fetched lazily
+            # and written as they come, so that dumping large tables doesn't
+            # need all of their rows in memory at once.
+            for model in get_models():
+                queryset = get_queryset(model, using, use_base_manager)
+                for obj in iterate_queryset(queryset):
+                    yield obj
+
+        try:
+            serializers.serialize(format, get_objects(), indent=indent,
+                        use_natural_keys=use_natural_keys, stream=self.stdout)
+        except Exception, e:
+            if show_traceback:
+                raise
+            raise CommandError("Unable to serialize database: %s" % e)
 
+    def dump_parallel(self, models, processes, output_dir, format, using,
+                      verbosity, show_traceback, **options):
+        """
+        Dumps each model in ``models`` to its own fixture in ``output_dir``,
+        named after the model, with a pool of ``processes`` processes.
+        """
+        if not os.path.isdir(output_dir):
+            raise CommandError("Output directory doesn't exist: %s" % output_dir)
+        tasks = []
+        for model in models:
+            file_name = '%s.%s.%s' % (model._meta.app_label,
+                                      model._meta.object_name.lower(), format)
+            tasks.append((model._meta.app_label, model._meta.object_name,
+                          os.path.join(output_dir, file_name), format, using,
+                          options))
+        connection = connections[using]
         try:
-            return serializers.serialize(format, objects, indent=indent,
-                        use_natural_keys=use_natural_keys)
+            if connection.settings_dict['NAME'] == ':memory:':
+                # Other processes can't see an in-memory database.
+                counts = map(dump_model, tasks)
+            else:
+                # Don't let the workers share the connection of this process.
+                connection.close()
+                pool = Pool(processes)
+                try:
+                    counts = pool.map(dump_model, tasks)
+                finally:
+                    pool.close()
+                    pool.join()
         except Exception, e:
             if show_traceback:
                 raise
             raise CommandError("Unable to serialize database: %s" % e)
+        if verbosity >= 2:
+            for task, count in zip(tasks, counts):
+                if count:
+                    self.stdout.write("Dumped %d %s.%s object(s) to %s\n" % (
+                        count, task[0], task[1], task[2]))
+
+def get_queryset(model, using, use_base_manager):
+    if use_base_manager:
+        return model._base_manager.using(using).all()
+    return model._default_manager.using(using).all()
+
+def dump_model(task):
+    """
+    Writes the objects of one model to a fixture and returns their number.
+    No fixture is left behind for a model without objects, since loaddata
+    treats an empty fixture as an error.
+    """
+    from django.db.models import get_model
+
+    app_label, object_name, path, format, using, options = task
+    options = options.copy()
+    model = get_model(app_label, object_name)
+    queryset = get_queryset(model, using, options.pop('use_base_manager'))
+    count = [0]
+    def get_objects():
+        for obj in iterate_queryset(queryset):
+            count[0] += 1
+            yield obj
+    with open(path, 'wb') as stream:
+        serializers.serialize(format, get_objects(), stream=stream, **options)
+    if not count[0]:
+        os.remove(path)
+    return count[0]
+
+def iterate_queryset(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Iterates over ``queryset`` without caching its results.
+
+    Unless the queryset has an explicit or default ordering, which must be
+    kept, the rows are fetched in chunks of ``chunk_size`` in primary key
+    order, so that only one chunk is held in memory at any time even if the
+    database adapter reads the whole result set of a query at once.
+    """
+    if queryset.ordered:
+        for obj in queryset.iterator():
+            yield obj
+        return
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        if last_pk is None:
+            chunk = list(queryset[:chunk_size])
+        else:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        for obj in chunk:
+            yield obj
+        if len(chunk) < chunk_size:
+            break
+        last_pk = chunk[-1].pk
 
 def sort_dependencies(app_list):
     """Sort a list of app,modellist pairs into a single list of models.
@@ -190,3 +312,38 @@ def sort_dependencies(app_list):
         model_dependencies = skipped
 
     return model_list
+
+def sort_dependency_levels(models):
+    """Sort models into levels that can be loaded concurrently.
+
+    Returns a list of levels. Each level is a list of groups of models that
+    only depend on models of the previous levels, through foreign keys,
+    many-to-many relations or natural key dependencies. Models caught in a
+    dependency cycle, and the models depending on them, are put in a single
+    group of the last level.
+    """
+    from django.db.models import get_model
+    models = list(models)
+    dependencies = {}
+    for model in models:
+        deps = set()
+        if hasattr(model, 'natural_key'):
+            for d in getattr(model.natural_key, 'dependencies', []):
+                deps.add(get_model(*d.split('.')))
+        for field in model._meta.fields + model._meta.many_to_many:
+            if hasattr(field.rel, 'to'):
+                deps.add(field.rel.to._meta.concrete_model)
+        deps.discard(model)
+        dependencies[model] = deps.intersection(models)
+
+    levels = []
+    loaded = set()
+    while models:
+        level = [model for model in models if dependencies[model] <= loaded]
+        if not level:
+            levels.append([models])
+            break
+        levels.append([[model] for model in level])
+        loaded.update(level)
+        models = [model for model in models if model not in loaded]
+    return levels
@@ -2,6 +2,7 @@ import sys
 import os
 import gzip
 import zipfile
+from multiprocessing.pool import ThreadPool
 from optparse import make_option
 import traceback
 
@@ -9,9 +10,13 @@ from django.conf import settings
 from django.core import serializers
 from django.core.management.base import BaseCommand
 from django.core.management.color import no_style
+from django.core.management.commands.dumpdata import sort_dependency_levels
+from django.core.serializers.base import DeserializedObject
 from django.db import (connections, router, transaction, DEFAULT_DB_ALIAS,
       IntegrityError, DatabaseError)
-from django.db.models import get_apps
+from django.db.models import get_apps, signals, sql
+from django.dispatch.dispatcher import _make_id
+from django.utils.datastructures import SortedDict
 from itertools import product
 
 try:
@@ -20,6 +25,326 @@ try:
 except ImportError:
     has_bz2 = False
 
+# The number of objects of one model that --bulk buffers before inserting them.
+BULK_BUFFER_SIZE = 2000
+
+
+def save_object(obj, using):
+    try:
+        obj.save(using=using)
+    except (DatabaseError, IntegrityError), e:
+        msg = "Could not load %(app_label)s.%(object_name)s(pk=%(pk)s): %(error_msg)s" % {
+                'app_label': obj.object._meta.app_label,
+                'object_name': obj.object._meta.object_name,
+                'pk': obj.object.pk,
+                'error_msg': e
+            }
+        raise e.__class__, e.__class__(msg), sys.exc_info()[2]
+
+
+class BulkLoader(object):
+    """
+    Buffers deserialized objects per model and inserts them with multi-row
+    INSERT statements instead of one UPDATE-or-INSERT probe per object.
+
+    The objects are inserted raw and without sending any signals, so this is
+    only suitable for loading objects that don't exist in the database yet.
+    """
+    def __init__(self, using, buffer_size=BULK_BUFFER_SIZE):
+        self.using = using
+        self.buffer_size = buffer_size
+        self.connection = connections[using]
+        self.pending = {}
+        # Models whose tables have been written to, through tables included.
+        self.models = set()
+
+    def add(self, obj):
+        model = obj.object.__class__._meta.concrete_model
+        if obj.object.pk is None:
+            # Without a primary key the object can't be referenced by its
+            # m2m rows; save it the regular way.
+            obj.save(using=self.using)
+            return
+        pending = self.pending.setdefault(model, [])
+        pending.append(obj)
+        if len(pending) >= self.buffer_size:
+            self.flush_model(model)
+
+    def flush(self):
+        for model in self.pending.keys():
+            self.flush_model(model)
+
+    def flush_model(self, model):
+        objs = self.pending.pop(model, [])
+        if not objs:
+            return
+        try:
+            self.insert(model, [obj.object for obj in objs], model._meta.local_fields)
+            self.insert_m2m(model, objs)
+        except (DatabaseError, IntegrityError), e:
+            msg = "Could not load %(app_label)s.%(object_name)s(pk=%(first)s...%(last)s): %(error_msg)s" % {
+                    'app_label': model._meta.app_label,
+                    'object_name': model._meta.object_name,
+                    'first': objs[0].object.pk,
+                    'last': objs[-1].object.pk,
+                    'error_msg': e
+                }
+            raise e.__class__, e.__class__(msg), sys.exc_info()[2]
+
+    def insert(self, model, objs, fields):
+        self.models.add(model)
+        batch_size = max(self.connection.ops.bulk_batch_size(fields, objs), 1)
+        for i in range(0, len(objs), batch_size):
+            model._base_manager._insert(objs[i:i + batch_size], fields=fields,
+                                        using=self.using, raw=True)
+
+    def insert_m2m(self, model, objs):
+        for field in model._meta.many_to_many:
+            through = field.rel.through
+            # Generic relations have no intermediary model.
+            if through is None or not through._meta.auto_created:
+                continue
+            source = through._meta.get_field(field.m2m_field_name())
+            target = through._meta.get_field(field.m2m_reverse_field_name())
+            to_python = target.rel.to._meta.pk.to_python
+            rows = []
+            for obj in objs:
+                for value in (obj.m2m_data or {}).get(field.name, ()):
+                    rows.append(through(**{
+                        source.attname: obj.object.pk,
+                        target.attname: to_python(value),
+                    }))
+            if rows:
+                fields = [f for f in through._meta.local_fields if not f.primary_key]
+                self.insert(through, rows, fields)
+
+
+class FixtureCache(object):
+    """
+    Keeps the objects deserialized from fixture files in memory, so that
+    loading the same fixture again doesn't read and deserialize the file.
+    Entries are keyed by the path and format of the fixture and are discarded
+    when the modification time or the size of the file changes.
+
+    Fixtures whose objects refer to other objects by natural key aren't
+    cached, since resolving these keys depends on the content of the
+    database.
+    """
+    def __init__(self):
+        self.fixtures = {}
+
+    def stat(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def get(self, path, format):
+        """
+        Returns an iterator over fresh copies of the objects of the fixture,
+        or None if it isn't cached or has changed.
+        """
+        key = (os.path.abspath(path), format)
+        entry = self.fixtures.get(key)
+        if entry is None:
+            return None
+        stat, rows = entry
+        if stat != self.stat(path):
+            del self.fixtures[key]
+            return None
+        return (DeserializedObject(model(*values), m2m_data and dict(m2m_data))
+                for model, values, m2m_data in rows)
+
+    def record(self, path, format, objects):
+        """
+        Yields the deserialized ``objects`` and caches them once they have
+        all been read, unless the deserializer resolved natural keys.
+        """
+        stat = self.stat(path)
+        rows = []
+        for obj in objects:
+            if obj.resolved_natural_keys:
+                stat = rows = None
+            if stat is not None:
+                # Copy the values before the object is saved.
+                instance = obj.object
+                values = [getattr(instance, f.attname) for f in instance._meta.fields]
+                m2m_data = obj.m2m_data and dict(
+                    (name, list(pks)) for name, pks in obj.m2m_data.items())
+                rows.append((instance.__class__, values, m2m_data))
+            yield obj
+        if stat is not None:
+            self.fixtures[(os.path.abspath(path), format)] = (stat, rows)
+
+
+# The cache used by loaddata, if any. The test runner enables it in
+# django.test.utils.setup_test_environment().
+fixture_cache = None
+
+
+def _has_save_receivers(model):
+    if any(signal._live_receivers(_make_id(model))
+           for signal in (signals.pre_save, signals.post_save)):
+        return True
+    return any(signals.m2m_changed._live_receivers(_make_id(field.rel.through))
+               for field in model._meta.many_to_many
+               if field.rel.through is not None)
+
+
+def save_cached_objects(objs, using):
+    """
+    Saves objects replayed from the fixture cache. Objects that don't exist
+    in the database yet are inserted in batches, unless their model has
+    signal receivers that expect them to be saved one at a time.
+
+    Returns the models whose tables have been written to.
+    """
+    connection = connections[using]
+    batch_size = connection.features.max_query_params or 1000
+    loader = BulkLoader(using)
+    by_model = SortedDict()
+    for obj in objs:
+        by_model.setdefault(obj.object.__class__._meta.concrete_model, []).append(obj)
+    for model, objs in by_model.items():
+        pks = [obj.object.pk for obj in objs]
+        if (_has_save_receivers(model) or None in pks or
+                len(set(pks)) != len(pks)):
+            for obj in objs:
+                save_object(obj, using)
+            continue
+        existing = set()
+        manager = model._base_manager.using(using)
+        for i in range(0, len(pks), batch_size):
+            existing.update(manager.filter(pk__in=pks[i:i + batch_size])
+                                   .values_list('pk', flat=True))
+        for obj in objs:
+            if obj.object.pk in existing:
+                save_object(obj, using)
+            else:
+                loader.add(obj)
+    loader.flush()
+    return loader.models
+
+
+class ParallelLoader(object):
+    """
+    Collects deserialized objects per model, then loads the models level by
+    level in the order given by sort_dependency_levels(). The new objects of
+    the models of a level are inserted concurrently by up to ``workers``
+    threads, each with its own database connection and transaction. The
+    objects which already exist in the database are saved afterwards, in the
+    current thread and transaction.
+
+    The rows committed by the threads are recorded, so that undo() can delete
+    them if the load fails afterwards.
+    """
+    def __init__(self, using, workers, bulk=False):
+        self.using = using
+        self.workers = workers
+        self.bulk = bulk
+        self.objects = SortedDict()
+        self.existing = []
+        # The objects committed by the threads, by group of models.
+        self.committed = []
+        # Models whose tables have been written to, through tables included.
+        self.models = set()
+
+    def add(self, obj):
+        model = obj.object.__class__._meta.concrete_model
+        self.objects.setdefault(model, []).append(obj)
+
+    def load(self):
+        self.split_existing()
+        pool = ThreadPool(self.workers)
+        try:
+            for level in sort_dependency_levels(self.objects.keys()):
+                pool.map(self.load_models, level)
+        finally:
+            pool.close()
+            pool.join()
+        for obj in self.existing:
+            save_object(obj, self.using)
+
+    def split_existing(self):
+        """
+        Moves the objects whose primary key is already in the database to
+        self.existing, so that they're updated in the current transaction.
+        """
+        batch_size = connections[self.using].features.max_query_params or 1000
+        for model, objs in self.objects.items():
+            self.models.add(model)
+            pks = [obj.object.pk for obj in objs if obj.object.pk is not None]
+            existing = set()
+            manager = model._base_manager.using(self.using)
+            for i in range(0, len(pks), batch_size):
+                existing.update(manager.filter(pk__in=pks[i:i + batch_size])
+                                       .values_list('pk', flat=True))
+            if existing:
+                self.existing.extend(obj for obj in objs if obj.object.pk in existing)
+                self.objects[model] = [obj for obj in objs
+                                       if obj.object.pk not in existing]
+
+    def load_models(self, models):
+        # Each thread gets its own connection.
+        connection = connections[self.using]
+        transaction.enter_transaction_management(using=self.using)
+        transaction.managed(True, using=self.using)
+        try:
+            with connection.constraint_checks_disabled():
+                objs = self.save(models)
+        except Exception:
+            transaction.rollback(using=self.using)
+            raise
+        else:
+            transaction.commit(using=self.using)
+            self.committed.append(objs)
+        finally:
+            transaction.leave_transaction_management(using=self.using)
+            connection.close()
+
+    def save(self, models):
+        objs = []
+        for model in models:
+            objs.extend(self.objects.pop(model))
+        self.models.update(models)
+        if self.bulk:
+            loader = BulkLoader(self.using)
+            for obj in objs:
+                loader.add(obj)
+            loader.flush()
+            self.models.update(loader.models)
+        else:
+            for obj in objs:
+                save_object(obj, self.using)
+        return objs
+
+    def undo(self):
+        """
+        Deletes the rows committed by the threads, in the reverse order of
+        the levels, with the rows of their parent models and of their
+        many-to-many relations. Must be called in a transaction of the
+        current thread.
+        """
+        connection = connections[self.using]
+        with connection.constraint_checks_disabled():
+            for objs in reversed(self.committed):
+                pks = SortedDict()
+                for obj in objs:
+                    model = obj.object.__class__._meta.concrete_model
+                    pks.setdefault(model, []).append(obj.object.pk)
+                for model, model_pks in pks.items():
+                    for field in model._meta.many_to_many:
+                        through = field.rel.through
+                        if through is None or not through._meta.auto_created:
+                            continue
+                        source = through._meta.get_field(field.m2m_field_name())
+                        sql.DeleteQuery(through).delete_batch(model_pks, self.using, source)
+                    for parent in [model] + list(model._meta.get_parent_list()):
+                        sql.DeleteQuery(parent).delete_batch(model_pks, self.using)
+        self.committed = []
+
+
 class Command(BaseCommand):
     help = 'Installs the named fixture(s) in the database.'
     args = "fixture [fixture ...]"
@@ -28,6 +353,13 @@ class Command(BaseCommand):
         make_option('--database', action='store', dest='database',
             default=DEFAULT_DB_ALIAS, help='Nominates a specific database to load '
                 'fixtures into. Defaults to the "default" database.'),
+        make_option('--bulk', action='store_true', dest='bulk', default=False,
+            help='Inserts the objects with batched multi-row INSERTs instead of '
+                'saving them one at a time. Only use it to load objects that '
+                'don\'t exist in the database yet.'),
+        make_option('--parallel', action='store', dest='parallel', type='int',
+            default=0, help='Loads the models that don\'t depend on each other '
+                'concurrently, with up to this many database connections.'),
     )
 
     def handle(self, *fixture_labels, **options):
@@ -53,6 +385,18 @@ class Command(BaseCommand):
         # the transaction in place when loaddata was invoked.
         commit = options.get('commit', True)
 
+        bulk_loader = parallel_loader = None
+        parallel = options.get('parallel') or 0
+        # Other connections can't take part in the transaction of the caller,
+        # and SQLite only allows one writer at a time anyway. The objects are
+        # then saved as they're read, like without --parallel.
+        if not commit or connection.vendor == 'sqlite':
+            parallel = 0
+        if parallel > 1:
+            parallel_loader = ParallelLoader(using, parallel, options.get('bulk'))
+        elif options.get('bulk'):
+            bulk_loader = BulkLoader(using)
+
         # Keep a count of the installed objects and fixtures
         fixture_count = 0
         loaded_object_count = 0
@@ -78,11 +422,20 @@ class Command(BaseCommand):
                 zipfile.ZipFile.__init__(self, *args, **kwargs)
                 if settings.DEBUG:
                     assert len(self.namelist()) == 1, "Zip-compressed fixtures must contain only one file."
-            def read(self):
-                return zipfile.ZipFile.read(self, self.namelist()[0])
+                self.member = None
+            def read(self, size=-1):
+                # Open the member lazily and read it in pieces, so that large
+                # fixtures can be deserialized incrementally.
+                if self.member is None:
+                    self.member = self.open(self.namelist()[0])
+                return self.member.read(size)
+
+        def open_binary(name, mode):
+            # Avoid newline translation, which would break binary formats.
+            return open(name, mode + 'b')
 
         compression_types = {
-            None:   open,
+            None:   open_binary,
             'gz':   gzip.GzipFile,
             'zip':  SingleZipReader
         }
@@ -181,23 +534,37 @@ class Command(BaseCommand):
                                         self.stdout.write("Installing %s fixture '%s' from %s.\n" % \
                                             (format, fixture_name, humanize(fixture_dir)))
 
-                                    objects = serializers.deserialize(format, fixture, using=using)
+                                    objects = None
+                                    if fixture_cache is not None:
+                                        objects = fixture_cache.get(full_path, format)
+                                    cached_objects = [] if objects is not None else None
+                                    if objects is None:
+                                        # The objects are only saved once all the
+                                        # fixtures have been read in parallel, so
+                                        # natural keys couldn't be looked up.
+                                        objects = serializers.deserialize(format, fixture, using=using,
+                                            lookup_natural_keys=parallel_loader is None)
+                                        if fixture_cache is not None:
+                                            objects = fixture_cache.record(full_path, format, objects)
 
                                     for obj in objects:
                                         objects_in_fixture += 1
                                         if router.allow_syncdb(using, obj.object.__class__):
                                             loaded_objects_in_fixture += 1
                                             models.add(obj.object.__class__)
-                                            try:
-                                                obj.save(using=using)
-                                            except (DatabaseError, IntegrityError), e:
-                                                msg = "Could not load %(app_label)s.%(object_name)s(pk=%(pk)s): %(error_msg)s" % {
-                                                        'app_label': obj.object._meta.app_label,
-                                                        'object_name': obj.object._meta.object_name,
-                                                        'pk': obj.object.pk,
-                                                        'error_msg': e
-                                                    }
-                                                raise e.__class__, e.__class__(msg), sys.exc_info()[2]
+                                            if parallel_loader is not None:
+                                                parallel_loader.add(obj)
+                                            elif bulk_loader is not None:
+                                                bulk_loader.add(obj)
+                                            elif cached_objects is not None:
+                                                cached_objects.append(obj)
+                                            else:
+                                                save_object(obj, using)
+
+                                    if bulk_loader is not None:
+                                        bulk_loader.flush()
+                                    if cached_objects:
+                                        models.update(save_cached_objects(cached_objects, using))
 
                                     loaded_object_count += loaded_objects_in_fixture
                                     fixture_object_count += objects_in_fixture
@@ -216,8 +583,17 @@ class Command(BaseCommand):
                                         transaction.leave_transaction_management(using=using)
                                     return
 
+                if parallel_loader is not None:
+                    if verbosity >= 2:
+                        self.stdout.write("Loading objects with %d connection(s)\n" % parallel)
+                    parallel_loader.load()
+
             # Since we disabled constraint checks, we must manually check for
             # any invalid keys that might have been added
+            if bulk_loader is not None:
+                models.update(bulk_loader.models)
+            if parallel_loader is not None:
+                models.update(parallel_loader.models)
             table_names = [model._meta.db_table for model in models]
             connection.check_constraints(table_names=table_names)
 
@@ -226,6 +602,10 @@ class Command(BaseCommand):
         except Exception:
             if commit:
                 transaction.rollback(using=using)
+                if parallel_loader is not None:
+                    # Delete what the other connections committed.
+                    parallel_loader.undo()
+                    transaction.commit(using=using)
                 transaction.leave_transaction_management(using=using)
             if show_traceback:
                 traceback.print_exc()
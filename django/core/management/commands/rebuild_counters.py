@@ -0,0 +1,63 @@
+from optparse import make_option
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction, DEFAULT_DB_ALIAS
+from django.db.models import get_app, get_model, get_models
+from django.db.models.fields.counters import (CounterField,
+    get_counter_models, rebuild_counters)
+
+
+class Command(BaseCommand):
+    option_list = BaseCommand.option_list + (
+        make_option('--database', action='store', dest='database',
+            default=DEFAULT_DB_ALIAS, help='Nominates a specific database to '
+                'rebuild counters in. Defaults to the "default" database.'),
+    )
+    help = ("Recomputes the values of CounterFields from the related objects "
+            "in the database. Restricts the rebuild to the given apps or "
+            "models, if any.")
+    args = '[appname appname.ModelName ...]'
+
+    def handle(self, *app_labels, **options):
+        using = options.get('database')
+        verbosity = int(options.get('verbosity'))
+
+        if not app_labels:
+            models = get_counter_models()
+        else:
+            models = []
+            for label in app_labels:
+                try:
+                    app_label, model_label = label.split('.')
+                except ValueError:
+                    try:
+                        app = get_app(label)
+                    except ImproperlyConfigured:
+                        raise CommandError("Unknown application: %s" % label)
+                    models.extend(get_models(app))
+                else:
+                    model = get_model(app_label, model_label)
+                    if model is None:
+                        raise CommandError("Unknown model: %s.%s" % (app_label, model_label))
+                    models.append(model)
+            models = [model for model in models if any(
+                isinstance(f, CounterField) for f in model._meta.local_fields)]
+
+        transaction.commit_unless_managed(using=using)
+        transaction.enter_transaction_management(using=using)
+        transaction.managed(True, using=using)
+        try:
+            for model in models:
+                if not router.allow_syncdb(using, model):
+                    continue
+                if verbosity >= 2:
+                    self.stdout.write("Rebuilding counters of %s.%s\n" %
+                        (model._meta.app_label, model._meta.object_name))
+                rebuild_counters(model, using)
+        except Exception:
+            transaction.rollback(using=using)
+            transaction.leave_transaction_management(using=using)
+            raise
+        transaction.commit(using=using)
+        transaction.leave_transaction_management(using=using)
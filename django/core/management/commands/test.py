@@ -15,6 +15,19 @@ class Command(BaseCommand):
             action='store_true', dest='failfast', default=False,
             help='Tells Django to stop running the test suite after first '
                  'failed test.'),
+        make_option('--keepdb',
+            action='store_true', dest='keepdb', default=False,
+            help='Tells Django to keep the test database after the tests, '
+                 'and to reuse it on the next run if the models haven\'t '
+                 'changed.'),
+        make_option('--template',
+            action='store_true', dest='template', default=False,
+            help='Tells Django to keep the test database like --keepdb, '
+                 'and to run the tests on a fresh copy of it.'),
+        make_option('--parallel',
+            action='store', dest='parallel', type='int', default=0,
+            help='Tells Django to run the tests in this many processes, '
+                 'each with its own copy of the test databases.'),
         make_option('--testrunner',
             action='store', dest='testrunner',
             help='Tells Django to use specified test runner class instead of '
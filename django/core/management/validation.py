@@ -23,7 +23,7 @@ def get_validation_errors(outfile, app=None):
     from django.db import models, connection
     from django.db.models.loading import get_app_errors
     from django.db.models.fields.related import RelatedObject
-    from django.db.models.deletion import SET_NULL, SET_DEFAULT
+    from django.db.models.deletion import SET_NULL, SET_DEFAULT, DB_SET_NULL
 
     e = ModelErrorCollection(outfile)
 
@@ -98,6 +98,8 @@ def get_validation_errors(outfile, app=None):
                     for c in f.choices:
                         if not isinstance(c, (list, tuple)) or len(c) != 2:
                             e.add(opts, '"%s": "choices" should be a sequence of two-tuples.' % f.name)
+            if isinstance(f, models.CounterField) and f.get_relation() is None:
+                e.add(opts, '"%s": CounterField refers to "%s", which isn\'t a reverse foreign key relation of this model.' % (f.name, f.related_name))
             if f.db_index not in (None, True, False):
                 e.add(opts, '"%s": "db_index" should be either None, True or False.' % f.name)
 
@@ -108,6 +110,8 @@ def get_validation_errors(outfile, app=None):
             if f.rel and hasattr(f.rel, 'on_delete'):
                 if f.rel.on_delete == SET_NULL and not f.null:
                     e.add(opts, "'%s' specifies on_delete=SET_NULL, but cannot be null." % f.name)
+                elif f.rel.on_delete == DB_SET_NULL and not f.null:
+                    e.add(opts, "'%s' specifies on_delete=DB_SET_NULL, but cannot be null." % f.name)
                 elif f.rel.on_delete == SET_DEFAULT and not f.has_default():
                     e.add(opts, "'%s' specifies on_delete=SET_DEFAULT, but has no default value." % f.name)
 
@@ -294,6 +298,13 @@ def get_validation_errors(outfile, app=None):
                 except models.FieldDoesNotExist:
                     e.add(opts, '"ordering" refers to "%s", a field that doesn\'t exist.' % field_name)
 
+        # Check shard_key.
+        if opts.shard_key is not None:
+            try:
+                opts.get_field(opts.shard_key, many_to_many=False)
+            except models.FieldDoesNotExist:
+                e.add(opts, '"shard_key" refers to "%s", a field that doesn\'t exist.' % opts.shard_key)
+
         # Check unique_together.
         for ut in opts.unique_together:
             for field_name in ut:
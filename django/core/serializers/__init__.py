@@ -25,6 +25,7 @@ BUILTIN_SERIALIZERS = {
     "xml"    : "django.core.serializers.xml_serializer",
     "python" : "django.core.serializers.python",
     "json"   : "django.core.serializers.json",
+    "marshal": "django.core.serializers.marshal_serializer",
 }
 
 # Check for PyYaml and register the serializer if it's available.
@@ -146,11 +146,15 @@ class DeserializedObject(object):
     Call ``save()`` to save the object (with the many-to-many data) to the
     database; call ``save(save_m2m=False)`` to save just the object fields
     (and not touch the many-to-many stuff.)
+
+    ``resolved_natural_keys`` tells whether the deserializer looked up
+    related objects by natural key in the database to build the object.
     """
 
-    def __init__(self, obj, m2m_data=None):
+    def __init__(self, obj, m2m_data=None, resolved_natural_keys=False):
         self.object = obj
         self.m2m_data = m2m_data
+        self.resolved_natural_keys = resolved_natural_keys
 
     def __repr__(self):
         return "<DeserializedObject: %s.%s(pk=%s)>" % (
@@ -4,6 +4,7 @@ Serialize data to/from JSON
 
 import datetime
 import decimal
+import re
 from StringIO import StringIO
 
 from django.core.serializers.base import DeserializationError
@@ -18,27 +19,119 @@ class Serializer(PythonSerializer):
     """
     internal_use_only = False
 
-    def end_serialization(self):
+    def start_serialization(self):
         if simplejson.__version__.split('.') >= ['2', '1', '3']:
             # Use JS strings to represent Python Decimal instances (ticket #16850)
             self.options.update({'use_decimal': False})
-        simplejson.dump(self.objects, self.stream, cls=DjangoJSONEncoder, **self.options)
+        self._current = None
+        self._first = True
+        # Objects are written to the stream one at a time instead of being
+        # collected in a list, so find out how the encoder lays out a list
+        # with the current options to produce the same output.
+        self._start, self._separator, self._end = self._dumps([None, None]).split('null')
+        self._indent = self._start.partition('\n')[2]
+
+    def _dumps(self, value):
+        return simplejson.dumps(value, cls=DjangoJSONEncoder, **self.options)
+
+    def end_serialization(self):
+        if self._first:
+            self.stream.write(self._dumps([]))
+        else:
+            self.stream.write(self._end)
+
+    def end_object(self, obj):
+        data = self._dumps(self.get_dump_object(obj))
+        if self._indent:
+            data = data.replace('\n', '\n' + self._indent)
+        self.stream.write(self._first and self._start or self._separator)
+        self.stream.write(data)
+        self._first = False
+        self._current = None
 
     def getvalue(self):
         if callable(getattr(self.stream, 'getvalue', None)):
             return self.stream.getvalue()
 
 
+# The number of bytes read from the stream at a time by the Deserializer.
+READ_SIZE = 64 * 1024
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+
+
+def iterload(stream, read_size=READ_SIZE):
+    """
+    Decodes a JSON array read from ``stream`` and yields its items one at a
+    time, so that only one of them is held in memory at once.
+    """
+    decoder = simplejson.JSONDecoder()
+    buf = ''
+    eof = False
+
+    def read():
+        data = stream.read(read_size)
+        return data, not data
+
+    # Find the opening bracket.
+    while True:
+        data, eof = read()
+        buf += data
+        pos = _whitespace.match(buf).end()
+        if pos < len(buf) or eof:
+            break
+    if buf[pos:pos + 1] != '[':
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    first = expect_item = True
+    while True:
+        pos = _whitespace.match(buf, pos).end()
+        if pos == len(buf):
+            if eof:
+                raise ValueError("Unterminated JSON array")
+            data, eof = read()
+            buf = buf[pos:] + data
+            pos = 0
+            continue
+        if buf[pos] == ']' and (first or not expect_item):
+            return
+        if not expect_item:
+            if buf[pos] != ',':
+                raise ValueError("Expecting , delimiter")
+            pos += 1
+            expect_item = True
+            continue
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise
+            end = None
+        # An item that fails to decode, or reaches up to the end of the data
+        # read so far, may be cut off: read more and try again.
+        if end is None or (end == len(buf) and not eof):
+            data, eof = read()
+            buf = buf[pos:] + data
+            pos = 0
+            continue
+        yield obj
+        pos = end
+        first = expect_item = False
+
+
 def Deserializer(stream_or_string, **options):
     """
     Deserialize a stream or string of JSON data.
+
+    Objects are decoded and yielded one at a time, so streams of any size
+    can be deserialized in constant memory.
     """
     if isinstance(stream_or_string, basestring):
         stream = StringIO(stream_or_string)
     else:
         stream = stream_or_string
     try:
-        for obj in PythonDeserializer(simplejson.load(stream), **options):
+        for obj in PythonDeserializer(iterload(stream), **options):
             yield obj
     except GeneratorExit:
         raise
@@ -0,0 +1,280 @@
+"""
+A compact binary serializer based on the marshal module.
+
+Objects are stored in blocks of rows of the same model, column by column:
+each block holds the model label, the field names, the primary keys and one
+list of values per field. Blocks are marshalled and written one after the
+other, each prefixed by its length, after a header identifying the format
+and its version. Loading a fixture in this format is much faster than
+parsing JSON, XML or YAML.
+
+The data is written with version 2 of the marshal format, which is read
+the same way by every supported version of Python.
+"""
+
+import datetime
+import marshal
+import struct
+from StringIO import StringIO
+
+from django.conf import settings
+from django.core.serializers import base
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Serializer as PythonSerializer
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.core.serializers.python import _get_model
+from django.db import models
+from django.utils import timezone
+from django.utils.encoding import smart_unicode
+
+MAGIC = 'DJANGO-MARSHAL'
+VERSION = 1
+
+# The maximum number of objects stored in one block.
+BLOCK_SIZE = 1000
+
+# Types that are stored as is; other values are converted to strings.
+MARSHALLABLE_TYPES = (type(None), bool, int, long, float, str, unicode)
+
+_length = struct.Struct('>I')
+
+
+def _write_chunk(stream, data):
+    data = marshal.dumps(data, 2)
+    stream.write(_length.pack(len(data)))
+    stream.write(data)
+
+
+def _read_chunk(stream):
+    header = stream.read(_length.size)
+    if not header:
+        return None
+    if len(header) < _length.size:
+        raise DeserializationError("Truncated marshal fixture")
+    size = _length.unpack(header)[0]
+    data = stream.read(size)
+    if len(data) < size:
+        raise DeserializationError("Truncated marshal fixture")
+    return marshal.loads(data)
+
+
+def _encode_date(value):
+    if isinstance(value, datetime.datetime):
+        aware = timezone.is_aware(value)
+        if aware:
+            value = value.astimezone(timezone.utc)
+        return ('datetime', value.year, value.month, value.day, value.hour,
+                value.minute, value.second, value.microsecond, aware)
+    if isinstance(value, datetime.date):
+        return ('date', value.year, value.month, value.day)
+    if isinstance(value, datetime.time) and not timezone.is_aware(value):
+        return ('time', value.hour, value.minute, value.second, value.microsecond)
+    return None
+
+
+def _decode_date(value):
+    kind = value[0]
+    if kind == 'datetime':
+        tzinfo = value[8] and timezone.utc or None
+        return datetime.datetime(*value[1:8], tzinfo=tzinfo)
+    if kind == 'date':
+        return datetime.date(*value[1:])
+    if kind == 'time':
+        return datetime.time(*value[1:])
+    raise DeserializationError("Unknown value type %r" % kind)
+
+
+def _marshallable(value):
+    """
+    Converts the values marshal doesn't support, such as dates or decimals in
+    primary and foreign keys, to strings.
+    """
+    if isinstance(value, MARSHALLABLE_TYPES):
+        return value
+    if isinstance(value, dict):
+        return dict((k, _marshallable(v)) for k, v in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        return type(value)(_marshallable(v) for v in value)
+    return smart_unicode(value)
+
+
+class Serializer(PythonSerializer):
+    """
+    Convert a queryset to the binary marshal format.
+    """
+    internal_use_only = False
+
+    def start_serialization(self):
+        super(Serializer, self).start_serialization()
+        _write_chunk(self.stream, (MAGIC, VERSION))
+        self._block = None
+
+    def handle_field(self, obj, field):
+        super(Serializer, self).handle_field(obj, field)
+        value = self._current[field.name]
+        if not isinstance(value, MARSHALLABLE_TYPES):
+            # Dates and times are stored as tagged tuples, which are much
+            # faster to read back than strings. Other values, such as
+            # decimals, are stored as strings.
+            value = _encode_date(value)
+            if value is None:
+                value = field.value_to_string(obj)
+            self._current[field.name] = value
+
+    def get_dump_object(self, obj):
+        return _marshallable(super(Serializer, self).get_dump_object(obj))
+
+    def end_object(self, obj):
+        data = self.get_dump_object(obj)
+        names = tuple(data["fields"])
+        block = self._block
+        if (block is None or block[0] != data["model"] or block[1] != names
+                or len(block[2]) >= BLOCK_SIZE):
+            self._write_block()
+            block = self._block = (data["model"], names, [], [[] for name in names])
+        block[2].append(data["pk"])
+        for column, name in zip(block[3], names):
+            column.append(data["fields"][name])
+        self._current = None
+
+    def end_serialization(self):
+        self._write_block()
+
+    def _write_block(self):
+        if self._block is not None:
+            _write_chunk(self.stream, self._block)
+            self._block = None
+
+    def getvalue(self):
+        if callable(getattr(self.stream, 'getvalue', None)):
+            return self.stream.getvalue()
+
+
+def _iter_blocks(stream):
+    header = _read_chunk(stream)
+    if not isinstance(header, tuple) or len(header) != 2 or header[0] != MAGIC:
+        raise DeserializationError("Not a marshal fixture")
+    version = header[1]
+    if version != VERSION:
+        raise DeserializationError("Unsupported marshal fixture version %r" % version)
+    while True:
+        block = _read_chunk(stream)
+        if block is None:
+            return
+        yield block
+
+
+def _iter_objects(stream):
+    """
+    Yields the objects stored in ``stream`` in the format used by the Python
+    serializer.
+    """
+    for block in _iter_blocks(stream):
+        for obj in _block_to_python(block):
+            yield obj
+
+
+def _is_date_field(field):
+    # DateTimeField is a subclass of DateField.
+    return isinstance(field, (models.DateField, models.TimeField))
+
+
+def _block_to_python(block):
+    model, names, pks, columns = block
+    # Only the values of date and time fields are tagged tuples; natural
+    # keys are tuples too.
+    opts = _get_model(model)._meta
+    date_names = set(name for name in names if _is_date_field(opts.get_field(name)))
+    for i, pk in enumerate(pks):
+        fields = {}
+        for name, column in zip(names, columns):
+            value = column[i]
+            if name in date_names and isinstance(value, tuple):
+                value = _decode_date(value)
+            fields[name] = value
+        yield {"model": model, "pk": pk, "fields": fields}
+
+
+def _decode(field, value, encoding):
+    if isinstance(value, str):
+        return smart_unicode(value, encoding, strings_only=True)
+    if isinstance(value, tuple) and _is_date_field(field):
+        return _decode_date(value)
+    return value
+
+
+def _is_natural_key(value):
+    return isinstance(value, (list, tuple))
+
+
+def _build_block(block, encoding):
+    """
+    Yields the deserialized objects stored in ``block`` column by column, or
+    returns None if the block refers to other objects by natural keys.
+    """
+    model, names, pks, columns = block
+    Model = _get_model(model)
+    opts = Model._meta
+    values = {}
+    m2m_columns = []
+    for name, column in zip(names, columns):
+        field = opts.get_field(name)
+        if field.rel and isinstance(field.rel, models.ManyToManyRel):
+            if any(_is_natural_key(v) for pk_list in column for v in pk_list):
+                return None
+            to_python = field.rel.to._meta.pk.to_python
+            m2m_columns.append((field.name, [
+                [smart_unicode(to_python(v)) for v in pk_list] for pk_list in column]))
+            continue
+        if field.rel and isinstance(field.rel, models.ManyToOneRel):
+            if any(_is_natural_key(v) for v in column):
+                return None
+            to_python = field.rel.to._meta.get_field(field.rel.field_name).to_python
+            values[field.attname] = [
+                v if v is None else to_python(v) for v in column]
+        else:
+            values[field.attname] = [field.to_python(_decode(field, v, encoding)) for v in column]
+    values[opts.pk.attname] = [opts.pk.to_python(pk) for pk in pks]
+
+    # Build the objects with positional arguments, which is faster; fields
+    # missing from the block get their default value.
+    fields = opts.fields
+    args_columns = [values.get(f.attname) for f in fields]
+    missing = [i for i, column in enumerate(args_columns) if column is None]
+    return _iter_block_objects(Model, fields, args_columns, missing, m2m_columns, len(pks))
+
+
+def _iter_block_objects(Model, fields, args_columns, missing, m2m_columns, count):
+    for i in xrange(count):
+        args = [column[i] if column is not None else None for column in args_columns]
+        for j in missing:
+            args[j] = fields[j].get_default()
+        m2m_data = dict((name, column[i]) for name, column in m2m_columns)
+        yield base.DeserializedObject(Model(*args), m2m_data)
+
+
+def Deserializer(stream_or_string, **options):
+    """
+    Deserialize a stream or string of marshal data.
+    """
+    if isinstance(stream_or_string, basestring):
+        stream = StringIO(stream_or_string)
+    else:
+        stream = stream_or_string
+    encoding = options.get("encoding", settings.DEFAULT_CHARSET)
+    try:
+        models.get_apps()
+        for block in _iter_blocks(stream):
+            objects = _build_block(block, encoding)
+            if objects is None:
+                # Natural keys are resolved by the Python deserializer.
+                objects = PythonDeserializer(_block_to_python(block), **options)
+            for obj in objects:
+                yield obj
+    except GeneratorExit:
+        raise
+    except DeserializationError:
+        raise
+    except Exception, e:
+        # Map to deserializer error
+        raise DeserializationError(e)
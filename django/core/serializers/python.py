@@ -4,9 +4,11 @@ and from basic Python data types (lists, dicts, strings, etc.). Useful as a basi
 other serializers.
 """
 
+import operator
+
 from django.conf import settings
 from django.core.serializers import base
-from django.db import models, DEFAULT_DB_ALIAS
+from django.db import connections, models, DEFAULT_DB_ALIAS
 from django.utils.encoding import smart_unicode, is_protected_type
 
 class Serializer(base.Serializer):
@@ -27,12 +29,15 @@ class Serializer(base.Serializer):
         self._current = {}
 
     def end_object(self, obj):
-        self.objects.append({
+        self.objects.append(self.get_dump_object(obj))
+        self._current = None
+
+    def get_dump_object(self, obj):
+        return {
             "model"  : smart_unicode(obj._meta),
             "pk"     : smart_unicode(obj._get_pk_val(), strings_only=True),
             "fields" : self._current
-        })
-        self._current = None
+        }
 
     def handle_field(self, obj, field):
         value = field._get_val_from_obj(obj)
@@ -67,34 +72,160 @@ class Serializer(base.Serializer):
     def getvalue(self):
         return self.objects
 
+# The number of objects the Deserializer buffers to look up the natural keys
+# they refer to in batches.
+BUFFER_SIZE = 1000
+
 def Deserializer(object_list, **options):
     """
     Deserialize simple Python objects back into Django ORM instances.
 
     It's expected that you pass the Python objects themselves (instead of a
-    stream or a string) to the constructor
+    stream or a string) to the constructor.
+
+    If the ``lookup_natural_keys`` option is False, objects which refer to
+    other objects by natural key raise DeserializationError instead.
     """
     db = options.pop('using', DEFAULT_DB_ALIAS)
+    lookup_natural_keys = options.pop('lookup_natural_keys', True)
+    encoding = options.get("encoding", settings.DEFAULT_CHARSET)
     models.get_apps()
+    fields = {}
+    buffer = []
+    buffered_models = set()
     for d in object_list:
-        # Look up the model and starting build a dict of data for it.
         Model = _get_model(d["model"])
+        references = list(_natural_key_references(Model, d, fields))
+        if references and not lookup_natural_keys:
+            field, key = references[0]
+            raise base.DeserializationError(
+                u"Natural keys can't be looked up, but an object refers to "
+                u"%s %r by natural key" % (smart_unicode(field.rel.to._meta), key))
+        # Natural keys are looked up when the buffer is flushed, so they can
+        # only refer to objects that have been yielded (and saved) already.
+        targets = set(field.rel.to for field, key in references)
+        if buffer and (len(buffer) >= BUFFER_SIZE or
+                       _overlap(targets, buffered_models)):
+            for obj in _build_objects(buffer, db, encoding, fields):
+                yield obj
+            buffer = []
+            buffered_models = set()
+        buffer.append((Model, d, references))
+        buffered_models.add(Model)
+    for obj in _build_objects(buffer, db, encoding, fields):
+        yield obj
+
+def _get_field(Model, field_name, fields):
+    """
+    Returns the field called ``field_name`` of ``Model``, cached in the
+    ``fields`` dictionary.
+    """
+    try:
+        return fields[Model, field_name]
+    except KeyError:
+        field = fields[Model, field_name] = Model._meta.get_field(field_name)
+        return field
+
+def _has_natural_key(model):
+    return hasattr(model._default_manager, 'get_by_natural_key')
+
+def _natural_key_references(Model, d, fields):
+    """
+    Yields (field, natural key) for each natural key the serialized object
+    ``d`` uses to refer to other objects.
+    """
+    for (field_name, field_value) in d["fields"].iteritems():
+        field = _get_field(Model, field_name, fields)
+        if not field.rel or not _has_natural_key(field.rel.to):
+            continue
+        if isinstance(field.rel, models.ManyToManyRel):
+            for value in field_value:
+                if hasattr(value, '__iter__'):
+                    yield field, tuple(value)
+        elif isinstance(field.rel, models.ManyToOneRel):
+            if hasattr(field_value, '__iter__'):
+                yield field, tuple(field_value)
+
+def _overlap(targets, buffered_models):
+    for target in targets:
+        for model in buffered_models:
+            if issubclass(model, target) or issubclass(target, model):
+                return True
+    return False
+
+def _normalize_key(key):
+    return tuple(smart_unicode(value) for value in key)
+
+def _resolve_natural_keys(Model, keys, attnames, db):
+    """
+    Looks up the objects of ``Model`` with the given natural keys and returns
+    a dictionary mapping each key to a dictionary of the objects' values for
+    ``attnames``.
+
+    If ``Model.natural_key`` has a ``fields`` attribute listing the lookups
+    that make up the natural key, the objects are fetched with one query per
+    batch of keys. Keys that can't be found that way are resolved one at a
+    time with ``get_by_natural_key()``.
+    """
+    manager = Model._default_manager.db_manager(db)
+    lookups = list(getattr(getattr(Model, 'natural_key', None), 'fields', ()))
+    found = {}
+    if lookups:
+        batchable = [key for key in keys if len(key) == len(lookups)]
+        max_params = connections[db].features.max_query_params
+        batch_size = max_params and max(max_params // len(lookups), 1) or len(batchable)
+        for i in xrange(0, len(batchable), batch_size or 1):
+            batch = batchable[i:i + batch_size]
+            if len(lookups) == 1:
+                q = models.Q(**{'%s__in' % lookups[0]: [key[0] for key in batch]})
+            else:
+                q = reduce(operator.or_, [models.Q(**dict(zip(lookups, key))) for key in batch])
+            for row in manager.filter(q).values_list(*(lookups + attnames)):
+                found[_normalize_key(row[:len(lookups)])] = dict(zip(attnames, row[len(lookups):]))
+    resolved = {}
+    for key in keys:
+        values = found.get(_normalize_key(key))
+        if values is None:
+            obj = manager.get_by_natural_key(*key)
+            values = dict((attname, getattr(obj, attname)) for attname in attnames)
+        resolved[key] = values
+    return resolved
+
+def _build_objects(buffer, db, encoding, fields):
+    """
+    Resolves the natural keys referred to by the serialized objects in
+    ``buffer`` and yields the deserialized objects.
+    """
+    # Collect the natural keys to look up and the values needed from the
+    # objects they identify, per related model.
+    keys = {}
+    for Model, d, references in buffer:
+        for field, key in references:
+            model_keys, attnames = keys.setdefault(field.rel.to, (set(), set(['pk'])))
+            model_keys.add(key)
+            if isinstance(field.rel, models.ManyToOneRel):
+                attnames.add(field.rel.to._meta.get_field(field.rel.field_name).attname)
+    natural_keys = {}
+    for model, (model_keys, attnames) in keys.iteritems():
+        natural_keys[model] = _resolve_natural_keys(model, list(model_keys), list(attnames), db)
+
+    for Model, d, references in buffer:
         data = {Model._meta.pk.attname : Model._meta.pk.to_python(d["pk"])}
         m2m_data = {}
 
         # Handle each field
         for (field_name, field_value) in d["fields"].iteritems():
             if isinstance(field_value, str):
-                field_value = smart_unicode(field_value, options.get("encoding", settings.DEFAULT_CHARSET), strings_only=True)
+                field_value = smart_unicode(field_value, encoding, strings_only=True)
 
-            field = Model._meta.get_field(field_name)
+            field = _get_field(Model, field_name, fields)
 
             # Handle M2M relations
             if field.rel and isinstance(field.rel, models.ManyToManyRel):
-                if hasattr(field.rel.to._default_manager, 'get_by_natural_key'):
+                if _has_natural_key(field.rel.to):
                     def m2m_convert(value):
                         if hasattr(value, '__iter__'):
-                            return field.rel.to._default_manager.db_manager(db).get_by_natural_key(*value).pk
+                            return natural_keys[field.rel.to][tuple(value)]['pk']
                         else:
                             return smart_unicode(field.rel.to._meta.pk.to_python(value))
                 else:
@@ -104,19 +235,11 @@ def Deserializer(object_list, **options):
             # Handle FK fields
             elif field.rel and isinstance(field.rel, models.ManyToOneRel):
                 if field_value is not None:
-                    if hasattr(field.rel.to._default_manager, 'get_by_natural_key'):
-                        if hasattr(field_value, '__iter__'):
-                            obj = field.rel.to._default_manager.db_manager(db).get_by_natural_key(*field_value)
-                            value = getattr(obj, field.rel.field_name)
-                            # If this is a natural foreign key to an object that
-                            # has a FK/O2O as the foreign key, use the FK value
-                            if field.rel.to._meta.pk.rel:
-                                value = value.pk
-                        else:
-                            value = field.rel.to._meta.get_field(field.rel.field_name).to_python(field_value)
-                        data[field.attname] = value
+                    rel_field = field.rel.to._meta.get_field(field.rel.field_name)
+                    if _has_natural_key(field.rel.to) and hasattr(field_value, '__iter__'):
+                        data[field.attname] = natural_keys[field.rel.to][tuple(field_value)][rel_field.attname]
                     else:
-                        data[field.attname] = field.rel.to._meta.get_field(field.rel.field_name).to_python(field_value)
+                        data[field.attname] = rel_field.to_python(field_value)
                 else:
                     data[field.attname] = None
 
@@ -124,7 +247,8 @@ def Deserializer(object_list, **options):
             else:
                 data[field.name] = field.to_python(field_value)
 
-        yield base.DeserializedObject(Model(**data), m2m_data)
+        yield base.DeserializedObject(Model(**data), m2m_data,
+                                      resolved_natural_keys=bool(references))
 
 def _get_model(model_identifier):
     """
@@ -151,6 +151,7 @@ class Deserializer(base.Deserializer):
         super(Deserializer, self).__init__(stream_or_string, **options)
         self.event_stream = pulldom.parse(self.stream)
         self.db = options.pop('using', DEFAULT_DB_ALIAS)
+        self.lookup_natural_keys = options.pop('lookup_natural_keys', True)
 
     def next(self):
         for event, node in self.event_stream:
@@ -180,6 +181,9 @@ class Deserializer(base.Deserializer):
         # {m2m_accessor_attribute : [list_of_related_objects]})
         m2m_data = {}
 
+        # Set by the field handlers when they look up a natural key.
+        self._resolved_natural_keys = False
+
         # Deseralize each field.
         for field_node in node.getElementsByTagName("field"):
             # If the field is missing the name attribute, bail (are you
@@ -206,7 +210,8 @@ class Deserializer(base.Deserializer):
                 data[field.name] = value
 
         # Return a DeserializedObject so that the m2m data has a place to live.
-        return base.DeserializedObject(Model(**data), m2m_data)
+        return base.DeserializedObject(Model(**data), m2m_data,
+                                       resolved_natural_keys=self._resolved_natural_keys)
 
     def _handle_fk_field_node(self, node, field):
         """
@@ -221,7 +226,7 @@ class Deserializer(base.Deserializer):
                 if keys:
                     # If there are 'natural' subelements, it must be a natural key
                     field_value = [getInnerText(k).strip() for k in keys]
-                    obj = field.rel.to._default_manager.db_manager(self.db).get_by_natural_key(*field_value)
+                    obj = self._get_by_natural_key(field.rel.to, field_value)
                     obj_pk = getattr(obj, field.rel.field_name)
                     # If this is a natural foreign key to an object that
                     # has a FK/O2O as the foreign key, use the FK value
@@ -246,7 +251,7 @@ class Deserializer(base.Deserializer):
                 if keys:
                     # If there are 'natural' subelements, it must be a natural key
                     field_value = [getInnerText(k).strip() for k in keys]
-                    obj_pk = field.rel.to._default_manager.db_manager(self.db).get_by_natural_key(*field_value).pk
+                    obj_pk = self._get_by_natural_key(field.rel.to, field_value).pk
                 else:
                     # Otherwise, treat like a normal PK value.
                     obj_pk = field.rel.to._meta.pk.to_python(n.getAttribute('pk'))
@@ -255,6 +260,17 @@ class Deserializer(base.Deserializer):
             m2m_convert = lambda n: field.rel.to._meta.pk.to_python(n.getAttribute('pk'))
         return [m2m_convert(c) for c in node.getElementsByTagName("object")]
 
+    def _get_by_natural_key(self, model, key):
+        """
+        Looks up the object of ``model`` identified by the natural ``key``.
+        """
+        if not self.lookup_natural_keys:
+            raise base.DeserializationError(
+                u"Natural keys can't be looked up, but an object refers to "
+                u"%s %r by natural key" % (smart_unicode(model._meta), tuple(key)))
+        self._resolved_natural_keys = True
+        return model._default_manager.db_manager(self.db).get_by_natural_key(*key)
+
     def _get_model_from_node(self, node, attr):
         """
         Helper to look up a model from a <object model=...> or a <field
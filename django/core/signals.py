@@ -3,3 +3,4 @@ from django.dispatch import Signal
 request_started = Signal()
 request_finished = Signal()
 got_request_exception = Signal(providing_args=["request"])
+cache_stats = Signal(providing_args=["stats"])
@@ -264,6 +264,20 @@ class BaseDatabaseWrapper(object):
         if self.savepoint_state:
             self._savepoint_commit(sid)
 
+    def start_test_transaction(self):
+        """
+        Hook called when a TestCase class opens the transaction in which its
+        tests run, each inside a savepoint. Backends that only support
+        savepoints in some modes switch to one of them here.
+        """
+        pass
+
+    def end_test_transaction(self):
+        """
+        Undoes start_test_transaction(), rolling back the transaction.
+        """
+        pass
+
     @contextmanager
     def constraint_checks_disabled(self):
         disabled = self.disable_constraint_checking()
@@ -346,6 +360,9 @@ class BaseDatabaseFeatures(object):
     # Usually an indication that the test database is in-memory
     test_db_allows_multiple_connections = True
 
+    # Can the test database be copied with creation.clone_test_db()?
+    can_clone_databases = False
+
     # Can an object be saved without an explicit primary key?
     supports_unspecified_pk = False
 
@@ -385,6 +402,10 @@ class BaseDatabaseFeatures(object):
     # Is there a 1000 item limit on query parameters?
     supports_1000_query_parameters = True
 
+    # Maximum number of parameters a single query may bind, or None if the
+    # backend does not impose a limit.
+    max_query_params = None
+
     # Can an object have a primary key of 0? MySQL says No.
     allows_primary_key_0 = True
 
@@ -392,6 +413,10 @@ class BaseDatabaseFeatures(object):
     # deferred
     can_defer_constraint_checks = False
 
+    # Does the database carry out ON DELETE actions of foreign key
+    # constraints (so DB_CASCADE and DB_SET_NULL needn't be emulated)?
+    supports_foreign_key_actions = True
+
     # date_interval_sql can properly handle mixed Date/DateTime fields and timedeltas
     supports_mixed_date_datetime_comparisons = True
 
@@ -612,6 +637,17 @@ class BaseDatabaseOperations(object):
         """
         return "%s"
 
+    def bulk_batch_size(self, fields, objs):
+        """
+        Returns the maximum allowed batch size for the backend. The fields
+        are the fields going to be inserted in the batch, the objs contains
+        all the objects to be inserted.
+        """
+        max_params = self.connection.features.max_query_params
+        if max_params and fields:
+            return max_params // len(fields)
+        return len(objs)
+
     def max_in_list_size(self):
         """
         Returns the maximum number of items that can be passed in a single 'IN'
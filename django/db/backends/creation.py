@@ -1,13 +1,19 @@
+import hashlib
 import sys
 import time
 
 from django.conf import settings
 from django.db.utils import load_backend
+from django.utils.encoding import smart_str
 
 # The prefix to put on the default database name when creating
 # the test database.
 TEST_DATABASE_PREFIX = 'test_'
 
+# The table in which a kept test database records the fingerprint of the
+# schema it was created with.
+TEST_FINGERPRINT_TABLE = 'django_test_fingerprint'
+
 
 class BaseDatabaseCreation(object):
     """
@@ -114,6 +120,7 @@ class BaseDatabaseCreation(object):
                 style.SQL_TABLE(qn(field.rel.to._meta.db_table)) + ' (' +
                 style.SQL_FIELD(qn(field.rel.to._meta.get_field(
                     field.rel.field_name).column)) + ')' +
+                self.sql_for_on_delete(field, style) +
                 self.connection.ops.deferrable_sql()
             ]
             pending = False
@@ -125,6 +132,17 @@ class BaseDatabaseCreation(object):
 
         return output, pending
 
+    def sql_for_on_delete(self, field, style):
+        """
+        Returns the ON DELETE clause of the foreign key constraint for a field
+        whose on_delete behavior is carried out by the database (DB_CASCADE
+        or DB_SET_NULL), or an empty string.
+        """
+        action = getattr(field.rel.on_delete, 'db_on_delete', None)
+        if action is None:
+            return ''
+        return ' ' + style.SQL_KEYWORD('ON DELETE %s' % action)
+
     def sql_for_pending_references(self, model, style, pending_references):
         """
         Returns any ALTER TABLE statements to add constraints after the fact.
@@ -148,10 +166,11 @@ class BaseDatabaseCreation(object):
                 r_name = '%s_refs_%s_%s' % (
                     r_col, col, self._digest(r_table, table))
                 final_output.append(style.SQL_KEYWORD('ALTER TABLE') +
-                    ' %s ADD CONSTRAINT %s FOREIGN KEY (%s) REFERENCES %s (%s)%s;' %
+                    ' %s ADD CONSTRAINT %s FOREIGN KEY (%s) REFERENCES %s (%s)%s%s;' %
                     (qn(r_table), qn(truncate_name(
                         r_name, self.connection.ops.max_name_length())),
                     qn(r_col), qn(table), qn(col),
+                    self.sql_for_on_delete(f, style),
                     self.connection.ops.deferrable_sql()))
             del pending_references[model]
         return final_output
@@ -236,24 +255,43 @@ class BaseDatabaseCreation(object):
         del references_to_delete[model]
         return output
 
-    def create_test_db(self, verbosity=1, autoclobber=False):
+    def create_test_db(self, verbosity=1, autoclobber=False, keepdb=False):
         """
         Creates a test database, prompting the user for confirmation if the
         database already exists. Returns the name of the test database created.
+
+        If ``keepdb`` is True, an existing test database created for the same
+        schema is reused instead, and only flushed.
         """
         # Don't import django.core.management if it isn't needed.
         from django.core.management import call_command
 
         test_database_name = self._get_test_db_name()
+        self._old_database_name = self.connection.settings_dict["NAME"]
+
+        fingerprint = None
+        reuse = False
+        if keepdb and test_database_name != ':memory:':
+            fingerprint = self.test_db_fingerprint()
+            kept_fingerprint = self._get_test_db_fingerprint(test_database_name)
+            reuse = kept_fingerprint == fingerprint
+            if kept_fingerprint is not None and not reuse and verbosity >= 1:
+                print ("The models have changed since the test database for "
+                       "alias '%s' was kept." % self.connection.alias)
+            # A test database for an outdated schema is recreated without
+            # asking.
+            autoclobber = True
 
         if verbosity >= 1:
             test_db_repr = ''
             if verbosity >= 2:
                 test_db_repr = " ('%s')" % test_database_name
-            print "Creating test database for alias '%s'%s..." % (
-                self.connection.alias, test_db_repr)
+            action = reuse and 'Using existing' or 'Creating'
+            print "%s test database for alias '%s'%s..." % (
+                action, self.connection.alias, test_db_repr)
 
-        self._create_test_db(verbosity, autoclobber)
+        if not reuse:
+            self._create_test_db(verbosity, autoclobber)
 
         self.connection.close()
         self.connection.settings_dict["NAME"] = test_database_name
@@ -261,14 +299,15 @@ class BaseDatabaseCreation(object):
         # Confirm the feature set of the test database
         self.connection.features.confirm()
 
-        # Report syncdb messages at one level lower than that requested.
-        # This ensures we don't get flooded with messages during testing
-        # (unless you really ask to be flooded)
-        call_command('syncdb',
-            verbosity=max(verbosity - 1, 0),
-            interactive=False,
-            database=self.connection.alias,
-            load_initial_data=False)
+        if not reuse:
+            # Report syncdb messages at one level lower than that requested.
+            # This ensures we don't get flooded with messages during testing
+            # (unless you really ask to be flooded)
+            call_command('syncdb',
+                verbosity=max(verbosity - 1, 0),
+                interactive=False,
+                database=self.connection.alias,
+                load_initial_data=False)
 
         # We need to then do a flush to ensure that any data installed by
         # custom SQL has been removed. The only test data should come from
@@ -280,20 +319,85 @@ class BaseDatabaseCreation(object):
             interactive=False,
             database=self.connection.alias)
 
-        from django.core.cache import get_cache
-        from django.core.cache.backends.db import BaseDatabaseCache
-        for cache_alias in settings.CACHES:
-            cache = get_cache(cache_alias)
-            if isinstance(cache, BaseDatabaseCache):
-                call_command('createcachetable', cache._table,
+        if not reuse:
+            for table in self._get_cache_tables():
+                call_command('createcachetable', table,
                              database=self.connection.alias)
 
+        if fingerprint is not None and not reuse:
+            self._set_test_db_fingerprint(fingerprint)
+
         # Get a cursor (even though we don't need one yet). This has
         # the side effect of initializing the test database.
         self.connection.cursor()
 
         return test_database_name
 
+    def _get_cache_tables(self):
+        from django.core.cache import get_cache
+        from django.core.cache.backends.db import BaseDatabaseCache
+        tables = []
+        for cache_alias in settings.CACHES:
+            cache = get_cache(cache_alias)
+            if isinstance(cache, BaseDatabaseCache):
+                tables.append(cache._table)
+        return tables
+
+    def test_db_fingerprint(self):
+        """
+        Returns a hash of the SQL creating the tables of the installed
+        models, which changes whenever the schema of a test database would.
+        """
+        from django.core.management.color import no_style
+        from django.core.management.sql import custom_sql_for_model
+        from django.db.models import get_models
+
+        style = no_style()
+        statements = []
+        for model in get_models(include_auto_created=True):
+            output, references = self.sql_create_model(model, style, set())
+            statements.extend(output)
+            statements.extend(self.sql_indexes_for_model(model, style))
+            statements.extend(custom_sql_for_model(model, style, self.connection))
+        statements.extend(self._get_cache_tables())
+        return hashlib.sha1(smart_str('\n'.join(statements))).hexdigest()
+
+    def _get_test_db_fingerprint(self, test_database_name):
+        """
+        Returns the schema fingerprint recorded in the test database called
+        ``test_database_name``, or None if there isn't one.
+        """
+        settings_dict = self.connection.settings_dict.copy()
+        settings_dict['NAME'] = test_database_name
+        backend = load_backend(settings_dict['ENGINE'])
+        connection = backend.DatabaseWrapper(settings_dict,
+                                             alias='__test_fingerprint__',
+                                             allow_thread_sharing=False)
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT fingerprint FROM %s"
+                           % connection.ops.quote_name(TEST_FINGERPRINT_TABLE))
+            row = cursor.fetchone()
+        except Exception:
+            # The database or the table doesn't exist.
+            row = None
+        finally:
+            connection.close()
+        return row and row[0] or None
+
+    def _set_test_db_fingerprint(self, fingerprint):
+        """
+        Records the schema fingerprint in the test database. The table isn't
+        known to any model, so flushing the database leaves it alone.
+        """
+        qn = self.connection.ops.quote_name
+        cursor = self.connection.cursor()
+        cursor.execute("CREATE TABLE %s (fingerprint varchar(40) NOT NULL)"
+                       % qn(TEST_FINGERPRINT_TABLE))
+        cursor.execute("INSERT INTO %s (fingerprint) VALUES (%%s)"
+                       % qn(TEST_FINGERPRINT_TABLE), [fingerprint])
+        self.connection.commit_unless_managed()
+
     def _get_test_db_name(self):
         """
         Internal implementation - returns the name of the test DB that will be
@@ -350,10 +454,11 @@ class BaseDatabaseCreation(object):
 
         return test_database_name
 
-    def destroy_test_db(self, old_database_name, verbosity=1):
+    def destroy_test_db(self, old_database_name, verbosity=1, keepdb=False):
         """
         Destroy a test database, prompting the user for confirmation if the
-        database already exists.
+        database already exists. If ``keepdb`` is True, the test database is
+        left in place to be reused by the next run.
         """
         self.connection.close()
         test_database_name = self.connection.settings_dict['NAME']
@@ -361,8 +466,11 @@ class BaseDatabaseCreation(object):
             test_db_repr = ''
             if verbosity >= 2:
                 test_db_repr = " ('%s')" % test_database_name
-            print "Destroying test database for alias '%s'%s..." % (
-                self.connection.alias, test_db_repr)
+            action = keepdb and 'Preserving' or 'Destroying'
+            print "%s test database for alias '%s'%s..." % (
+                action, self.connection.alias, test_db_repr)
+        if keepdb and test_database_name != ':memory:':
+            return
 
         # Temporarily use a new connection and a copy of the settings dict.
         # This prevents the production database from being exposed to potential
@@ -393,6 +501,56 @@ class BaseDatabaseCreation(object):
                        % self.connection.ops.quote_name(test_database_name))
         self.connection.close()
 
+    def get_test_db_clone_settings(self, suffix):
+        """
+        Returns the settings of the copy of the test database that
+        clone_test_db() creates for ``suffix``.
+        """
+        settings_dict = self.connection.settings_dict.copy()
+        settings_dict['NAME'] = '%s_%s' % (settings_dict['NAME'], suffix)
+        return settings_dict
+
+    def clone_test_db(self, suffix, verbosity=1, autoclobber=False):
+        """
+        Creates a copy of the test database, including its data, and returns
+        the settings to connect to it. This is much faster than creating a
+        new test database when the backend can use the test database as a
+        template.
+        """
+        source_database_name = self.connection.settings_dict['NAME']
+        settings_dict = self.get_test_db_clone_settings(suffix)
+        if verbosity >= 1:
+            test_db_repr = ''
+            if verbosity >= 2:
+                test_db_repr = " ('%s')" % settings_dict['NAME']
+            print "Cloning test database for alias '%s'%s..." % (
+                self.connection.alias, test_db_repr)
+        self._clone_test_db(source_database_name, settings_dict['NAME'],
+                            verbosity, autoclobber)
+        return settings_dict
+
+    def _clone_test_db(self, source_database_name, target_database_name,
+                       verbosity, autoclobber):
+        """
+        Internal implementation - copies the test database.
+        """
+        raise NotImplementedError(
+            "The %s backend doesn't support cloning test databases."
+            % self.connection.vendor)
+
+    def destroy_test_db_clone(self, suffix, verbosity=1):
+        """
+        Destroys a copy of the test database created by clone_test_db().
+        """
+        test_database_name = self.get_test_db_clone_settings(suffix)['NAME']
+        if verbosity >= 1:
+            test_db_repr = ''
+            if verbosity >= 2:
+                test_db_repr = " ('%s')" % test_database_name
+            print "Destroying test database clone for alias '%s'%s..." % (
+                self.connection.alias, test_db_repr)
+        self._destroy_test_db(test_database_name, verbosity)
+
     def set_autocommit(self):
         """
         Make sure a connection is in autocommit mode. - Deprecated, not used
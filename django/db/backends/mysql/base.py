@@ -190,6 +190,11 @@ class DatabaseFeatures(BaseDatabaseFeatures):
         "Confirm support for introspected foreign keys"
         return self._mysql_storage_engine() != 'MyISAM'
 
+    @cached_property
+    def supports_foreign_key_actions(self):
+        "MyISAM tables silently ignore foreign key constraints"
+        return self._mysql_storage_engine() != 'MyISAM'
+
 class DatabaseOperations(BaseDatabaseOperations):
     compiler_module = "django.db.backends.mysql.compiler"
 
@@ -332,6 +337,7 @@ class DatabaseOperations(BaseDatabaseOperations):
 
 class DatabaseWrapper(BaseDatabaseWrapper):
     vendor = 'mysql'
+    Database = Database
     operators = {
         'exact': '= %s',
         'iexact': 'LIKE %s',
@@ -405,6 +405,7 @@ class _UninitializedOperatorsDescriptor(object):
 
 class DatabaseWrapper(BaseDatabaseWrapper):
     vendor = 'oracle'
+    Database = Database
     operators = _UninitializedOperatorsDescriptor()
 
     _standard_operators = {
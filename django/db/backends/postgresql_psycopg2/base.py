@@ -78,6 +78,7 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     requires_rollback_on_dirty_transaction = True
     has_real_datatype = True
     can_defer_constraint_checks = True
+    can_clone_databases = True
     has_select_for_update = True
     has_select_for_update_nowait = True
     has_bulk_insert = True
@@ -86,6 +87,7 @@ class DatabaseFeatures(BaseDatabaseFeatures):
 
 class DatabaseWrapper(BaseDatabaseWrapper):
     vendor = 'postgresql'
+    Database = Database
     operators = {
         'exact': '= %s',
         'iexact': '= UPPER(%s)',
@@ -1,7 +1,10 @@
+import sys
+
 import psycopg2.extensions
 
 from django.db.backends.creation import BaseDatabaseCreation
 from django.db.backends.util import truncate_name
+from django.db.utils import load_backend
 
 
 class DatabaseCreation(BaseDatabaseCreation):
@@ -85,3 +88,46 @@ class DatabaseCreation(BaseDatabaseCreation):
         self.connection.connection.rollback()
         self.connection.connection.set_isolation_level(
                 psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+
+    def _clone_test_db(self, source_database_name, target_database_name,
+                       verbosity, autoclobber):
+        # PostgreSQL copies a database with CREATE DATABASE ... TEMPLATE,
+        # which requires that nobody is connected to the template. Connect
+        # to the database the test database was created from instead.
+        self.connection.close()
+        settings_dict = self.connection.settings_dict.copy()
+        settings_dict['NAME'] = self._old_database_name
+        backend = load_backend(settings_dict['ENGINE'])
+        connection = backend.DatabaseWrapper(settings_dict,
+                                             alias='__clone_test_db__',
+                                             allow_thread_sharing=False)
+        qn = connection.ops.quote_name
+        create_sql = "CREATE DATABASE %s WITH TEMPLATE %s" % (
+            qn(target_database_name), qn(source_database_name))
+        try:
+            cursor = connection.cursor()
+            connection.creation._prepare_for_test_db_ddl()
+            try:
+                cursor.execute(create_sql)
+            except Exception, e:
+                sys.stderr.write(
+                    "Got an error cloning the test database: %s\n" % e)
+                if not autoclobber:
+                    confirm = raw_input(
+                        "Type 'yes' if you would like to try deleting the test "
+                        "database '%s', or 'no' to cancel: " % target_database_name)
+                if not autoclobber and confirm != 'yes':
+                    print "Tests cancelled."
+                    sys.exit(1)
+                if verbosity >= 1:
+                    print "Destroying old test database clone '%s'..." % (
+                        target_database_name)
+                try:
+                    cursor.execute("DROP DATABASE %s" % qn(target_database_name))
+                    cursor.execute(create_sql)
+                except Exception, e:
+                    sys.stderr.write(
+                        "Got an error cloning the test database: %s\n" % e)
+                    sys.exit(2)
+        finally:
+            connection.close()
@@ -78,9 +78,13 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     # go.
     can_use_chunked_reads = False
     test_db_allows_multiple_connections = False
+    # Only test databases stored in a file can be cloned.
+    can_clone_databases = True
     supports_unspecified_pk = True
     supports_timezones = False
     supports_1000_query_parameters = False
+    max_query_params = 999
+    supports_foreign_key_actions = False
     supports_mixed_date_datetime_comparisons = False
     has_bulk_insert = True
     can_combine_inserts_with_and_without_auto_increment_pk = True
@@ -142,6 +146,17 @@ class DatabaseOperations(BaseDatabaseOperations):
     def no_limit_value(self):
         return -1
 
+    # Savepoints are only used by test transactions, see
+    # DatabaseWrapper.start_test_transaction().
+    def savepoint_create_sql(self, sid):
+        return "SAVEPOINT %s" % sid
+
+    def savepoint_commit_sql(self, sid):
+        return "RELEASE SAVEPOINT %s" % sid
+
+    def savepoint_rollback_sql(self, sid):
+        return "ROLLBACK TO SAVEPOINT %s" % sid
+
     def sql_flush(self, style, tables, sequences):
         # NB: The generated SQL below is specific to SQLite
         # Note: The DELETE FROM... SQL generated below works for SQLite databases
@@ -203,6 +218,17 @@ class DatabaseOperations(BaseDatabaseOperations):
         # No field, or the field isn't known to be a decimal or integer
         return value
 
+    def bulk_batch_size(self, fields, objs):
+        """
+        SQLite has a compile-time default (SQLITE_LIMIT_VARIABLE_NUMBER) of
+        999 variables per query.
+
+        If there is just single field to insert, then we can hit another
+        limit, SQLITE_MAX_COMPOUND_SELECT which defaults to 500.
+        """
+        limit = 999 if len(fields) > 1 else 500
+        return (limit // len(fields)) if len(fields) > 0 else len(objs)
+
     def bulk_insert_sql(self, fields, num_values):
         res = []
         res.append("SELECT %s" % ", ".join(
@@ -213,6 +239,7 @@ class DatabaseOperations(BaseDatabaseOperations):
 
 class DatabaseWrapper(BaseDatabaseWrapper):
     vendor = 'sqlite'
+    Database = Database
     # SQLite requires LIKE statements to include an ESCAPE clause if the value
     # being escaped has a percent or underscore in it.
     # See http://www.sqlite.org/lang_expr.html for an explanation.
@@ -315,6 +342,23 @@ class DatabaseWrapper(BaseDatabaseWrapper):
                         % (table_name, bad_row[0], table_name, column_name, bad_row[1],
                         referenced_table_name, referenced_column_name))
 
+    def start_test_transaction(self):
+        # pysqlite commits the current transaction before statements such as
+        # SAVEPOINT, unless it is in autocommit mode. Stay in that mode and
+        # start the transaction explicitly, so that savepoints can be used.
+        self.cursor()
+        self._test_isolation_level = self.connection.isolation_level
+        self.connection.isolation_level = None
+        self.cursor().execute("BEGIN")
+        self.features.uses_savepoints = True
+
+    def end_test_transaction(self):
+        self.features.uses_savepoints = False
+        try:
+            self.cursor().execute("ROLLBACK")
+        finally:
+            self.connection.isolation_level = self._test_isolation_level
+
     def close(self):
         self.validate_thread_sharing()
         # If database is in memory, closing the connection destroys the
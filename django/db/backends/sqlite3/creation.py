@@ -1,4 +1,5 @@
 import os
+import shutil
 import sys
 from django.db.backends.creation import BaseDatabaseCreation
 
@@ -70,6 +71,33 @@ class DatabaseCreation(BaseDatabaseCreation):
             # Remove the SQLite database file
             os.remove(test_database_name)
 
+    def get_test_db_clone_settings(self, suffix):
+        settings_dict = self.connection.settings_dict.copy()
+        root, ext = os.path.splitext(settings_dict['NAME'])
+        settings_dict['NAME'] = '%s_%s%s' % (root, suffix, ext)
+        return settings_dict
+
+    def _clone_test_db(self, source_database_name, target_database_name,
+                       verbosity, autoclobber):
+        if source_database_name == ':memory:':
+            raise NotImplementedError(
+                "In-memory SQLite test databases can't be cloned.")
+        # Make sure everything has been written to the file first.
+        self.connection.close()
+        if os.access(target_database_name, os.F_OK):
+            if not autoclobber:
+                confirm = raw_input("Type 'yes' if you would like to try deleting the test database '%s', or 'no' to cancel: " % target_database_name)
+            if not autoclobber and confirm != 'yes':
+                print "Tests cancelled."
+                sys.exit(1)
+            if verbosity >= 1:
+                print "Destroying old test database clone '%s'..." % target_database_name
+        try:
+            shutil.copyfile(source_database_name, target_database_name)
+        except Exception, e:
+            sys.stderr.write("Got an error cloning the test database: %s\n" % e)
+            sys.exit(2)
+
     def set_autocommit(self):
         self.connection.connection.isolation_level = None
 
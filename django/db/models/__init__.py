@@ -10,8 +10,10 @@ from django.db.models.aggregates import *
 from django.db.models.fields import *
 from django.db.models.fields.subclassing import SubfieldBase
 from django.db.models.fields.files import FileField, ImageField
+from django.db.models.fields.counters import CounterField
 from django.db.models.fields.related import ForeignKey, OneToOneField, ManyToManyField, ManyToOneRel, ManyToManyRel, OneToOneRel
-from django.db.models.deletion import CASCADE, PROTECT, SET, SET_NULL, SET_DEFAULT, DO_NOTHING, ProtectedError
+from django.db.models.deletion import (CASCADE, PROTECT, SET, SET_NULL,
+    SET_DEFAULT, DO_NOTHING, DB_CASCADE, DB_SET_NULL, ProtectedError)
 from django.db.models import signals
 from django.utils.decorators import wraps
 
@@ -9,6 +9,8 @@ from django.core.exceptions import (ObjectDoesNotExist,
     MultipleObjectsReturned, FieldError, ValidationError, NON_FIELD_ERRORS)
 from django.core import validators
 from django.db.models.fields import AutoField, FieldDoesNotExist
+from django.db.models.fields.counters import (update_counters,
+    get_counted_values, move_counters, track_counted_values)
 from django.db.models.fields.related import (ManyToOneRel,
     OneToOneField, add_lazy_relation)
 from django.db import (connections, router, transaction, DatabaseError,
@@ -526,9 +528,13 @@ class Model(object):
                     if force_update or non_pks:
                         values = [(f, None, (raw and getattr(self, f.attname) or f.pre_save(self, False))) for f in non_pks]
                         if values:
+                            # Counters follow foreign keys moved by this save.
+                            old_values = not raw and get_counted_values(cls, self, pk_val, using)
                             rows = manager.using(using).filter(pk=pk_val)._update(values)
                             if force_update and not rows:
                                 raise DatabaseError("Forced update did not affect any rows.")
+                            if old_values and rows:
+                                move_counters(cls, self, old_values, using)
                 else:
                     record_exists = False
             if not pk_set or not record_exists:
@@ -552,6 +558,9 @@ class Model(object):
 
                 if update_pk:
                     setattr(self, meta.pk.attname, result)
+                if not raw:
+                    update_counters(cls, [self], 1, using)
+            track_counted_values(cls, self)
             transaction.commit_unless_managed(using=using)
 
         # Store the database on which the object was saved
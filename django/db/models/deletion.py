@@ -3,6 +3,8 @@ from operator import attrgetter
 
 from django.db import connections, transaction, IntegrityError
 from django.db.models import signals, sql
+from django.db.models.fields.counters import get_counters, update_counters
+from django.dispatch.dispatcher import _make_id
 from django.utils.datastructures import SortedDict
 
 
@@ -49,6 +51,20 @@ def DO_NOTHING(collector, field, sub_objs, using):
     pass
 
 
+def DB_CASCADE(collector, field, sub_objs, using):
+    # The database deletes the related rows itself through an ON DELETE
+    # CASCADE constraint. This is only called on backends that can't enforce
+    # the constraint, in which case the cascade is emulated.
+    CASCADE(collector, field, sub_objs, using)
+DB_CASCADE.db_on_delete = 'CASCADE'
+
+
+def DB_SET_NULL(collector, field, sub_objs, using):
+    # See DB_CASCADE.
+    SET_NULL(collector, field, sub_objs, using)
+DB_SET_NULL.db_on_delete = 'SET NULL'
+
+
 def force_managed(func):
     @wraps(func)
     def decorated(self, *args, **kwargs):
@@ -171,6 +187,8 @@ class Collector(object):
                 field = related.field
                 if related.model._meta.auto_created:
                     self.add_batch(related.model, field, new_objs)
+                elif self.can_defer_to_database(field):
+                    continue
                 else:
                     sub_objs = self.related_objects(related, new_objs)
                     if not sub_objs:
@@ -189,6 +207,60 @@ class Collector(object):
                                  source_attr=relation.rel.related_name,
                                  nullable=True)
 
+    def can_defer_to_database(self, field):
+        """
+        Returns True if the on_delete behavior of ``field`` is carried out by
+        the database itself, so that the related objects don't need to be
+        collected at all.
+
+        Cascades are only left to the database when deleting the related
+        objects in Python wouldn't do anything more; see can_cascade_in_database().
+        """
+        db_on_delete = getattr(field.rel.on_delete, 'db_on_delete', None)
+        if (db_on_delete is None or
+                not connections[self.using].features.supports_foreign_key_actions):
+            return False
+        if db_on_delete == 'CASCADE':
+            return self.can_cascade_in_database(field.model)
+        return True
+
+    def can_cascade_in_database(self, model, seen=None):
+        """
+        Returns True if the objects of ``model`` can be deleted by the
+        database: the model has no pre_delete or post_delete receivers, no
+        parent models, no counters depending on it and no generic relations,
+        and every relation pointing at it is either left alone or carried out
+        by the database too.
+        """
+        if seen is None:
+            seen = set()
+        if model in seen:
+            return True
+        seen.add(model)
+        opts = model._meta
+        if opts.parents or get_counters(model):
+            return False
+        if any(signal._live_receivers(_make_id(model))
+               for signal in (signals.pre_delete, signals.post_delete)):
+            return False
+        if any(not field.rel.through for field in opts.many_to_many):
+            return False
+        for related in opts.get_all_related_objects(
+                include_hidden=True, include_proxy_eq=True):
+            if related.model._meta.auto_created:
+                # The rows of many-to-many tables are deleted in Python.
+                return False
+            on_delete = related.field.rel.on_delete
+            if on_delete is DO_NOTHING:
+                continue
+            db_on_delete = getattr(on_delete, 'db_on_delete', None)
+            if db_on_delete is None:
+                return False
+            if (db_on_delete == 'CASCADE' and
+                    not self.can_cascade_in_database(related.model, seen)):
+                return False
+        return True
+
     def related_objects(self, related, objs):
         """
         Gets a QuerySet of objects related to ``objs`` via the relation ``related``.
@@ -246,6 +318,7 @@ class Collector(object):
             for (field, value), instances in instances_for_fieldvalues.iteritems():
                 query.update_batch([obj.pk for obj in instances],
                                    {field.name: value}, self.using)
+                update_counters(model, instances, -1, self.using, field)
 
         # reverse instance collections
         for instances in self.data.itervalues():
@@ -262,6 +335,7 @@ class Collector(object):
             query = sql.DeleteQuery(model)
             pk_list = [obj.pk for obj in instances]
             query.delete_batch(pk_list, self.using)
+            update_counters(model, instances, -1, self.using)
 
         # send post_delete signals
         for model, obj in self.instances_with_model():
@@ -275,6 +349,7 @@ class Collector(object):
             for (field, value), instances in instances_for_fieldvalues.iteritems():
                 for obj in instances:
                     setattr(obj, field.attname, value)
+                update_counters(model, instances, 1, self.using, field)
         for model, instances in self.data.iteritems():
             for instance in instances:
                 setattr(instance, model._meta.pk.attname, None)
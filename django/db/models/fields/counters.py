@@ -0,0 +1,243 @@
+"""
+Denormalized counters of related objects.
+
+A CounterField stores the number of objects pointing at its model through a
+reverse foreign key. The count is kept up to date with single UPDATE ...
+SET count = count + n statements whenever related objects are inserted or
+deleted through the ORM, so reading it never needs a COUNT(*) query.
+"""
+
+from django.db import connections
+from django.db.models.expressions import F
+from django.db.models.fields import IntegerField
+from django.db.models.loading import app_cache_ready, get_models
+from django.db.models.signals import post_init
+
+# All concrete CounterFields, in the order in which they were defined.
+_counter_fields = []
+# Maps the model holding a foreign key to a list of (counter, foreign key)
+# pairs. Built lazily, once the app cache is populated.
+_counter_cache = None
+
+
+class CounterField(IntegerField):
+    """
+    An integer field holding the number of related objects reachable
+    through the reverse relation named ``related_name``.
+    """
+    description = "Count of related objects"
+
+    def __init__(self, related_name, *args, **kwargs):
+        self.related_name = related_name
+        kwargs.setdefault('default', 0)
+        kwargs.setdefault('editable', False)
+        super(CounterField, self).__init__(*args, **kwargs)
+
+    def contribute_to_class(self, cls, name):
+        global _counter_cache
+        super(CounterField, self).contribute_to_class(cls, name)
+        if not cls._meta.abstract:
+            _counter_fields.append(self)
+            _counter_cache = None
+
+    def get_internal_type(self):
+        return "IntegerField"
+
+    def get_relation(self):
+        """
+        Returns the foreign key counted by this field, or None if
+        ``related_name`` doesn't name a reverse foreign key relation.
+        """
+        for related in self.model._meta.get_all_related_objects(include_hidden=True):
+            if related.get_accessor_name() == self.related_name:
+                return related.field
+        return None
+
+
+def _build_counter_cache():
+    cache = {}
+    for counter in _counter_fields:
+        fk = counter.get_relation()
+        if fk is not None:
+            cache.setdefault(fk.model, []).append((counter, fk))
+    for model in cache:
+        post_init.connect(_track_counted_values, sender=model, weak=False,
+                          dispatch_uid='counters.%s.%s' % (model._meta.app_label,
+                                                           model._meta.object_name))
+    return cache
+
+
+def _track_counted_values(sender, instance, **kwargs):
+    track_counted_values(sender, instance)
+
+
+def track_counted_values(model, obj):
+    """
+    Remembers the values of the counted foreign keys of ``obj``, as loaded
+    from or saved to the database, so that saving it again only looks up
+    the stored values when one of them changed.
+    """
+    counters = get_counters(model)
+    if not counters:
+        return
+    values = obj.__dict__.setdefault('_counted_values', {})
+    for counter, fk in counters:
+        # Deferred foreign keys aren't loaded; don't fetch them here.
+        if fk.attname in obj.__dict__:
+            values[fk.attname] = obj.__dict__[fk.attname]
+        else:
+            values.pop(fk.attname, None)
+
+
+def get_counters(model):
+    """
+    Returns a list of (counter field, foreign key) pairs for every counter
+    that depends on rows of ``model``.
+    """
+    global _counter_cache
+    if not _counter_fields:
+        return []
+    model = model._meta.concrete_model
+    if _counter_cache is not None:
+        return _counter_cache.get(model, [])
+    cache = _build_counter_cache()
+    if app_cache_ready():
+        _counter_cache = cache
+    return cache.get(model, [])
+
+
+def _apply_deltas(counter, fk, deltas, using):
+    """
+    Applies ``deltas``, a dictionary mapping related key values to the change
+    of their count, with one UPDATE per distinct change and batch of keys.
+    """
+    by_delta = {}
+    for value, delta in deltas.iteritems():
+        if delta:
+            by_delta.setdefault(delta, []).append(value)
+    connection = connections[using]
+    max_params = connection.features.max_query_params
+    batch_size = max_params and max_params - 1 or None
+    manager = counter.model._base_manager.using(using)
+    lookup = '%s__in' % fk.rel.get_related_field().name
+    for delta, values in by_delta.iteritems():
+        values.sort()
+        step = batch_size or len(values)
+        for i in xrange(0, len(values), step):
+            manager.filter(**{lookup: values[i:i + step]}).update(
+                **{counter.attname: F(counter.attname) + delta})
+
+
+def update_counters(model, objs, delta, using, field=None):
+    """
+    Adds ``delta`` to every counter the instances in ``objs`` of ``model``
+    contribute to. Used after ``objs`` have been inserted (``delta=1``) or
+    deleted (``delta=-1``). If ``field`` is given, only the counters of that
+    foreign key are updated.
+    """
+    if field is not None:
+        model = field.model
+    counters = get_counters(model)
+    if not counters or not objs:
+        return
+    for counter, fk in counters:
+        if field is not None and fk is not field:
+            continue
+        deltas = {}
+        for obj in objs:
+            value = getattr(obj, fk.attname)
+            if value is not None:
+                deltas[value] = deltas.get(value, 0) + delta
+        _apply_deltas(counter, fk, deltas, using)
+
+
+def get_counted_values(model, obj, pk, using):
+    """
+    Returns a dictionary mapping the counted foreign keys of ``model`` to
+    their value stored in the database for the row with primary key ``pk``.
+
+    Returns an empty dictionary without querying the database if ``obj``
+    was loaded from or saved to the database and none of its counted
+    foreign keys changed since.
+    """
+    fks = []
+    for counter, fk in get_counters(model):
+        if fk not in fks:
+            fks.append(fk)
+    if not fks:
+        return {}
+    loaded = obj.__dict__.get('_counted_values')
+    if loaded is not None and not obj._state.adding:
+        for fk in fks:
+            if fk.attname not in loaded or loaded[fk.attname] != getattr(obj, fk.attname):
+                break
+        else:
+            return {}
+    rows = model._base_manager.using(using).filter(pk=pk).values_list(
+        *[fk.name for fk in fks])
+    for row in rows:
+        return dict(zip(fks, row))
+    return {}
+
+
+def move_counters(model, obj, old_values, using):
+    """
+    Moves counts from the old targets in ``old_values`` (as returned by
+    get_counted_values()) to the objects ``obj`` now points to.
+    """
+    for counter, fk in get_counters(model):
+        if fk not in old_values:
+            continue
+        old, new = old_values[fk], getattr(obj, fk.attname)
+        if old == new:
+            continue
+        deltas = {}
+        if old is not None:
+            deltas[old] = -1
+        if new is not None:
+            deltas[new] = 1
+        _apply_deltas(counter, fk, deltas, using)
+
+
+def clear_counters(fk, value, using):
+    """
+    Resets the counters of the object whose related key is ``value`` after
+    all its related objects through ``fk`` have been detached.
+    """
+    for counter, counted_fk in get_counters(fk.model):
+        if counted_fk is fk:
+            counter.model._base_manager.using(using).filter(
+                **{fk.rel.get_related_field().name: value}
+            ).update(**{counter.attname: 0})
+
+
+def rebuild_counters(model, using):
+    """
+    Recomputes every CounterField of ``model`` from the related rows.
+    """
+    from django.db.models.aggregates import Count
+
+    for counter in model._meta.local_fields:
+        if not isinstance(counter, CounterField):
+            continue
+        fk = counter.get_relation()
+        if fk is None:
+            continue
+        counter.model._base_manager.using(using).update(**{counter.attname: 0})
+        related = fk.model._base_manager.using(using).filter(
+            **{'%s__isnull' % fk.name: False})
+        rows = related.order_by().values_list(fk.name).annotate(
+            _count=Count('pk'))
+        _apply_deltas(counter, fk, dict(rows), using)
+
+
+def get_counter_models():
+    """
+    Returns the installed models that have at least one CounterField.
+    """
+    installed = get_models()
+    models = []
+    for counter in _counter_fields:
+        if counter.model in installed and counter.model not in models:
+            models.append(counter.model)
+    return models
@@ -1,10 +1,11 @@
 from operator import attrgetter
 
-from django.db import connection, router
+from django.db import connection, connections, router, transaction
 from django.db.backends import util
 from django.db.models import signals, get_model
 from django.db.models.fields import (AutoField, Field, IntegerField,
     PositiveIntegerField, PositiveSmallIntegerField, FieldDoesNotExist)
+from django.db.models.fields.counters import clear_counters
 from django.db.models.related import RelatedObject
 from django.db.models.query import QuerySet
 from django.db.models.query_utils import QueryWrapper
@@ -516,7 +517,9 @@ class ForeignRelatedObjectsDescriptor(object):
                 remove.alters_data = True
 
                 def clear(self):
-                    self.update(**{rel_field.name: None})
+                    qs = self.get_query_set()
+                    qs.update(**{rel_field.name: None})
+                    clear_counters(rel_field, getattr(self.instance, attname), qs.db)
                 clear.alters_data = True
 
         return RelatedManager
@@ -599,6 +602,30 @@ def create_many_related_manager(superclass, rel):
                     self._remove_items(self.target_field_name, self.source_field_name, *objs)
             remove.alters_data = True
 
+            def set(self, objs):
+                """
+                Makes ``objs`` the complete set of related objects. Only the
+                difference to the current set is written: rows that are no
+                longer wanted are removed and missing rows are added, each in
+                as few statements as the backend allows.
+                """
+                db = router.db_for_write(self.through, instance=self.instance)
+                new_ids = self._get_target_ids(objs)
+                old_ids = self._get_existing_ids(self.source_field_name,
+                    self.target_field_name, db)
+                self._remove_items(self.source_field_name, self.target_field_name,
+                    *(old_ids - new_ids))
+                self._insert_items(self.source_field_name, self.target_field_name,
+                    new_ids - old_ids, db)
+
+                # If this is a symmetrical m2m relation to self, sync the mirror entries in the m2m table
+                if self.symmetrical:
+                    self._remove_items(self.target_field_name, self.source_field_name,
+                        *(old_ids - new_ids))
+                    self._add_items(self.target_field_name, self.source_field_name,
+                        *(new_ids - old_ids))
+            set.alters_data = True
+
         def clear(self):
             self._clear_items(self.source_field_name)
 
@@ -630,53 +657,82 @@ def create_many_related_manager(superclass, rel):
             return obj, created
         get_or_create.alters_data = True
 
+        def _get_target_ids(self, objs):
+            # Returns the set of primary keys of objs, which are either
+            # object instances or primary keys of object instances.
+            from django.db.models import Model
+            target_ids = set()
+            for obj in objs:
+                if isinstance(obj, self.model):
+                    if not router.allow_relation(obj, self.instance):
+                       raise ValueError('Cannot add "%r": instance is on database "%s", value is on database "%s"' %
+                                           (obj, self.instance._state.db, obj._state.db))
+                    target_ids.add(obj.pk)
+                elif isinstance(obj, Model):
+                    raise TypeError("'%s' instance expected, got %r" % (self.model._meta.object_name, obj))
+                else:
+                    target_ids.add(obj)
+            return target_ids
+
+        def _get_batches(self, target_ids, db):
+            # Splits target_ids into lists small enough to be used in an
+            # "IN" clause next to the source object's primary key.
+            target_ids = list(target_ids)
+            max_params = connections[db].features.max_query_params
+            batch_size = max_params - 1 if max_params else len(target_ids)
+            return [target_ids[i:i + batch_size]
+                    for i in range(0, len(target_ids), batch_size)]
+
+        def _get_existing_ids(self, source_field_name, target_field_name, db, target_ids=None):
+            # Returns the target primary keys currently related to the source
+            # object, optionally restricted to target_ids.
+            vals = self.through._default_manager.using(db).values_list(target_field_name, flat=True)
+            vals = vals.filter(**{source_field_name: self._pk_val})
+            if target_ids is None:
+                return set(vals)
+            existing_ids = set()
+            for batch in self._get_batches(target_ids, db):
+                existing_ids.update(vals.filter(**{'%s__in' % target_field_name: batch}))
+            return existing_ids
+
         def _add_items(self, source_field_name, target_field_name, *objs):
             # source_field_name: the PK fieldname in join table for the source object
             # target_field_name: the PK fieldname in join table for the target object
             # *objs - objects to add. Either object instances, or primary keys of object instances.
 
             # If there aren't any objects, there is nothing to do.
-            from django.db.models import Model
             if objs:
-                new_ids = set()
-                for obj in objs:
-                    if isinstance(obj, self.model):
-                        if not router.allow_relation(obj, self.instance):
-                           raise ValueError('Cannot add "%r": instance is on database "%s", value is on database "%s"' %
-                                               (obj, self.instance._state.db, obj._state.db))
-                        new_ids.add(obj.pk)
-                    elif isinstance(obj, Model):
-                        raise TypeError("'%s' instance expected, got %r" % (self.model._meta.object_name, obj))
-                    else:
-                        new_ids.add(obj)
+                new_ids = self._get_target_ids(objs)
                 db = router.db_for_write(self.through, instance=self.instance)
-                vals = self.through._default_manager.using(db).values_list(target_field_name, flat=True)
-                vals = vals.filter(**{
-                    source_field_name: self._pk_val,
-                    '%s__in' % target_field_name: new_ids,
+                new_ids = new_ids - self._get_existing_ids(source_field_name,
+                    target_field_name, db, new_ids)
+                self._insert_items(source_field_name, target_field_name, new_ids, db,
+                    send_empty=True)
+
+        def _insert_items(self, source_field_name, target_field_name, new_ids, db, send_empty=False):
+            # new_ids: primary keys of target objects known not to be related yet.
+            if not new_ids and not send_empty:
+                return
+            if self.reverse or source_field_name == self.source_field_name:
+                # Don't send the signal when we are inserting the
+                # duplicate data row for symmetrical reverse entries.
+                signals.m2m_changed.send(sender=self.through, action='pre_add',
+                    instance=self.instance, reverse=self.reverse,
+                    model=self.model, pk_set=new_ids, using=db)
+            # Add the ones that aren't there already
+            self.through._default_manager.using(db).bulk_create([
+                self.through(**{
+                    '%s_id' % source_field_name: self._pk_val,
+                    '%s_id' % target_field_name: obj_id,
                 })
-                new_ids = new_ids - set(vals)
-
-                if self.reverse or source_field_name == self.source_field_name:
-                    # Don't send the signal when we are inserting the
-                    # duplicate data row for symmetrical reverse entries.
-                    signals.m2m_changed.send(sender=self.through, action='pre_add',
-                        instance=self.instance, reverse=self.reverse,
-                        model=self.model, pk_set=new_ids, using=db)
-                # Add the ones that aren't there already
-                self.through._default_manager.using(db).bulk_create([
-                    self.through(**{
-                        '%s_id' % source_field_name: self._pk_val,
-                        '%s_id' % target_field_name: obj_id,
-                    })
-                    for obj_id in new_ids
-                ])
-                if self.reverse or source_field_name == self.source_field_name:
-                    # Don't send the signal when we are inserting the
-                    # duplicate data row for symmetrical reverse entries.
-                    signals.m2m_changed.send(sender=self.through, action='post_add',
-                        instance=self.instance, reverse=self.reverse,
-                        model=self.model, pk_set=new_ids, using=db)
+                for obj_id in new_ids
+            ])
+            if self.reverse or source_field_name == self.source_field_name:
+                # Don't send the signal when we are inserting the
+                # duplicate data row for symmetrical reverse entries.
+                signals.m2m_changed.send(sender=self.through, action='post_add',
+                    instance=self.instance, reverse=self.reverse,
+                    model=self.model, pk_set=new_ids, using=db)
 
         def _remove_items(self, source_field_name, target_field_name, *objs):
             # source_field_name: the PK colname in join table for the source object
@@ -702,10 +758,7 @@ def create_many_related_manager(superclass, rel):
                         instance=self.instance, reverse=self.reverse,
                         model=self.model, pk_set=old_ids, using=db)
                 # Remove the specified objects from the join table
-                self.through._default_manager.using(db).filter(**{
-                    source_field_name: self._pk_val,
-                    '%s__in' % target_field_name: old_ids
-                }).delete()
+                self._delete_rows(source_field_name, target_field_name, db, old_ids)
                 if self.reverse or source_field_name == self.source_field_name:
                     # Don't send the signal when we are deleting the
                     # duplicate data row for symmetrical reverse entries.
@@ -722,9 +775,7 @@ def create_many_related_manager(superclass, rel):
                 signals.m2m_changed.send(sender=self.through, action="pre_clear",
                     instance=self.instance, reverse=self.reverse,
                     model=self.model, pk_set=None, using=db)
-            self.through._default_manager.using(db).filter(**{
-                source_field_name: self._pk_val
-            }).delete()
+            self._delete_rows(source_field_name, None, db)
             if self.reverse or source_field_name == self.source_field_name:
                 # Don't send the signal when we are clearing the
                 # duplicate data rows for symmetrical reverse entries.
@@ -732,6 +783,39 @@ def create_many_related_manager(superclass, rel):
                     instance=self.instance, reverse=self.reverse,
                     model=self.model, pk_set=None, using=db)
 
+        def _delete_rows(self, source_field_name, target_field_name, db, target_ids=None):
+            # Deletes the join table rows of the source object, optionally
+            # restricted to target_ids. Nothing can point to an auto-created
+            # intermediary table and it doesn't send delete signals, so its
+            # rows are deleted directly instead of being collected first.
+            qs = self.through._default_manager.using(db).filter(**{
+                source_field_name: self._pk_val
+            })
+            if target_ids is None:
+                batches = [qs]
+            else:
+                batches = [qs.filter(**{'%s__in' % target_field_name: batch})
+                           for batch in self._get_batches(target_ids, db)]
+            if not self.through._meta.auto_created:
+                for batch in batches:
+                    batch.delete()
+                return
+            if not transaction.is_managed(using=db):
+                transaction.enter_transaction_management(using=db)
+                forced_managed = True
+            else:
+                forced_managed = False
+            try:
+                for batch in batches:
+                    batch._raw_delete(db)
+                if forced_managed:
+                    transaction.commit(using=db)
+                else:
+                    transaction.commit_unless_managed(using=db)
+            finally:
+                if forced_managed:
+                    transaction.leave_transaction_management(using=db)
+
     return ManyRelatedManager
 
 class ManyRelatedObjectsDescriptor(object):
@@ -9,6 +9,7 @@ import sys
 from django.core import exceptions
 from django.db import connections, router, transaction, IntegrityError
 from django.db.models.fields import AutoField
+from django.db.models.fields.counters import update_counters
 from django.db.models.query_utils import (Q, select_related_descend,
     deferred_class_factory, InvalidQuery)
 from django.db.models.deletion import Collector
@@ -382,12 +383,14 @@ class QuerySet(object):
         obj.save(force_insert=True, using=self.db)
         return obj
 
-    def bulk_create(self, objs):
+    def bulk_create(self, objs, batch_size=None):
         """
         Inserts each of the instances into the database. This does *not* call
         save() on each of the instances, does not send any pre/post save
         signals, and does not set the primary key attribute if it is an
-        autoincrement field.
+        autoincrement field. The objects are inserted in batches of at most
+        ``batch_size`` rows; by default the batch size is as large as the
+        backend allows.
         """
         # So this case is fun. When you bulk insert you don't get the primary
         # keys back (if it's an autoincrement), so you can't insert into the
@@ -412,13 +415,15 @@ class QuerySet(object):
         try:
             if (connection.features.can_combine_inserts_with_and_without_auto_increment_pk
                 and self.model._meta.has_auto_field):
-                self.model._base_manager._insert(objs, fields=fields, using=self.db)
+                self._batched_insert(objs, fields, batch_size)
             else:
                 objs_with_pk, objs_without_pk = partition(lambda o: o.pk is None, objs)
                 if objs_with_pk:
-                    self.model._base_manager._insert(objs_with_pk, fields=fields, using=self.db)
+                    self._batched_insert(objs_with_pk, fields, batch_size)
                 if objs_without_pk:
-                    self.model._base_manager._insert(objs_without_pk, fields=[f for f in fields if not isinstance(f, AutoField)], using=self.db)
+                    fields = [f for f in fields if not isinstance(f, AutoField)]
+                    self._batched_insert(objs_without_pk, fields, batch_size)
+            update_counters(self.model, objs, 1, self.db)
             if forced_managed:
                 transaction.commit(using=self.db)
             else:
@@ -478,19 +483,57 @@ class QuerySet(object):
         obj.query.add_ordering('-%s' % latest_by)
         return obj.get()
 
-    def in_bulk(self, id_list):
+    def in_bulk(self, id_list, field_name='pk', batch_size=None):
         """
         Returns a dictionary mapping each of the given IDs to the object with
-        that ID.
+        that ID. The IDs are looked up in ``field_name``, which must be
+        unique. Long lists are split into several queries of at most
+        ``batch_size`` IDs, by default as many as the backend allows in a
+        single query.
         """
         assert self.query.can_filter(), \
                 "Cannot use 'limit' or 'offset' with in_bulk"
+        opts = self.model._meta
+        if field_name == 'pk':
+            field = opts.pk
+        else:
+            field = opts.get_field(field_name, many_to_many=False)
+            if not field.unique:
+                raise ValueError("in_bulk()'s field_name must be a unique "
+                                 "field but %r isn't." % field_name)
+        id_list = list(id_list)
         if not id_list:
             return {}
-        qs = self._clone()
-        qs.query.add_filter(('pk__in', id_list))
-        qs.query.clear_ordering(force_empty=True)
-        return dict([(obj._get_pk_val(), obj) for obj in qs])
+        if batch_size is None:
+            batch_size = self._in_bulk_batch_size() or len(id_list)
+        result = {}
+        for offset in range(0, len(id_list), batch_size):
+            qs = self._clone()
+            qs.query.add_filter(('%s__in' % field_name,
+                                 id_list[offset:offset + batch_size]))
+            qs.query.clear_ordering(force_empty=True)
+            for obj in qs:
+                result[getattr(obj, field.attname)] = obj
+        return result
+
+    def _in_bulk_batch_size(self):
+        """
+        Returns the largest number of IDs in_bulk() can look up in a single
+        query, next to the parameters of the queryset itself, or None if the
+        backend has no limit.
+        """
+        connection = connections[self.db]
+        max_params = connection.features.max_query_params
+        if max_params:
+            try:
+                params = self.query.clone().get_compiler(self.db).as_sql()[1]
+            except EmptyResultSet:
+                params = ()
+            max_params = max(max_params - len(params), 1)
+        limits = [limit for limit in (connection.ops.max_in_list_size(),
+                                      max_params)
+                  if limit]
+        return limits and min(limits) or None
 
     def delete(self):
         """
@@ -519,6 +562,17 @@ class QuerySet(object):
         self._result_cache = None
     delete.alters_data = True
 
+    def _raw_delete(self, using):
+        """
+        Deletes the records in the current QuerySet with a single DELETE
+        statement. No signals are sent and related objects are not collected,
+        so this is only safe for models nothing else points to, such as
+        auto-created many-to-many intermediary tables.
+        """
+        sql.DeleteQuery(self.model).delete_qs(self, using)
+        self._result_cache = None
+    _raw_delete.alters_data = True
+
     def update(self, **kwargs):
         """
         Updates all elements in the current QuerySet, setting all the given
@@ -869,6 +923,20 @@ class QuerySet(object):
             c._setup_query()
         return c
 
+    def _batched_insert(self, objs, fields, batch_size):
+        """
+        A little helper method for bulk_create() to insert the objects one
+        batch at a time, so that no single INSERT exceeds the backend limits.
+        """
+        if not objs:
+            return
+        ops = connections[self.db].ops
+        batch_size = (batch_size or max(ops.bulk_batch_size(fields, objs), 1))
+        for batch in [objs[i:i + batch_size]
+                      for i in range(0, len(objs), batch_size)]:
+            self.model._base_manager._insert(batch, fields=fields,
+                                             using=self.db)
+
     def _fill_cache(self, num=None):
         """
         Fills the result cache with 'num' more entries (or until the results
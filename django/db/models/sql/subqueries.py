@@ -43,6 +43,29 @@ class DeleteQuery(Query):
                     pk_list[offset:offset + GET_ITERATOR_CHUNK_SIZE]), AND)
             self.do_query(self.model._meta.db_table, where, using=using)
 
+    def delete_qs(self, query, using):
+        """
+        Delete the rows matched by the QuerySet ``query``. When only the base
+        table is used by the query this is done with a single DELETE reusing
+        the query's WHERE clause; otherwise the primary keys are fetched first
+        and deleted in batches.
+        """
+        innerq = query.query
+        # Make sure the inner query has at least one table in use.
+        innerq.get_initial_alias()
+        # The same for our new query.
+        self.get_initial_alias()
+        innerq_used_tables = [t for t in innerq.tables
+                              if innerq.alias_refcount[t]]
+        if ((not innerq_used_tables or innerq_used_tables == self.tables)
+            and not innerq.having):
+            self.where = innerq.where
+            self.get_compiler(using).execute_sql(None)
+        else:
+            pk_list = list(query.values_list('pk', flat=True))
+            if pk_list:
+                self.delete_batch(pk_list, using)
+
 class UpdateQuery(Query):
     """
     Represents an "update" SQL query.
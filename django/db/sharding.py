@@ -0,0 +1,453 @@
+"""
+Hash-based horizontal sharding.
+
+A model opts in by naming its shard key in ``Meta.shard_key``. The value of
+that field is hashed to pick one of the database aliases listed in the
+``DATABASE_SHARDS`` setting. ``ShardRouter`` routes instances (and related
+managers) to their shard, and ``ShardedManager`` returns querysets that
+either run on a single shard, when they filter on the shard key, or on all
+shards at once, merging the results.
+"""
+import sys
+import threading
+import zlib
+from operator import attrgetter, itemgetter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import Model, Manager
+from django.db.models.fields import FieldDoesNotExist
+from django.db.models.query import (QuerySet, ValuesQuerySet,
+    ValuesListQuerySet, DateQuerySet, EmptyQuerySet)
+from django.db.models.sql.constants import LOOKUP_SEP
+from django.utils.encoding import smart_str
+
+
+def get_shards():
+    """
+    Returns the list of database aliases that sharded models are spread over.
+    """
+    shards = list(settings.DATABASE_SHARDS)
+    if not shards:
+        raise ImproperlyConfigured("Sharded models require the "
+                                   "DATABASE_SHARDS setting.")
+    return shards
+
+
+def shard_for_key(value):
+    """
+    Returns the alias of the shard holding rows whose shard key is ``value``.
+    Model instances stand for their primary key value.
+    """
+    if isinstance(value, Model):
+        value = value._get_pk_val()
+    shards = get_shards()
+    # crc32 is stable across processes and platforms, unlike hash().
+    return shards[(zlib.crc32(smart_str(value)) & 0xffffffff) % len(shards)]
+
+
+def get_shard_key_value(model, instance):
+    """
+    Returns the shard key value implied by ``instance`` for ``model``: the
+    shard key of an instance of ``model``, or the key of an instance the
+    shard key field points to. Returns None if there is none.
+    """
+    opts = model._meta
+    if opts.shard_key is None or instance is None:
+        return None
+    field = opts.get_field(opts.shard_key)
+    if isinstance(instance, model):
+        return getattr(instance, field.attname)
+    if field.rel and isinstance(instance, field.rel.to):
+        return getattr(instance, field.rel.get_related_field().attname)
+    return None
+
+
+class ShardRouter(object):
+    """
+    A database router sending instances of sharded models to the shard their
+    shard key hashes to. Add it to ``DATABASE_ROUTERS``.
+    """
+    def _db_for_instance(self, model, instance):
+        value = get_shard_key_value(model, instance)
+        if value is None:
+            return None
+        return shard_for_key(value)
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_instance(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_instance(model, hints.get('instance'))
+
+    def allow_syncdb(self, db, model):
+        if model._meta.shard_key is None:
+            return None
+        return db in get_shards()
+
+
+def scatter(func, querysets, parallel=True):
+    """
+    Calls ``func`` with each of the querysets, in a thread of its own if
+    ``parallel`` is True, and returns the list of results in the same order.
+    The first exception raised by any of the calls is re-raised.
+    """
+    if not parallel or len(querysets) < 2:
+        return [func(qs) for qs in querysets]
+    results = [None] * len(querysets)
+    errors = []
+
+    def run(index, qs):
+        try:
+            results[index] = func(qs)
+        except Exception:
+            errors.append(sys.exc_info())
+        finally:
+            # Connections are thread local, so this one isn't reused.
+            connections[qs.db].close()
+
+    threads = [threading.Thread(target=run, args=(index, qs))
+               for index, qs in enumerate(querysets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0][0], errors[0][1], errors[0][2]
+    return results
+
+
+def _has_private_data(alias):
+    """
+    Returns True if the connection of the current thread to ``alias`` may
+    see data that the connections of other threads don't: the changes of a
+    transaction, or an in-memory SQLite database.
+    """
+    connection = connections[alias]
+    if (connection.vendor == 'sqlite' and
+            connection.settings_dict['NAME'] in ('', ':memory:')):
+        return True
+    return connection.is_managed() or connection.is_dirty()
+
+
+class ShardedQuerySetMixin(object):
+    """
+    Runs a queryset on every shard when it isn't bound to a single one, and
+    merges the results, honoring ordering and slicing. Filtering on the shard
+    key with ``exact`` or ``in`` restricts the queryset to the matching shards.
+    """
+    _parallel = False
+    _shard_aliases = None
+
+    def parallel(self, enabled=True):
+        """
+        Returns a new QuerySet that queries several shards concurrently, one
+        thread per shard, or one after another if ``enabled`` is False.
+        Shards are still queried in the calling thread while it's in a
+        transaction, which the other threads couldn't see.
+        """
+        return self._clone(_parallel=enabled)
+
+    def _is_scattered(self):
+        return self._db is None and self.model._meta.shard_key is not None
+
+    def _shard_querysets(self):
+        aliases = self._shard_aliases or get_shards()
+        return [self._clone(_shard_aliases=None).using(alias)
+                for alias in aliases]
+
+    def _scatter(self, func, parallel=None):
+        if parallel is None:
+            parallel = self._parallel
+        querysets = self._shard_querysets()
+        if parallel and any(_has_private_data(qs.db) for qs in querysets):
+            parallel = False
+        return scatter(func, querysets, parallel)
+
+    def _get_shard_aliases(self, kwargs):
+        """
+        Returns the set of shards the lookups in ``kwargs`` restrict the query
+        to, or None if they don't involve the shard key.
+        """
+        field = self.model._meta.get_field(self.model._meta.shard_key)
+        for lookup, value in kwargs.items():
+            parts = lookup.split(LOOKUP_SEP)
+            lookup_type = 'exact'
+            if len(parts) > 1 and parts[-1] in ('exact', 'in'):
+                lookup_type = parts.pop()
+            if parts not in ([field.name], [field.attname]):
+                continue
+            if lookup_type == 'exact':
+                return set([shard_for_key(value)])
+            if isinstance(value, (list, tuple, set, frozenset)):
+                return set([shard_for_key(v) for v in value])
+        return None
+
+    def _narrow(self, kwargs):
+        aliases = self._get_shard_aliases(kwargs)
+        if aliases is None:
+            return self
+        if self._shard_aliases is not None:
+            aliases = aliases & set(self._shard_aliases)
+        if not aliases:
+            return self.none()
+        if len(aliases) == 1:
+            return self.using(aliases.pop())
+        # Keep the order of DATABASE_SHARDS so results merge predictably.
+        return self._clone(_shard_aliases=[alias for alias in get_shards()
+                                           if alias in aliases])
+
+    def filter(self, *args, **kwargs):
+        clone = super(ShardedQuerySetMixin, self).filter(*args, **kwargs)
+        if clone._is_scattered():
+            clone = clone._narrow(kwargs)
+        return clone
+
+    def iterator(self):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).iterator()
+        low, high = self.query.low_mark, self.query.high_mark
+
+        def fetch(qs):
+            # Every shard may hold the first rows of the merged result.
+            qs.query.clear_limits()
+            qs.query.set_limits(high=high)
+            return list(qs)
+        results = []
+        for shard_results in self._scatter(fetch):
+            results.extend(shard_results)
+        results = self._merge_results(results)
+        return iter(results[low:high])
+
+    def _merge_results(self, results):
+        if isinstance(self, DateQuerySet):
+            return sorted(set(results), reverse=self.query.order_by == [-1])
+        if self.query.distinct and isinstance(self, ValuesQuerySet):
+            seen = set()
+            unique = []
+            for row in results:
+                key = isinstance(row, dict) and tuple(sorted(row.items())) or row
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(row)
+            results = unique
+        ordering = self._get_merge_ordering()
+        try:
+            keys = [(self._get_merge_key(name), descending)
+                    for name, descending in ordering]
+        except NotImplementedError:
+            # The default ordering of the model is only a convenience; values
+            # that don't include it are returned shard by shard instead.
+            if self.query.order_by or self.query.extra_order_by:
+                raise
+            return results
+        # Sort on the least significant key first; sorts are stable.
+        for key, descending in reversed(keys):
+            results.sort(key=key, reverse=descending)
+        return results
+
+    def _get_merge_ordering(self):
+        query = self.query
+        if query.extra_order_by:
+            ordering = query.extra_order_by
+        elif not query.default_ordering:
+            ordering = query.order_by
+        else:
+            ordering = query.order_by or self.model._meta.ordering or []
+        merge_ordering = []
+        for name in ordering:
+            if name == '?':
+                continue
+            descending = name.startswith('-')
+            if descending:
+                name = name[1:]
+            if not query.standard_ordering:
+                descending = not descending
+            merge_ordering.append((name, descending))
+        return merge_ordering
+
+    def _get_merge_key(self, name):
+        opts = self.model._meta
+        field = None
+        if name == 'pk':
+            field = opts.pk
+        elif LOOKUP_SEP not in name:
+            try:
+                field = opts.get_field(name, many_to_many=False)
+            except FieldDoesNotExist:
+                pass
+        names = field is not None and [field.attname, field.name] or [name]
+        if isinstance(self, ValuesListQuerySet):
+            fields = list(self._fields)
+            for candidate in names:
+                if candidate in fields:
+                    if self.flat and len(fields) == 1:
+                        return lambda value: value
+                    return itemgetter(fields.index(candidate))
+        elif isinstance(self, ValuesQuerySet):
+            available = (list(self.field_names) +
+                         self.query.extra_select.keys() +
+                         self.query.aggregate_select.keys())
+            for candidate in names:
+                if candidate in available:
+                    return itemgetter(candidate)
+        elif field is not None:
+            return attrgetter(field.attname)
+        elif name in self.query.extra_select or name in self.query.aggregate_select:
+            return attrgetter(name)
+        raise NotImplementedError("Cannot merge results from several shards "
+                                  "ordered by '%s'." % name)
+
+    def count(self):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).count()
+        if self._result_cache is not None and not self._iter:
+            return len(self._result_cache)
+        low, high = self.query.low_mark, self.query.high_mark
+
+        def count(qs):
+            qs.query.clear_limits()
+            return qs.count()
+        number = sum(self._scatter(count))
+        if high is not None:
+            number = min(number, high)
+        return max(0, number - low)
+
+    def aggregate(self, *args, **kwargs):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).aggregate(*args, **kwargs)
+        for arg in args:
+            kwargs[arg.default_alias] = arg
+        if self.query.low_mark or self.query.high_mark is not None:
+            raise NotImplementedError("aggregate() on a sliced queryset is "
+                                      "not supported across shards.")
+        for alias, aggregate in kwargs.items():
+            if (aggregate.name not in ('Count', 'Sum', 'Min', 'Max') or
+                    aggregate.extra.get('distinct')):
+                raise NotImplementedError("%s is not supported across "
+                                          "shards." % aggregate.name)
+        results = self._scatter(lambda qs: qs.aggregate(**kwargs))
+        merged = {}
+        for alias, aggregate in kwargs.items():
+            values = [result[alias] for result in results
+                      if result[alias] is not None]
+            if aggregate.name == 'Count':
+                merged[alias] = sum(values)
+            elif not values:
+                merged[alias] = None
+            elif aggregate.name == 'Sum':
+                merged[alias] = sum(values)
+            elif aggregate.name == 'Min':
+                merged[alias] = min(values)
+            else:
+                merged[alias] = max(values)
+        return merged
+
+    def in_bulk(self, id_list, *args, **kwargs):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).in_bulk(id_list, *args,
+                                                             **kwargs)
+        id_list = list(id_list)
+        merged = {}
+        for objects in self._scatter(lambda qs: qs.in_bulk(id_list, *args,
+                                                           **kwargs)):
+            merged.update(objects)
+        return merged
+
+    def exists(self):
+        if not self._is_scattered() or self._result_cache is not None:
+            return super(ShardedQuerySetMixin, self).exists()
+        return any(self._scatter(lambda qs: qs.exists()))
+
+    # Writes run one shard after another in the calling thread, so that they
+    # take part in its transaction management.
+
+    def update(self, **kwargs):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).update(**kwargs)
+        self._result_cache = None
+        return sum(self._scatter(lambda qs: qs.update(**kwargs), parallel=False))
+    update.alters_data = True
+
+    def delete(self):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).delete()
+        self._scatter(lambda qs: qs.delete(), parallel=False)
+        self._result_cache = None
+    delete.alters_data = True
+
+    def create(self, **kwargs):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).create(**kwargs)
+        # Let the router pick the shard from the new instance.
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+    create.alters_data = True
+
+    def get_or_create(self, **kwargs):
+        if not self._is_scattered():
+            return super(ShardedQuerySetMixin, self).get_or_create(**kwargs)
+        clone = self._narrow(kwargs)
+        if clone._is_scattered():
+            raise ValueError("get_or_create() on a sharded model requires a "
+                             "lookup on its shard key '%s'." %
+                             self.model._meta.shard_key)
+        return clone.get_or_create(**kwargs)
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        if klass is not None and not issubclass(klass,
+                (ShardedQuerySetMixin, EmptyQuerySet)):
+            klass = sharded_queryset_class(klass)
+        kwargs.setdefault('_parallel', self._parallel)
+        kwargs.setdefault('_shard_aliases', self._shard_aliases)
+        return super(ShardedQuerySetMixin, self)._clone(klass, setup, **kwargs)
+
+
+class ShardedQuerySet(ShardedQuerySetMixin, QuerySet):
+    pass
+
+
+class ShardedValuesQuerySet(ShardedQuerySetMixin, ValuesQuerySet):
+    pass
+
+
+class ShardedValuesListQuerySet(ShardedQuerySetMixin, ValuesListQuerySet):
+    pass
+
+
+class ShardedDateQuerySet(ShardedQuerySetMixin, DateQuerySet):
+    pass
+
+
+_sharded_classes = {
+    QuerySet: ShardedQuerySet,
+    ValuesQuerySet: ShardedValuesQuerySet,
+    ValuesListQuerySet: ShardedValuesListQuerySet,
+    DateQuerySet: ShardedDateQuerySet,
+}
+
+
+def sharded_queryset_class(klass):
+    """
+    Returns the sharded counterpart of the QuerySet subclass ``klass``.
+    """
+    try:
+        return _sharded_classes[klass]
+    except KeyError:
+        sharded = type('Sharded%s' % klass.__name__,
+                       (ShardedQuerySetMixin, klass), {})
+        _sharded_classes[klass] = sharded
+        return sharded
+
+
+class ShardedManager(Manager):
+    """
+    A manager whose querysets span all the shards of a sharded model.
+    """
+    def get_query_set(self):
+        return ShardedQuerySet(self.model, using=self._db)
+
+    def parallel(self, *args, **kwargs):
+        return self.get_query_set().parallel(*args, **kwargs)
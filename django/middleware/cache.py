@@ -46,11 +46,26 @@ More details about how the caching works:
 * This middleware also sets ETag, Last-Modified, Expires and Cache-Control
   headers on the response object.
 
+* Expired pages are still served for the number of seconds set by the
+  "stale-while-revalidate" section of the "Cache-Control" header, while one
+  request regenerates them, and by the "stale-if-error" section, when the
+  view raises an exception or returns a server error. These sections fall
+  back to the CACHE_MIDDLEWARE_STALE_WHILE_REVALIDATE and
+  CACHE_MIDDLEWARE_STALE_IF_ERROR settings.
+
 """
 
+import math
+import time
+
 from django.conf import settings
 from django.core.cache import get_cache, DEFAULT_CACHE_ALIAS
-from django.utils.cache import get_cache_key, learn_cache_key, patch_response_headers, get_max_age
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.utils.cache import (get_cache_key, learn_cache_key,
+    patch_response_headers, patch_cache_control, get_max_age,
+    get_stale_periods, get_cache_expiry, get_cache_lock_key,
+    get_cached_response, cache_response)
 
 
 class UpdateCacheMiddleware(object):
@@ -68,6 +83,9 @@ class UpdateCacheMiddleware(object):
         self.cache_anonymous_only = getattr(settings, 'CACHE_MIDDLEWARE_ANONYMOUS_ONLY', False)
         self.cache_alias = settings.CACHE_MIDDLEWARE_ALIAS
         self.cache = get_cache(self.cache_alias)
+        self.single_key = settings.CACHE_MIDDLEWARE_SINGLE_KEY
+        self.stale_while_revalidate = settings.CACHE_MIDDLEWARE_STALE_WHILE_REVALIDATE
+        self.stale_if_error = settings.CACHE_MIDDLEWARE_STALE_IF_ERROR
 
     def _session_accessed(self, request):
         try:
@@ -88,8 +106,32 @@ class UpdateCacheMiddleware(object):
                 return False
         return True
 
+    def _release_lock(self, request):
+        lock_key = getattr(request, '_cache_lock_key', None)
+        if lock_key is not None:
+            self.cache.delete(lock_key)
+            request._cache_lock_key = None
+
+    def process_exception(self, request, exception):
+        """Serves the stale page, if any, instead of a server error."""
+        self._release_lock(request)
+        stale_response = getattr(request, '_cache_stale_response', None)
+        if stale_response is None or isinstance(exception, (Http404, PermissionDenied)):
+            return None
+        request._cache_update_cache = False
+        return stale_response
+
     def process_response(self, request, response):
         """Sets the cache, if needed."""
+        try:
+            return self._update_cache(request, response)
+        finally:
+            self._release_lock(request)
+
+    def _update_cache(self, request, response):
+        stale_response = getattr(request, '_cache_stale_response', None)
+        if stale_response is not None and response.status_code >= 500:
+            return stale_response
         if not self._should_update_cache(request, response):
             # We don't need to update the cache, just return.
             return response
@@ -105,14 +147,30 @@ class UpdateCacheMiddleware(object):
             # max-age was set to 0, don't bother caching.
             return response
         patch_response_headers(response, timeout)
+        # Fall back to the default grace periods.
+        stale_while_revalidate, stale_if_error = get_stale_periods(response)
+        grace_periods = {}
+        if stale_while_revalidate is None and self.stale_while_revalidate:
+            grace_periods['stale_while_revalidate'] = self.stale_while_revalidate
+        if stale_if_error is None and self.stale_if_error:
+            grace_periods['stale_if_error'] = self.stale_if_error
+        if grace_periods:
+            patch_cache_control(response, **grace_periods)
         if timeout:
-            cache_key = learn_cache_key(request, response, timeout, self.key_prefix, cache=self.cache)
+            if self.single_key:
+                store = lambda r: cache_response(request, r, timeout, self.key_prefix, cache=self.cache)
+            else:
+                # Keep the page in the cache while it may be served stale.
+                expiry = get_cache_expiry(response, timeout)
+                store_timeout = int(math.ceil(max(expiry) - time.time()))
+                cache_key = learn_cache_key(request, response, store_timeout, self.key_prefix, cache=self.cache)
+                def store(r):
+                    r._cache_expiry = expiry
+                    self.cache.set(cache_key, r, store_timeout)
             if hasattr(response, 'render') and callable(response.render):
-                response.add_post_render_callback(
-                    lambda r: self.cache.set(cache_key, r, timeout)
-                )
+                response.add_post_render_callback(store)
             else:
-                self.cache.set(cache_key, response, timeout)
+                store(response)
         return response
 
 class FetchFromCacheMiddleware(object):
@@ -129,16 +187,25 @@ class FetchFromCacheMiddleware(object):
         self.cache_anonymous_only = getattr(settings, 'CACHE_MIDDLEWARE_ANONYMOUS_ONLY', False)
         self.cache_alias = settings.CACHE_MIDDLEWARE_ALIAS
         self.cache = get_cache(self.cache_alias)
+        self.single_key = settings.CACHE_MIDDLEWARE_SINGLE_KEY
 
     def process_request(self, request):
         """
         Checks whether the page is already cached and returns the cached
         version if available.
         """
+        request._cache_stale_response = None
         if not request.method in ('GET', 'HEAD'):
             request._cache_update_cache = False
             return None # Don't bother checking the cache.
 
+        if self.single_key:
+            response = get_cached_response(request, self.key_prefix, cache=self.cache, stale=True)
+            if response is None:
+                request._cache_update_cache = True
+                return None
+            return self._check_expiry(request, response)
+
         # try and get the cached GET response
         cache_key = get_cache_key(request, self.key_prefix, 'GET', cache=self.cache)
         if cache_key is None:
@@ -154,9 +221,34 @@ class FetchFromCacheMiddleware(object):
             request._cache_update_cache = True
             return None # No cache information available, need to rebuild.
 
-        # hit, return cached response
-        request._cache_update_cache = False
-        return response
+        # hit, return cached response unless it's expired
+        return self._check_expiry(request, response)
+
+    def _check_expiry(self, request, response):
+        """
+        Returns the cached response if it's fresh. Otherwise, returns None to
+        have the page regenerated, or the stale response while another request
+        regenerates the page, and keeps the stale response to serve if the
+        view fails.
+        """
+        expiry = getattr(response, '_cache_expiry', None)
+        now = time.time()
+        if expiry is None or now < expiry[0]:
+            request._cache_update_cache = False
+            return response
+        expires, revalidate_until, error_until = expiry
+        if now < revalidate_until:
+            lock_key = get_cache_lock_key(request, self.key_prefix)
+            lock_timeout = int(math.ceil(revalidate_until - now))
+            if not self.cache.add(lock_key, True, lock_timeout):
+                # Another request is regenerating the page.
+                request._cache_update_cache = False
+                return response
+            request._cache_lock_key = lock_key
+        if now < error_until:
+            request._cache_stale_response = response
+        request._cache_update_cache = True
+        return None
 
 class CacheMiddleware(UpdateCacheMiddleware, FetchFromCacheMiddleware):
     """
@@ -203,3 +295,6 @@ class CacheMiddleware(UpdateCacheMiddleware, FetchFromCacheMiddleware):
 
         self.cache = get_cache(self.cache_alias, **cache_kwargs)
         self.cache_timeout = self.cache.default_timeout
+        self.single_key = settings.CACHE_MIDDLEWARE_SINGLE_KEY
+        self.stale_while_revalidate = settings.CACHE_MIDDLEWARE_STALE_WHILE_REVALIDATE
+        self.stale_if_error = settings.CACHE_MIDDLEWARE_STALE_IF_ERROR
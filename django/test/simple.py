@@ -1,7 +1,12 @@
+import errno
+import multiprocessing
+import os
+import sys
 import unittest as real_unittest
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
 from django.db.models import get_app, get_apps
 from django.test import _doctest as doctest
 from django.test.utils import setup_test_environment, teardown_test_environment
@@ -192,6 +197,203 @@ def reorder_suite(suite, classes):
     return bins[0]
 
 
+def partition_suite_by_case(suite):
+    """
+    Splits a test suite into a list of suites, one for each run of
+    consecutive tests of the same class, in the order of the suite.
+    """
+    groups = []
+    for test in iter_tests(suite):
+        if not groups or type(groups[-1][-1]) is not type(test):
+            groups.append([])
+        groups[-1].append(test)
+    return [unittest.TestSuite(tests) for tests in groups]
+
+
+def iter_tests(suite):
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            for subtest in iter_tests(test):
+                yield subtest
+        else:
+            yield test
+
+
+class RemoteTestResult(unittest.TestResult):
+    """
+    Records the outcome of the tests run in a worker process as a list of
+    picklable events, which refer to the tests by their position in the
+    suite, so that the parent process can replay them.
+    """
+    def __init__(self, tests):
+        super(RemoteTestResult, self).__init__()
+        self.positions = dict((id(test), i) for i, test in enumerate(tests))
+        self.events = []
+
+    def _position(self, test):
+        # Errors in setUpClass or setUpModule are reported for placeholders
+        # that aren't part of the suite; send their description instead.
+        return self.positions.get(id(test), str(test))
+
+    def startTest(self, test):
+        super(RemoteTestResult, self).startTest(test)
+        self.events.append(('startTest', self._position(test)))
+
+    def stopTest(self, test):
+        super(RemoteTestResult, self).stopTest(test)
+        self.events.append(('stopTest', self._position(test)))
+
+    def addSuccess(self, test):
+        super(RemoteTestResult, self).addSuccess(test)
+        self.events.append(('addSuccess', self._position(test)))
+
+    def addError(self, test, err):
+        super(RemoteTestResult, self).addError(test, err)
+        self.events.append(('addError', self._position(test), self.errors[-1][1]))
+
+    def addFailure(self, test, err):
+        super(RemoteTestResult, self).addFailure(test, err)
+        self.events.append(('addFailure', self._position(test), self.failures[-1][1]))
+
+    def addSkip(self, test, reason):
+        super(RemoteTestResult, self).addSkip(test, reason)
+        self.events.append(('addSkip', self._position(test), reason))
+
+    def addExpectedFailure(self, test, err):
+        super(RemoteTestResult, self).addExpectedFailure(test, err)
+        self.events.append(('addExpectedFailure', self._position(test),
+                            self.expectedFailures[-1][1]))
+
+    def addUnexpectedSuccess(self, test):
+        super(RemoteTestResult, self).addUnexpectedSuccess(test)
+        self.events.append(('addUnexpectedSuccess', self._position(test)))
+
+
+class ReplayTextTestResult(unittest.TextTestResult):
+    """
+    A text test result that accepts the tracebacks recorded by a
+    RemoteTestResult, already formatted, in place of exception info.
+    """
+    def _exc_info_to_string(self, err, test):
+        if isinstance(err, basestring):
+            return err
+        return super(ReplayTextTestResult, self)._exc_info_to_string(err, test)
+
+
+class _RemoteTestPlaceholder(object):
+    def __init__(self, description):
+        self.description = description
+
+    def __str__(self):
+        return self.description
+
+    def shortDescription(self):
+        return None
+
+
+# The state of a worker process of a ParallelTestSuite.
+_worker_subsuites = None
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError, e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+def _take_clone_slot(owners):
+    """
+    Returns the number, from 1, of a set of copies of the test databases no
+    other worker uses, and records the current process as its owner in
+    ``owners``, a shared array of process ids.
+
+    The pool replaces the workers which die, and a worker which dies can't
+    give its slot back: the slot of a process which no longer exists is
+    free again.
+    """
+    with owners.get_lock():
+        for index, pid in enumerate(owners):
+            if not pid or not _process_exists(pid):
+                owners[index] = os.getpid()
+                return index + 1
+    raise RuntimeError("All the copies of the test databases are in use.")
+
+
+def _init_worker(owners, subsuites, clones):
+    """
+    Switches the connections of a new worker process to its own copies of
+    the test databases. In-memory databases were copied by the fork.
+    """
+    global _worker_subsuites
+    _worker_subsuites = subsuites
+    worker_id = _take_clone_slot(owners)
+    for alias in connections:
+        connection = connections[alias]
+        names = clones.get(connection.settings_dict['NAME'])
+        if names:
+            connection.close()
+            connection.settings_dict['NAME'] = names[worker_id - 1]
+
+
+def _run_subsuite(args):
+    index, failfast = args
+    subsuite = _worker_subsuites[index]
+    result = RemoteTestResult(list(subsuite))
+    result.failfast = failfast
+    subsuite.run(result)
+    return index, result.events
+
+
+class ParallelTestSuite(unittest.TestSuite):
+    """
+    Runs the tests of a suite in a pool of worker processes, one class of
+    tests at a time, and reports their outcome to the result passed to run()
+    as if they had run in this process.
+
+    ``clones`` maps the name of each test database to the names of its
+    copies, one per worker.
+    """
+    def __init__(self, suite, processes, clones, failfast=False):
+        super(ParallelTestSuite, self).__init__()
+        self.subsuites = partition_suite_by_case(suite)
+        self.processes = processes
+        self.clones = clones
+        self.failfast = failfast
+
+    def __iter__(self):
+        return iter(self.subsuites)
+
+    def run(self, result):
+        # The workers must not share the connections of this process.
+        for connection in connections.all():
+            connection.close()
+        owners = multiprocessing.Array('i', self.processes)
+        pool = multiprocessing.Pool(self.processes, _init_worker,
+                                    (owners, self.subsuites, self.clones))
+        args = [(index, self.failfast) for index in range(len(self.subsuites))]
+        try:
+            for index, events in pool.imap_unordered(_run_subsuite, args):
+                self.replay(result, list(self.subsuites[index]), events)
+                if result.shouldStop:
+                    pool.terminate()
+                    break
+        finally:
+            pool.close()
+            pool.join()
+        return result
+
+    def replay(self, result, tests, events):
+        for event in events:
+            name, position = event[:2]
+            if isinstance(position, basestring):
+                test = _RemoteTestPlaceholder(position)
+            else:
+                test = tests[position]
+            getattr(result, name)(test, *event[2:])
+
+
 def dependency_ordered(test_databases, dependencies):
     """
     Reorder test_databases into an order that honors the dependencies
@@ -234,11 +436,24 @@ def dependency_ordered(test_databases, dependencies):
     return ordered_test_databases
 
 
+# The suffix of the copy of a test database the tests run on in template mode.
+TEMPLATE_COPY_SUFFIX = 'copy'
+
+
 class DjangoTestSuiteRunner(object):
-    def __init__(self, verbosity=1, interactive=True, failfast=True, **kwargs):
+    def __init__(self, verbosity=1, interactive=True, failfast=True,
+                 keepdb=False, parallel=0, template=False, **kwargs):
         self.verbosity = verbosity
         self.interactive = interactive
         self.failfast = failfast
+        self.keepdb = keepdb
+        self.parallel = parallel
+        self.template = template
+        # Maps the names of the test databases to their copies.
+        self.clones = {}
+        # Maps the names of the copies the tests run on in template mode to
+        # the names of the kept test databases.
+        self.templates = {}
 
     def setup_test_environment(self, **kwargs):
         setup_test_environment()
@@ -298,6 +513,30 @@ class DjangoTestSuiteRunner(object):
                         dependencies[alias] = connection.settings_dict.get(
                             'TEST_DEPENDENCIES', [DEFAULT_DB_ALIAS])
 
+        if self.parallel > 1:
+            for alias in connections:
+                connection = connections[alias]
+                if (not connection.settings_dict['TEST_MIRROR'] and
+                        not connection.features.can_clone_databases):
+                    sys.stderr.write(
+                        "The %s backend can't copy test databases; running "
+                        "the tests in a single process.\n" % connection.vendor)
+                    self.parallel = 0
+                    break
+
+        if self.template:
+            for alias in connections:
+                connection = connections[alias]
+                if (not connection.settings_dict['TEST_MIRROR'] and
+                        not connection.features.can_clone_databases):
+                    sys.stderr.write(
+                        "The %s backend can't copy test databases; running "
+                        "the tests on the kept test databases.\n"
+                        % connection.vendor)
+                    self.template = False
+                    self.keepdb = True
+                    break
+
         # Second pass -- actually create the databases.
         old_names = []
         mirrors = []
@@ -312,7 +551,28 @@ class DjangoTestSuiteRunner(object):
                 old_names.append((connection, db_name, True))
                 if test_db_name is None:
                     test_db_name = connection.creation.create_test_db(
-                            self.verbosity, autoclobber=not self.interactive)
+                            self.verbosity, autoclobber=not self.interactive,
+                            keepdb=self.keepdb or self.template)
+                    if test_db_name == ':memory:':
+                        # In-memory databases are copied by forking, and
+                        # can't be kept.
+                        pass
+                    elif self.parallel > 1:
+                        self.clones[test_db_name] = [
+                            connection.creation.clone_test_db(
+                                index, self.verbosity,
+                                autoclobber=not self.interactive)['NAME']
+                            for index in range(1, self.parallel + 1)]
+                    elif self.template:
+                        # Run the tests on a copy, so that the kept test
+                        # database is never modified by them.
+                        copy_name = connection.creation.clone_test_db(
+                            TEMPLATE_COPY_SUFFIX, self.verbosity,
+                            autoclobber=not self.interactive)['NAME']
+                        self.templates[copy_name] = test_db_name
+                        connection.close()
+                        test_db_name = copy_name
+                        connection.settings_dict['NAME'] = test_db_name
                 else:
                     connection.settings_dict['NAME'] = test_db_name
 
@@ -325,6 +585,12 @@ class DjangoTestSuiteRunner(object):
         return old_names, mirrors
 
     def run_suite(self, suite, **kwargs):
+        if self.parallel > 1:
+            return unittest.TextTestRunner(
+                verbosity=self.verbosity, failfast=self.failfast,
+                resultclass=ReplayTextTestResult).run(
+                    ParallelTestSuite(suite, self.parallel, self.clones,
+                                      self.failfast))
         return unittest.TextTestRunner(
             verbosity=self.verbosity, failfast=self.failfast).run(suite)
 
@@ -333,9 +599,24 @@ class DjangoTestSuiteRunner(object):
         Destroys all the non-mirror databases.
         """
         old_names, mirrors = old_config
+        destroyed_copies = set()
         for connection, old_name, destroy in old_names:
+            copy_name = connection.settings_dict['NAME']
+            if copy_name in self.templates:
+                connection.close()
+                connection.settings_dict['NAME'] = self.templates[copy_name]
+                if destroy and copy_name not in destroyed_copies:
+                    destroyed_copies.add(copy_name)
+                    connection.creation.destroy_test_db_clone(
+                        TEMPLATE_COPY_SUFFIX, self.verbosity)
+            if destroy and self.clones.pop(connection.settings_dict['NAME'], None):
+                for index in range(1, self.parallel + 1):
+                    connection.creation.destroy_test_db_clone(
+                        index, self.verbosity)
             if destroy:
-                connection.creation.destroy_test_db(old_name, self.verbosity)
+                connection.creation.destroy_test_db(
+                    old_name, self.verbosity,
+                    keepdb=self.keepdb or self.template)
 
     def teardown_test_environment(self, **kwargs):
         unittest.removeHandler()
@@ -2,7 +2,7 @@ import difflib
 import os
 import re
 import sys
-from copy import copy
+from copy import copy, deepcopy
 from functools import wraps
 from urlparse import urlsplit, urlunsplit
 from xml.dom.minidom import parseString, Node
@@ -798,51 +798,162 @@ class TestCase(TransactionTestCase):
     to do nothing, and rollsback the test transaction at the end of the test.
     You have to use TransactionTestCase, if you need transaction management
     inside a test.
-    """
 
-    def _fixture_setup(self):
-        if not connections_support_transactions():
-            return super(TestCase, self)._fixture_setup()
+    When every database supports savepoints, the transaction is opened once
+    per class, by its first test: fixtures are loaded and setUpTestData() is
+    called in it, and each test runs inside a savepoint that is rolled back at
+    its end.
+    """
+    # True when the tests of the class share a transaction, None until the
+    # first test of the class opens it.
+    _class_transaction = False
 
+    @classmethod
+    def _databases_names(cls):
         # If the test case has a multi_db=True flag, setup all databases.
         # Otherwise, just use default.
-        if getattr(self, 'multi_db', False):
-            databases = connections
-        else:
-            databases = [DEFAULT_DB_ALIAS]
+        if getattr(cls, 'multi_db', False):
+            return [conn.alias for conn in connections.all()]
+        return [DEFAULT_DB_ALIAS]
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestCase, cls).setUpClass()
+        # The class transaction isn't opened here: unittest doesn't call
+        # tearDownClass() if the setUpClass() of a subclass fails, and the
+        # transaction would be left open for the following classes.
+        cls._class_transaction = None
 
+    @classmethod
+    def _open_class_transaction(cls):
+        cls._class_transaction = False
+        if not connections_support_transactions():
+            return
+        databases = cls._databases_names()
+        cls._enter_transaction(databases)
+        for db in databases:
+            connections[db].start_test_transaction()
+        if not all(connections[db].features.uses_savepoints for db in databases):
+            cls._leave_class_transaction(databases)
+            return
+        cls._class_transaction = True
+        try:
+            cls._load_fixtures(databases)
+            attrs = cls.__dict__.copy()
+            cls.setUpTestData()
+            cls._test_data = [name for name, value in cls.__dict__.items()
+                              if name not in attrs or attrs[name] is not value]
+            cls._replaced_test_data = dict((name, attrs[name])
+                for name in cls._test_data if name in attrs)
+        except Exception:
+            cls._class_transaction = False
+            cls._leave_class_transaction(databases)
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls._class_transaction:
+            for name in cls._test_data:
+                if name in cls._replaced_test_data:
+                    setattr(cls, name, cls._replaced_test_data[name])
+                else:
+                    delattr(cls, name)
+            cls._leave_class_transaction(cls._databases_names())
+        cls._class_transaction = False
+        super(TestCase, cls).tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        """
+        Creates the data shared by all the tests of the class. It is called
+        once per class when the database supports savepoints, and before each
+        test otherwise. Attributes set on the class here are copied for each
+        test, so that tests can modify them freely.
+        """
+        pass
+
+    @classmethod
+    def _enter_transaction(cls, databases):
         for db in databases:
             transaction.enter_transaction_management(using=db)
             transaction.managed(True, using=db)
         disable_transaction_methods()
 
+    @classmethod
+    def _leave_transaction(cls, databases):
+        restore_transaction_methods()
+        for db in databases:
+            transaction.rollback(using=db)
+            transaction.leave_transaction_management(using=db)
+
+    @classmethod
+    def _leave_class_transaction(cls, databases):
+        for db in databases:
+            connections[db].end_test_transaction()
+        cls._leave_transaction(databases)
+
+    @classmethod
+    def _load_fixtures(cls, databases):
         from django.contrib.sites.models import Site
         Site.objects.clear_cache()
 
         for db in databases:
-            if hasattr(self, 'fixtures'):
-                call_command('loaddata', *self.fixtures,
+            if hasattr(cls, 'fixtures'):
+                call_command('loaddata', *cls.fixtures,
                              **{
                                 'verbosity': 0,
                                 'commit': False,
                                 'database': db
                              })
 
+    def _fixture_setup(self):
+        if self._class_transaction is None:
+            self.__class__._open_class_transaction()
+        if self._class_transaction:
+            # Give each test its own copy of the data created by
+            # setUpTestData(), so that changes don't leak into other tests.
+            # Values which can't be copied are an error: sharing them would
+            # let a test see the changes made by the previous ones.
+            memo = {}
+            for name in self._test_data:
+                setattr(self, name, deepcopy(getattr(self.__class__, name), memo))
+            self._savepoints = [(db, connections[db].savepoint())
+                                for db in self._databases_names()]
+            from django.contrib.sites.models import Site
+            Site.objects.clear_cache()
+            return
+
+        if not connections_support_transactions():
+            super(TestCase, self)._fixture_setup()
+            self.setUpTestData()
+            return
+
+        databases = self._databases_names()
+        self._enter_transaction(databases)
+        self._load_fixtures(databases)
+        self.setUpTestData()
+
     def _fixture_teardown(self):
+        if self._class_transaction:
+            # Roll back the savepoints directly: set_clean() may have reset
+            # the savepoint counters during the test.
+            for db, sid in reversed(self._savepoints):
+                conn = connections[db]
+                conn._savepoint_rollback(sid)
+                conn._savepoint_commit(sid)
+            return
+
         if not connections_support_transactions():
             return super(TestCase, self)._fixture_teardown()
 
-        # If the test case has a multi_db=True flag, teardown all databases.
-        # Otherwise, just teardown default.
-        if getattr(self, 'multi_db', False):
-            databases = connections
-        else:
-            databases = [DEFAULT_DB_ALIAS]
+        self._leave_transaction(self._databases_names())
 
-        restore_transaction_methods()
-        for db in databases:
-            transaction.rollback(using=db)
-            transaction.leave_transaction_management(using=db)
+    def _post_teardown(self):
+        if not self._class_transaction:
+            return super(TestCase, self)._post_teardown()
+        # The connections hold the class transaction and can't be closed.
+        self._fixture_teardown()
+        self._urlconf_teardown()
 
 
 def _deferredSkip(condition, reason):
@@ -66,10 +66,14 @@ def setup_test_environment():
         - Installing the instrumented test renderer
         - Set the email backend to the locmem email backend.
         - Setting the active locale to match the LANGUAGE_CODE setting.
+        - Caching the fixtures parsed by loaddata.
     """
     Template.original_render = Template._render
     Template._render = instrumented_test_render
 
+    from django.core.management.commands import loaddata
+    loaddata.fixture_cache = loaddata.FixtureCache()
+
     mail.original_email_backend = settings.EMAIL_BACKEND
     settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
@@ -83,11 +87,15 @@ def teardown_test_environment():
 
         - Restoring the original test renderer
         - Restoring the email sending functions
+        - Discarding the fixture cache
 
     """
     Template._render = Template.original_render
     del Template.original_render
 
+    from django.core.management.commands import loaddata
+    loaddata.fixture_cache = None
+
     settings.EMAIL_BACKEND = mail.original_email_backend
     del mail.original_email_backend
 
@@ -18,11 +18,13 @@ An example: i18n middleware would need to distinguish caches by the
 """
 
 import hashlib
+import math
 import re
 import time
 
 from django.conf import settings
 from django.core.cache import get_cache
+from django.http import HttpResponse
 from django.utils.encoding import smart_str, iri_to_uri, force_unicode
 from django.utils.http import http_date
 from django.utils.timezone import get_current_timezone_name
@@ -30,6 +32,11 @@ from django.utils.translation import get_language
 
 cc_delim_re = re.compile(r'\s*,\s*')
 
+# The version of the layout of the page cache entries stored by
+# cache_response(), and the maximum number of variants of a page they hold.
+CACHE_ENTRY_VERSION = 2
+CACHE_ENTRY_MAX_VARIANTS = 10
+
 def patch_cache_control(response, **kwargs):
     """
     This function patches the Cache-Control header by adding all
@@ -41,6 +48,9 @@ def patch_cache_control(response, **kwargs):
       true value), only the parameter name is added to the header.
     * All other parameters are added with their value, after applying
       str() to it.
+
+    If the header already has a max-age, stale-while-revalidate or
+    stale-if-error directive, the shortest of the two durations is kept.
     """
     def dictitem(s):
         t = s.split('=', 1)
@@ -66,6 +76,13 @@ def patch_cache_control(response, **kwargs):
     # a decorator and a piece of middleware both operate on a given view.
     if 'max-age' in cc and 'max_age' in kwargs:
         kwargs['max_age'] = min(cc['max-age'], kwargs['max_age'])
+    for directive in ('stale_while_revalidate', 'stale_if_error'):
+        name = directive.replace('_', '-')
+        if name in cc and directive in kwargs:
+            try:
+                kwargs[directive] = min(int(cc[name]), int(kwargs[directive]))
+            except (ValueError, TypeError):
+                pass
 
     # Allow overriding private caching and vice versa
     if 'private' in cc and 'public' in kwargs:
@@ -78,21 +95,46 @@ def patch_cache_control(response, **kwargs):
     cc = ', '.join([dictvalue(el) for el in cc.items()])
     response['Cache-Control'] = cc
 
-def get_max_age(response):
-    """
-    Returns the max-age from the response Cache-Control header as an integer
-    (or ``None`` if it wasn't found or wasn't an integer.
-    """
+def _get_cache_control_seconds(response, directive):
     if not response.has_header('Cache-Control'):
         return
     cc = dict([_to_tuple(el) for el in
         cc_delim_re.split(response['Cache-Control'])])
-    if 'max-age' in cc:
+    if directive in cc:
         try:
-            return int(cc['max-age'])
+            return int(cc[directive])
         except (ValueError, TypeError):
             pass
 
+def get_max_age(response):
+    """
+    Returns the max-age from the response Cache-Control header as an integer
+    (or ``None`` if it wasn't found or wasn't an integer.
+    """
+    return _get_cache_control_seconds(response, 'max-age')
+
+def get_stale_periods(response):
+    """
+    Returns the stale-while-revalidate and stale-if-error durations from the
+    response Cache-Control header as integers (or ``None`` for each one that
+    wasn't found or wasn't an integer).
+    """
+    return (_get_cache_control_seconds(response, 'stale-while-revalidate'),
+            _get_cache_control_seconds(response, 'stale-if-error'))
+
+def get_cache_expiry(response, cache_timeout):
+    """
+    Returns the times until which a response cached for cache_timeout
+    seconds may be served: as a fresh response, as a stale response while
+    it's being regenerated, and as a stale response when regenerating it
+    fails. The last two follow the stale-while-revalidate and stale-if-error
+    directives of the response Cache-Control header.
+    """
+    expires = time.time() + cache_timeout
+    stale_while_revalidate, stale_if_error = get_stale_periods(response)
+    return (expires, expires + max(stale_while_revalidate or 0, 0),
+            expires + max(stale_if_error or 0, 0))
+
 def _set_response_etag(response):
     response['ETag'] = '"%s"' % hashlib.md5(response.content).hexdigest()
     return response
@@ -173,16 +215,41 @@ def _i18n_cache_key_suffix(request, cache_key):
         cache_key += '.%s' % tz_name.encode('ascii', 'ignore').replace(' ', '_')
     return cache_key
 
-def _generate_cache_key(request, method, headerlist, key_prefix):
-    """Returns a cache key from the headers given in the header list."""
+def _hash_headers(request, headerlist):
+    """Returns a hash of the values of the headers given in the header list."""
     ctx = hashlib.md5()
     for header in headerlist:
         value = request.META.get(header, None)
         if value is not None:
             ctx.update(value)
+    return ctx.hexdigest()
+
+def _generate_cache_key(request, method, headerlist, key_prefix):
+    """Returns a cache key from the headers given in the header list."""
     path = hashlib.md5(iri_to_uri(request.get_full_path()))
     cache_key = 'views.decorators.cache.cache_page.%s.%s.%s.%s' % (
-        key_prefix, method, path.hexdigest(), ctx.hexdigest())
+        key_prefix, method, path.hexdigest(), _hash_headers(request, headerlist))
+    return _i18n_cache_key_suffix(request, cache_key)
+
+def _generate_cache_entry_key(key_prefix, request):
+    """Returns a cache key for the entry holding all variants of a page."""
+    path = hashlib.md5(iri_to_uri(request.get_full_path()))
+    cache_key = 'views.decorators.cache.cache_entry.%s.%s' % (
+        key_prefix, path.hexdigest())
+    return _i18n_cache_key_suffix(request, cache_key)
+
+def _vary_headerlist(response):
+    """Returns the request headers named in the Vary header of the response."""
+    if response.has_header('Vary'):
+        return ['HTTP_'+header.upper().replace('-', '_')
+                for header in cc_delim_re.split(response['Vary'])]
+    return []
+
+def _generate_cache_lock_key(key_prefix, request):
+    """Returns a cache key for the lock taken while a page is regenerated."""
+    path = hashlib.md5(iri_to_uri(request.get_full_path()))
+    cache_key = 'views.decorators.cache.cache_lock.%s.%s' % (
+        key_prefix, path.hexdigest())
     return _i18n_cache_key_suffix(request, cache_key)
 
 def _generate_cache_header_key(key_prefix, request):
@@ -233,16 +300,97 @@ def learn_cache_key(request, response, cache_timeout=None, key_prefix=None, cach
     cache_key = _generate_cache_header_key(key_prefix, request)
     if cache is None:
         cache = get_cache(settings.CACHE_MIDDLEWARE_ALIAS)
-    if response.has_header('Vary'):
-        headerlist = ['HTTP_'+header.upper().replace('-', '_')
-                      for header in cc_delim_re.split(response['Vary'])]
-        cache.set(cache_key, headerlist, cache_timeout)
-        return _generate_cache_key(request, request.method, headerlist, key_prefix)
+    # if there is no Vary header, we still need a cache key
+    # for the request.get_full_path()
+    headerlist = _vary_headerlist(response)
+    cache.set(cache_key, headerlist, cache_timeout)
+    return _generate_cache_key(request, request.method, headerlist, key_prefix)
+
+def get_cache_lock_key(request, key_prefix=None):
+    """
+    Returns the cache key of the lock which the cache middleware takes while
+    it regenerates a stale page.
+    """
+    if key_prefix is None:
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    return _generate_cache_lock_key(key_prefix, request)
+
+def get_cached_response(request, key_prefix=None, cache=None, stale=False):
+    """
+    Returns the response to the request stored by cache_response(), or None.
+    Responses to GET requests are also returned for HEAD requests.
+
+    If stale is True, expired responses are returned too while they may be
+    served stale, with the times returned by get_cache_expiry() in their
+    ``_cache_expiry`` attribute.
+
+    Unlike get_cache_key(), this makes a single cache lookup: the list of
+    headers the page varies on and all the variants of the page are stored
+    in the same cache entry.
+    """
+    if key_prefix is None:
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    if cache is None:
+        cache = get_cache(settings.CACHE_MIDDLEWARE_ALIAS)
+    entry = cache.get(_generate_cache_entry_key(key_prefix, request))
+    if entry is None or entry[0] != CACHE_ENTRY_VERSION:
+        return None
+    version, headerlist, variants = entry
+    headers_hash = _hash_headers(request, headerlist)
+    methods = ['GET', 'HEAD'] if request.method == 'HEAD' else ['GET']
+    for method in methods:
+        variant = variants.get((method, headers_hash))
+        if variant is None:
+            continue
+        expiry, status_code, headers, content = variant
+        if (max(expiry) if stale else expiry[0]) > time.time():
+            response = HttpResponse(content, status=status_code)
+            del response['Content-Type']
+            for header, value in headers:
+                response[header] = value
+            response._cache_expiry = expiry
+            return response
+    return None
+
+def cache_response(request, response, cache_timeout=None, key_prefix=None, cache=None):
+    """
+    Stores the response to the request in the cache entry holding the
+    variants of the page, for get_cached_response(). Only the status code,
+    headers and content of the response are stored, without its cookies.
+
+    The entry keeps CACHE_ENTRY_MAX_VARIANTS variants at most, and is reset
+    when the response varies on other headers than the stored variants.
+    Variants are kept after they expire for as long as they may be served
+    stale, per get_cache_expiry().
+    """
+    if key_prefix is None:
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    if cache_timeout is None:
+        cache_timeout = settings.CACHE_MIDDLEWARE_SECONDS
+    if cache is None:
+        cache = get_cache(settings.CACHE_MIDDLEWARE_ALIAS)
+    if response._base_content_is_iter:
+        # Reading the content would consume the iterator.
+        return
+    cache_key = _generate_cache_entry_key(key_prefix, request)
+    headerlist = _vary_headerlist(response)
+    entry = cache.get(cache_key)
+    if entry is not None and entry[0] == CACHE_ENTRY_VERSION and entry[1] == headerlist:
+        variants = entry[2]
     else:
-        # if there is no Vary header, we still need a cache key
-        # for the request.get_full_path()
-        cache.set(cache_key, [], cache_timeout)
-        return _generate_cache_key(request, request.method, [], key_prefix)
+        variants = {}
+    now = time.time()
+    variants = dict((key, variant) for key, variant in variants.iteritems()
+                    if max(variant[0]) > now)
+    variants[(request.method, _hash_headers(request, headerlist))] = (
+        get_cache_expiry(response, cache_timeout), response.status_code,
+        response.items(), response.content)
+    if len(variants) > CACHE_ENTRY_MAX_VARIANTS:
+        # Drop the variants which expire first.
+        for key in sorted(variants, key=lambda key: max(variants[key][0]))[:-CACHE_ENTRY_MAX_VARIANTS]:
+            del variants[key]
+    timeout = max(max(variant[0]) for variant in variants.values()) - now
+    cache.set(cache_key, (CACHE_ENTRY_VERSION, headerlist, variants), int(math.ceil(timeout)))
 
 
 def _to_tuple(s):
@@ -52,6 +52,11 @@ class A(models.Model):
     child_setnull = models.ForeignKey(RChild, on_delete=models.SET_NULL, null=True,
         related_name="child_setnull")
 
+    db_cascade = models.ForeignKey(R, on_delete=models.DB_CASCADE,
+        related_name='db_cascade_set')
+    db_setnull = models.ForeignKey(R, on_delete=models.DB_SET_NULL, null=True,
+        related_name='db_setnull_set')
+
     # A OneToOneField is just a ForeignKey unique=True, so we don't duplicate
     # all the tests; just one smoke test to ensure on_delete works for it as
     # well.
@@ -63,7 +68,7 @@ def create_a(name):
     a = A(name=name)
     for name in ('auto', 'auto_nullable', 'setvalue', 'setnull', 'setdefault',
                  'setdefault_none', 'cascade', 'cascade_nullable', 'protect',
-                 'donothing', 'o2o_setnull'):
+                 'donothing', 'db_cascade', 'db_setnull', 'o2o_setnull'):
         r = R.objects.create()
         setattr(a, name, r)
     a.child = RChild.objects.create()
@@ -90,6 +95,15 @@ class MRNull(models.Model):
     r = models.ForeignKey(R, null=True, on_delete=models.SET_NULL)
 
 
+class B(models.Model):
+    r = models.ForeignKey(R, on_delete=models.DB_CASCADE, related_name='b_set')
+
+
+class C(models.Model):
+    # Deleting a B must delete its Cs in Python.
+    b = models.ForeignKey(B)
+
+
 class Avatar(models.Model):
     pass
 
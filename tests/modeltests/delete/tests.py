@@ -1,9 +1,11 @@
 from __future__ import absolute_import
 
-from django.db import models, IntegrityError
+from django.core.management.color import no_style
+from django.db import models, connection, IntegrityError
+from django.db.models.deletion import Collector
 from django.test import TestCase, skipUnlessDBFeature, skipIfDBFeature
 
-from .models import (R, RChild, S, T, U, A, M, MR, MRNull,
+from .models import (R, RChild, S, T, U, A, B, C, M, MR, MRNull,
     create_a, get_default_r, User, Avatar, HiddenUser, HiddenUserProfile)
 
 
@@ -55,6 +57,78 @@ class OnDeleteTests(TestCase):
         a.cascade_nullable.delete()
         self.assertFalse(A.objects.filter(name='cascade_nullable').exists())
 
+    def test_db_cascade(self):
+        a = create_a('db_cascade')
+        a.db_cascade.delete()
+        self.assertFalse(A.objects.filter(name='db_cascade').exists())
+
+    def test_db_setnull(self):
+        a = create_a('db_setnull')
+        a.db_setnull.delete()
+        a = A.objects.get(pk=a.pk)
+        self.assertEqual(None, a.db_setnull)
+
+    def test_db_on_delete_sql(self):
+        creation = connection.creation
+        self.assertEqual(creation.sql_for_on_delete(
+            A._meta.get_field('db_cascade'), no_style()), ' ON DELETE CASCADE')
+        self.assertEqual(creation.sql_for_on_delete(
+            A._meta.get_field('db_setnull'), no_style()), ' ON DELETE SET NULL')
+        self.assertEqual(creation.sql_for_on_delete(
+            A._meta.get_field('cascade'), no_style()), '')
+
+    @skipUnlessDBFeature('supports_foreign_key_actions')
+    def test_db_on_delete_not_collected(self):
+        a = create_a('db_collect')
+        collector = Collector(using=connection.alias)
+        collector.collect([a.db_cascade, a.db_setnull])
+        self.assertNotIn(A, collector.data)
+        self.assertNotIn(A, collector.field_updates)
+
+    @skipIfDBFeature('supports_foreign_key_actions')
+    def test_db_on_delete_emulated(self):
+        a = create_a('db_collect')
+        collector = Collector(using=connection.alias)
+        collector.collect([a.db_cascade, a.db_setnull])
+        self.assertIn(a, collector.data[A])
+        self.assertIn(A, collector.field_updates)
+
+    def test_db_cascade_collected_with_receivers(self):
+        # The database doesn't send signals, so objects whose model has
+        # delete receivers are collected.
+        def receiver(sender, **kwargs):
+            pass
+        a = create_a('db_receivers')
+        features = connection.features
+        old = features.supports_foreign_key_actions
+        features.supports_foreign_key_actions = True
+        models.signals.post_delete.connect(receiver, sender=A)
+        try:
+            collector = Collector(using=connection.alias)
+            collector.collect([a.db_cascade])
+            self.assertIn(a, collector.data[A])
+        finally:
+            models.signals.post_delete.disconnect(receiver, sender=A)
+            features.supports_foreign_key_actions = old
+
+    def test_db_cascade_collected_with_python_relations(self):
+        # Objects with related objects handled in Python are collected.
+        r = R.objects.create()
+        b = B.objects.create(r=r)
+        c = C.objects.create(b=b)
+        features = connection.features
+        old = features.supports_foreign_key_actions
+        features.supports_foreign_key_actions = True
+        try:
+            collector = Collector(using=connection.alias)
+            collector.collect([r])
+            self.assertIn(b, collector.data[B])
+            self.assertIn(c, collector.data[C])
+        finally:
+            features.supports_foreign_key_actions = old
+        r.delete()
+        self.assertFalse(C.objects.exists())
+
     def test_protect(self):
         a = create_a('protect')
         self.assertRaises(IntegrityError, a.protect.delete)
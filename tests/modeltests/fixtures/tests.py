@@ -1,13 +1,16 @@
 from __future__ import absolute_import
 
+import os
+import shutil
 import StringIO
+import tempfile
 
 from django.contrib.sites.models import Site
-from django.core import management
+from django.core import management, serializers
 from django.db import connection
 from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
 
-from .models import Article, Book, Spy, Tag, Visa
+from .models import Article, Book, Category, Person, Spy, Tag, Visa
 
 
 class TestCaseFixtureLoadingTests(TestCase):
@@ -155,6 +158,30 @@ class FixtureLoadingTests(TestCase):
         self._dumpdata_assert(['fixtures'], """<?xml version="1.0" encoding="utf-8"?>
 <django-objects version="1.0"><object pk="1" model="fixtures.category"><field type="CharField" name="title">News Stories</field><field type="TextField" name="description">Latest news stories</field></object><object pk="5" model="fixtures.article"><field type="CharField" name="headline">XML identified as leading cause of cancer</field><field type="DateTimeField" name="pub_date">2006-06-16T16:00:00</field></object><object pk="4" model="fixtures.article"><field type="CharField" name="headline">Django conquers world!</field><field type="DateTimeField" name="pub_date">2006-06-16T15:00:00</field></object><object pk="3" model="fixtures.article"><field type="CharField" name="headline">Copyright is fine the way it is</field><field type="DateTimeField" name="pub_date">2006-06-16T14:00:00</field></object><object pk="2" model="fixtures.article"><field type="CharField" name="headline">Poker on TV is great!</field><field type="DateTimeField" name="pub_date">2006-06-16T11:00:00</field></object><object pk="1" model="fixtures.tag"><field type="CharField" name="name">copyright</field><field to="contenttypes.contenttype" name="tagged_type" rel="ManyToOneRel"><natural>fixtures</natural><natural>article</natural></field><field type="PositiveIntegerField" name="tagged_id">3</field></object><object pk="2" model="fixtures.tag"><field type="CharField" name="name">legal</field><field to="contenttypes.contenttype" name="tagged_type" rel="ManyToOneRel"><natural>fixtures</natural><natural>article</natural></field><field type="PositiveIntegerField" name="tagged_id">3</field></object><object pk="3" model="fixtures.tag"><field type="CharField" name="name">django</field><field to="contenttypes.contenttype" name="tagged_type" rel="ManyToOneRel"><natural>fixtures</natural><natural>article</natural></field><field type="PositiveIntegerField" name="tagged_id">4</field></object><object pk="4" model="fixtures.tag"><field type="CharField" name="name">world domination</field><field to="contenttypes.contenttype" name="tagged_type" rel="ManyToOneRel"><natural>fixtures</natural><natural>article</natural></field><field type="PositiveIntegerField" name="tagged_id">4</field></object><object pk="3" model="fixtures.person"><field type="CharField" name="name">Artist formerly known as "Prince"</field></object><object pk="1" model="fixtures.person"><field type="CharField" name="name">Django Reinhardt</field></object><object pk="2" model="fixtures.person"><field type="CharField" name="name">Stephane Grappelli</field></object><object pk="1" model="fixtures.visa"><field to="fixtures.person" name="person" rel="ManyToOneRel"><natural>Django Reinhardt</natural></field><field to="auth.permission" name="permissions" rel="ManyToManyRel"><object><natural>add_user</natural><natural>auth</natural><natural>user</natural></object><object><natural>change_user</natural><natural>auth</natural><natural>user</natural></object><object><natural>delete_user</natural><natural>auth</natural><natural>user</natural></object></field></object><object pk="2" model="fixtures.visa"><field to="fixtures.person" name="person" rel="ManyToOneRel"><natural>Stephane Grappelli</natural></field><field to="auth.permission" name="permissions" rel="ManyToManyRel"><object><natural>add_user</natural><natural>auth</natural><natural>user</natural></object><object><natural>delete_user</natural><natural>auth</natural><natural>user</natural></object></field></object><object pk="3" model="fixtures.visa"><field to="fixtures.person" name="person" rel="ManyToOneRel"><natural>Artist formerly known as "Prince"</natural></field><field to="auth.permission" name="permissions" rel="ManyToManyRel"><object><natural>change_user</natural><natural>auth</natural><natural>user</natural></object></field></object><object pk="10" model="fixtures.book"><field type="CharField" name="name">Achieving self-awareness of Python programs</field><field to="fixtures.person" name="authors" rel="ManyToManyRel"></field></object><object pk="1" model="fixtures.book"><field type="CharField" name="name">Music for all ages</field><field to="fixtures.person" name="authors" rel="ManyToManyRel"><object><natural>Artist formerly known as "Prince"</natural></object><object><natural>Django Reinhardt</natural></object></field></object></django-objects>""", format='xml', natural_keys=True)
 
+    def test_bulk_loading(self):
+        Site.objects.all().delete()
+        management.call_command('loaddata', 'fixture1.json', verbosity=0, commit=False, bulk=True)
+        self.assertQuerysetEqual(Article.objects.all(), [
+            '<Article: Time to reform copyright>',
+            '<Article: Poker has no place on ESPN>',
+        ])
+        self.assertEqual(Site.objects.get().domain, 'example.com')
+
+        # Foreign keys and generic relations.
+        management.call_command('loaddata', 'fixture6.json', verbosity=0, commit=False, bulk=True)
+        self.assertQuerysetEqual(Tag.objects.all(), [
+            '<Tag: <Article: Time to reform copyright> tagged "copyright">',
+            '<Tag: <Article: Time to reform copyright> tagged "law">'
+        ])
+
+        # Many-to-many data is inserted in bulk as well.
+        management.call_command('loaddata', 'fixture8.json', verbosity=0, commit=False, bulk=True)
+        self.assertQuerysetEqual(Visa.objects.all(), [
+            '<Visa: Django Reinhardt Can add user, Can change user, Can delete user>',
+            '<Visa: Stephane Grappelli Can add user>',
+            '<Visa: Prince >'
+        ])
+
     def test_dumpdata_with_excludes(self):
         # Load fixture1 which has a site, two articles, and a category
         Site.objects.all().delete()
@@ -209,6 +236,17 @@ class FixtureLoadingTests(TestCase):
         # even those normally filtered by the manager
         self._dumpdata_assert(['fixtures.Spy'], '[{"pk": %d, "model": "fixtures.spy", "fields": {"cover_blown": true}}, {"pk": %d, "model": "fixtures.spy", "fields": {"cover_blown": false}}]' % (spy2.pk, spy1.pk), use_base_manager=True)
 
+    def test_dumpdata_iterates_in_chunks(self):
+        from django.core.management.commands.dumpdata import iterate_queryset
+        management.call_command('loaddata', 'fixture6.json', verbosity=0, commit=False)
+        tags = list(Tag.objects.order_by('pk'))
+        self.assertEqual(len(tags), 2)
+        with self.assertNumQueries(3):
+            self.assertEqual(list(iterate_queryset(Tag.objects.all(), chunk_size=1)), tags)
+        # Ordered querysets keep their ordering.
+        articles = list(Article.objects.all())
+        self.assertEqual(list(iterate_queryset(Article.objects.all(), chunk_size=1)), articles)
+
     def test_compress_format_loading(self):
         # Load fixture 4 (compressed), using format specification
         management.call_command('loaddata', 'fixture4.json', verbosity=0, commit=False)
@@ -298,6 +336,72 @@ class FixtureLoadingTests(TestCase):
         self._dumpdata_assert(['fixtures'], """<?xml version="1.0" encoding="utf-8"?>
 <django-objects version="1.0"><object pk="1" model="fixtures.category"><field type="CharField" name="title">News Stories</field><field type="TextField" name="description">Latest news stories</field></object><object pk="3" model="fixtures.article"><field type="CharField" name="headline">Time to reform copyright</field><field type="DateTimeField" name="pub_date">2006-06-16T13:00:00</field></object><object pk="2" model="fixtures.article"><field type="CharField" name="headline">Poker has no place on ESPN</field><field type="DateTimeField" name="pub_date">2006-06-16T12:00:00</field></object><object pk="1" model="fixtures.tag"><field type="CharField" name="name">copyright</field><field to="contenttypes.contenttype" name="tagged_type" rel="ManyToOneRel"><natural>fixtures</natural><natural>article</natural></field><field type="PositiveIntegerField" name="tagged_id">3</field></object><object pk="2" model="fixtures.tag"><field type="CharField" name="name">law</field><field to="contenttypes.contenttype" name="tagged_type" rel="ManyToOneRel"><natural>fixtures</natural><natural>article</natural></field><field type="PositiveIntegerField" name="tagged_id">3</field></object><object pk="1" model="fixtures.person"><field type="CharField" name="name">Django Reinhardt</field></object><object pk="3" model="fixtures.person"><field type="CharField" name="name">Prince</field></object><object pk="2" model="fixtures.person"><field type="CharField" name="name">Stephane Grappelli</field></object><object pk="10" model="fixtures.book"><field type="CharField" name="name">Achieving self-awareness of Python programs</field><field to="fixtures.person" name="authors" rel="ManyToManyRel"></field></object></django-objects>""", format='xml', natural_keys=True)
 
+    def test_marshal_roundtrip(self):
+        management.call_command('loaddata', 'fixture1', verbosity=0, commit=False)
+        management.call_command('loaddata', 'fixture6', verbosity=0, commit=False)
+        json_io = StringIO.StringIO()
+        management.call_command('dumpdata', 'fixtures', stdout=json_io,
+                                use_natural_keys=True)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fixture = os.path.join(tmpdir, 'dump.marshal')
+            with open(fixture, 'wb') as f:
+                management.call_command('dumpdata', 'fixtures', format='marshal',
+                                        stdout=f, use_natural_keys=True)
+            for model in (Tag, Article, Category, Person, Book):
+                model.objects.all().delete()
+            management.call_command('loaddata', fixture, verbosity=0, commit=False)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self._dumpdata_assert(['fixtures'], json_io.getvalue().strip(),
+                              natural_keys=True)
+
+    def test_marshal_natural_keys_like_dates(self):
+        # Natural keys which look like the tagged tuples of dates and times
+        # are left alone.
+        for name in ('time', 'date'):
+            Visa.objects.create(person=Person.objects.create(name=name))
+        data = serializers.serialize('marshal', Visa.objects.all(),
+                                     use_natural_keys=True)
+        Visa.objects.all().delete()
+        for obj in serializers.deserialize('marshal', data):
+            obj.save()
+        self.assertQuerysetEqual(Visa.objects.order_by('person__name'),
+                                 ['date ', 'time '], unicode)
+
+    def test_parallel_dump_and_load(self):
+        management.call_command('loaddata', 'fixture1', verbosity=0, commit=False)
+        management.call_command('loaddata', 'fixture6', verbosity=0, commit=False)
+        json_io = StringIO.StringIO()
+        management.call_command('dumpdata', 'fixtures', stdout=json_io)
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            management.call_command('dumpdata', 'fixtures', parallel=2,
+                                    output_dir=tmpdir, verbosity=0)
+            # One fixture per model with objects.
+            self.assertEqual(sorted(os.listdir(tmpdir)), [
+                'fixtures.article.json', 'fixtures.book.json',
+                'fixtures.category.json', 'fixtures.person.json',
+                'fixtures.tag.json',
+            ])
+            for model in (Tag, Article, Category, Person, Book):
+                model.objects.all().delete()
+            fixtures = [os.path.join(tmpdir, name) for name in os.listdir(tmpdir)]
+            management.call_command('loaddata', *fixtures,
+                                    **{'parallel': 2, 'verbosity': 0})
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self._dumpdata_assert(['fixtures'], json_io.getvalue().strip())
+
+    def test_parallel_requires_output_dir(self):
+        self.assertRaises(SystemExit, management.call_command,
+                          'dumpdata', 'fixtures', parallel=2,
+                          stderr=StringIO.StringIO())
+
 class FixtureTransactionTests(TransactionTestCase):
     def _dumpdata_assert(self, args, output, format='json'):
         new_io = StringIO.StringIO()
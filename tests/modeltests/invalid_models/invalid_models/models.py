@@ -220,6 +220,9 @@ class InvalidSetNull(models.Model):
 class InvalidSetDefault(models.Model):
     fk = models.ForeignKey('self', on_delete=models.SET_DEFAULT)
 
+class InvalidCounter(models.Model):
+    count = models.CounterField('does_not_exist')
+
 class UnicodeForeignKeys(models.Model):
     """Foreign keys which can translate to ascii should be OK, but fail if
     they're not."""
@@ -351,6 +354,7 @@ invalid_models.nonuniquefktarget2: Field 'bad' under model 'FKTarget' must have
 invalid_models.nonexistingorderingwithsingleunderscore: "ordering" refers to "does_not_exist", a field that doesn't exist.
 invalid_models.invalidsetnull: 'fk' specifies on_delete=SET_NULL, but cannot be null.
 invalid_models.invalidsetdefault: 'fk' specifies on_delete=SET_DEFAULT, but has no default value.
+invalid_models.invalidcounter: "count": CounterField refers to "does_not_exist", which isn't a reverse foreign key relation of this model.
 """
 
 if not connection.features.interprets_empty_strings_as_nulls:
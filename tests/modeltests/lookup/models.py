@@ -9,6 +9,7 @@ from django.db import models
 
 class Author(models.Model):
     name = models.CharField(max_length=100)
+    alias = models.CharField(max_length=50, unique=True, null=True, blank=True)
     class Meta:
         ordering = ('name', )
 
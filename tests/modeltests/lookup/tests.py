@@ -4,6 +4,7 @@ from datetime import datetime
 from operator import attrgetter
 
 from django.core.exceptions import FieldError
+from django.db import connection
 from django.test import TestCase, skipUnlessDBFeature
 
 from .models import Author, Article, Tag, Game, Season, Player
@@ -122,6 +123,36 @@ class LookupTests(TestCase):
         self.assertRaises(TypeError, Article.objects.in_bulk)
         self.assertRaises(TypeError, Article.objects.in_bulk, headline__startswith='Blah')
 
+    def test_in_bulk_with_field(self):
+        self.au1.alias = 'a1'
+        self.au1.save()
+        self.au2.alias = 'a2'
+        self.au2.save()
+        self.assertEqual(Author.objects.in_bulk(['a1', 'a2'], field_name='alias'),
+                         {'a1': self.au1, 'a2': self.au2})
+        self.assertEqual(Author.objects.in_bulk(['a3'], field_name='alias'), {})
+        self.assertRaises(ValueError, Article.objects.in_bulk, ['Article 1'],
+                          field_name='headline')
+
+    def test_in_bulk_batches(self):
+        ids = [a.id for a in (self.a1, self.a2, self.a3, self.a4, self.a5,
+                              self.a6, self.a7)]
+        with self.assertNumQueries(3):
+            arts = Article.objects.in_bulk(ids, batch_size=3)
+        self.assertEqual(sorted(arts), sorted(ids))
+        self.assertEqual(arts[self.a4.id], self.a4)
+        # More IDs than the backend accepts in a single query are split into
+        # several queries.
+        arts = Article.objects.in_bulk(range(1, 2501) + ids)
+        self.assertEqual(sorted(arts), sorted(ids))
+        # The parameters of the queryset count towards the limit.
+        max_params = connection.features.max_query_params
+        if max_params:
+            qs = Article.objects.filter(headline__startswith='Article')
+            with self.assertNumQueries(3):
+                arts = qs.in_bulk(range(1, 2 * max_params + 1))
+            self.assertEqual(sorted(arts), sorted(ids))
+
     def test_values(self):
         # values() returns a list of dictionaries instead of object instances --
         # and you can specify which fields you want to retrieve.
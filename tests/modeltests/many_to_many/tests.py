@@ -387,3 +387,60 @@ class ManyToManyTests(TestCase):
         self.assertQuerysetEqual(self.a4.publications.all(), [])
         self.assertQuerysetEqual(self.p2.article_set.all(),
                                  ['<Article: NASA finds intelligent life on Earth>'])
+
+    def test_set(self):
+        # set() makes the given objects the complete set of related objects.
+        self.a2.publications.set([self.p1, self.p3.id])
+        self.assertQuerysetEqual(self.a2.publications.all(),
+            [
+                '<Publication: Science Weekly>',
+                '<Publication: The Python Journal>',
+            ])
+        self.assertQuerysetEqual(self.p2.article_set.all(),
+            [
+                '<Article: NASA finds intelligent life on Earth>',
+                '<Article: Oxygen-free diet works wonders>',
+            ])
+        # It works from the other end too.
+        self.p2.article_set.set([self.a1, self.a4])
+        self.assertQuerysetEqual(self.p2.article_set.all(),
+            [
+                '<Article: Django lets you build Web apps easily>',
+                '<Article: Oxygen-free diet works wonders>',
+            ])
+        self.assertQuerysetEqual(self.a3.publications.all(), [])
+        # An empty set clears the relation.
+        self.a1.publications.set([])
+        self.assertQuerysetEqual(self.a1.publications.all(), [])
+        # Objects of the wrong type raise TypeError.
+        with self.assertRaisesRegexp(TypeError, "'Publication' instance expected, got <Article.*"):
+            self.a1.publications.set([self.a2])
+
+    def test_set_only_writes_differences(self):
+        # One query reads the current set, one removes the stale rows and
+        # one inserts the missing rows.
+        p5 = Publication.objects.create(title='Nature')
+        with self.assertNumQueries(3):
+            self.a2.publications.set([self.p1, self.p2, p5])
+        with self.assertNumQueries(1):
+            self.a2.publications.set([self.p1, self.p2, p5])
+        self.assertQuerysetEqual(self.a2.publications.all(),
+            [
+                '<Publication: Nature>',
+                '<Publication: Science News>',
+                '<Publication: The Python Journal>',
+            ])
+
+    def test_set_many(self):
+        # More objects than the database accepts parameters for in a single
+        # query are split into batches.
+        publications = [Publication(title='Publication %d' % i) for i in range(1100)]
+        Publication.objects.bulk_create(publications)
+        ids = list(Publication.objects.values_list('id', flat=True))
+        self.a1.publications.set(ids)
+        self.assertEqual(self.a1.publications.count(), len(ids))
+        self.a1.publications.set(ids[:2])
+        self.assertEqual(self.a1.publications.count(), 2)
+        self.a1.publications.add(*ids)
+        self.a1.publications.remove(*ids[1:])
+        self.assertEqual(self.a1.publications.count(), 1)
@@ -377,6 +377,43 @@ class JsonSerializerTestCase(SerializersTestBase, TestCase):
                 ret_list.append(obj_dict["fields"][field_name])
         return ret_list
 
+    def test_streamed_output(self):
+        """
+        Objects are written to the stream one at a time, with the same layout
+        as dumping the whole list at once.
+        """
+        python_data = serializers.serialize("python", Article.objects.all())
+        for indent in (None, 0, 4):
+            stream = StringIO()
+            serializers.serialize("json", Article.objects.all(), indent=indent,
+                                  stream=stream)
+            expected = simplejson.dumps(python_data, indent=indent,
+                cls=serializers.json.DjangoJSONEncoder)
+            self.assertEqual(stream.getvalue(), expected)
+
+    def test_incremental_deserialization(self):
+        """
+        Objects are decoded one at a time, however the stream is split.
+        """
+        serial_str = serializers.serialize("json", Article.objects.all(), indent=2)
+        expected = simplejson.loads(serial_str)
+        for read_size in (1, 7, 1024):
+            items = serializers.json.iterload(StringIO(serial_str), read_size)
+            self.assertEqual(items.next(), expected[0])
+            self.assertEqual(list(items), expected[1:])
+
+        objs = list(serializers.deserialize("json", StringIO(serial_str)))
+        self.assertEqual([obj.object for obj in objs], list(Article.objects.all()))
+
+    def test_incremental_deserialization_errors(self):
+        for data in ('', '{}', '[{"pk": 1}', '[{"pk": 1} {"pk": 2}]', '[{"pk": 1},]'):
+            items = serializers.json.iterload(StringIO(data), 2)
+            self.assertRaises(ValueError, list, items)
+
+    def test_serialize_empty(self):
+        serial_str = serializers.serialize("json", Article.objects.none(), indent=2)
+        self.assertEqual(serial_str, "[]")
+
 class JsonSerializerTransactionTestCase(SerializersTransactionTestBase, TransactionTestCase):
     serializer_name = "json"
     fwd_ref_str = """[
@@ -405,6 +442,98 @@ class JsonSerializerTransactionTestCase(SerializersTransactionTestBase, Transact
         }
     }]"""
 
+
+def _to_marshal(objects):
+    """
+    Builds a marshal fixture out of a list of Python serialized objects,
+    one block per object.
+    """
+    from django.core.serializers import marshal_serializer
+    stream = StringIO()
+    marshal_serializer._write_chunk(stream, (marshal_serializer.MAGIC,
+                                             marshal_serializer.VERSION))
+    for obj in objects:
+        names = tuple(obj["fields"])
+        marshal_serializer._write_chunk(stream, (obj["model"], names, [obj["pk"]],
+            [[marshal_serializer._encode_date(obj["fields"][name]) or obj["fields"][name]]
+             for name in names]))
+    return stream.getvalue()
+
+def _from_marshal(serial_str):
+    from django.core.serializers import marshal_serializer
+    return list(marshal_serializer._iter_objects(StringIO(serial_str)))
+
+class MarshalSerializerTestCase(SerializersTestBase, TestCase):
+    serializer_name = "marshal"
+    pkless_str = _to_marshal([{"pk": None, "model": "serializers.category",
+                               "fields": {"name": "Reference"}}])
+
+    @staticmethod
+    def _validate_output(serial_str):
+        try:
+            _from_marshal(serial_str)
+        except Exception:
+            return False
+        else:
+            return True
+
+    @staticmethod
+    def _get_pk_values(serial_str):
+        return [obj["pk"] for obj in _from_marshal(serial_str)]
+
+    @staticmethod
+    def _get_field_values(serial_str, field_name):
+        values = [obj["fields"][field_name] for obj in _from_marshal(serial_str)
+                  if field_name in obj["fields"]]
+        return [v.isoformat() if isinstance(v, datetime) else v for v in values]
+
+    def test_altering_serialized_output(self):
+        # Strings in the binary output are prefixed with their length, so
+        # alter the decoded objects instead of the serialized string.
+        serial_str = serializers.serialize(self.serializer_name,
+                                           Article.objects.all())
+        objects = _from_marshal(serial_str)
+        for obj in objects:
+            if obj["fields"]["headline"] == "Poker has no place on ESPN":
+                obj["fields"]["headline"] = "Poker has no place on television"
+        for obj in serializers.deserialize(self.serializer_name, _to_marshal(objects)):
+            obj.save()
+        self.assertTrue(Article.objects.filter(headline="Poker has no place on television"))
+        self.assertFalse(Article.objects.filter(headline="Poker has no place on ESPN"))
+
+    def test_roundtrip_fidelity(self):
+        """
+        Objects are stored in columnar blocks and come back identical.
+        """
+        serial_str = serializers.serialize(self.serializer_name, Article.objects.all())
+        objs = [obj.object for obj in serializers.deserialize(self.serializer_name, serial_str)]
+        self.assertEqual(
+            [(a.pk, a.author_id, a.headline, a.pub_date) for a in objs],
+            [(a.pk, a.author_id, a.headline, a.pub_date) for a in Article.objects.all()])
+        categories = list(serializers.deserialize(self.serializer_name, serial_str))[0].m2m_data
+        self.assertEqual(
+            sorted(int(pk) for pk in categories["categories"]),
+            sorted(c.pk for c in Article.objects.all()[0].categories.all()))
+
+    def test_invalid_data(self):
+        self.assertRaises(serializers.base.DeserializationError, list,
+                          serializers.deserialize(self.serializer_name, "[]"))
+        serial_str = serializers.serialize(self.serializer_name, Article.objects.all())
+        self.assertRaises(serializers.base.DeserializationError, list,
+                          serializers.deserialize(self.serializer_name, serial_str[:-3]))
+
+class MarshalSerializerTransactionTestCase(SerializersTransactionTestBase, TransactionTestCase):
+    serializer_name = "marshal"
+    fwd_ref_str = _to_marshal([
+        {"pk": 1, "model": "serializers.article", "fields": {
+            "headline": "Forward references pose no problem",
+            "pub_date": "2006-06-16T15:00:00",
+            "categories": [1],
+            "author": 1}},
+        {"pk": 1, "model": "serializers.category", "fields": {"name": "Reference"}},
+        {"pk": 1, "model": "serializers.author", "fields": {"name": "Agnes"}},
+    ])
+
 try:
     import yaml
 except ImportError:
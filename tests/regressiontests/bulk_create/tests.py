@@ -58,6 +58,27 @@ class BulkCreateTests(TestCase):
             "CA", "IL", "ME", "NY",
         ], attrgetter("two_letter_code"))
 
+    def test_large_batch(self):
+        # More objects than the backend accepts parameters for in a single
+        # query are inserted in several batches.
+        Country.objects.bulk_create([
+            Country(name="Country %d" % i, iso_two_letter="XX")
+            for i in range(1001)
+        ])
+        self.assertEqual(Country.objects.count(), 1001)
+
+    @skipUnlessDBFeature("has_bulk_insert")
+    def test_explicit_batch_size(self):
+        with self.assertNumQueries(2):
+            Country.objects.bulk_create(self.data, batch_size=2)
+        self.assertEqual(Country.objects.count(), 4)
+        with self.assertNumQueries(4):
+            State.objects.bulk_create([
+                State(two_letter_code=s)
+                for s in ["IL", "NY", "CA", "ME"]
+            ], batch_size=1)
+        self.assertEqual(State.objects.count(), 4)
+
     @skipIfDBFeature('allows_primary_key_0')
     def test_zero_as_autoval(self):
         """
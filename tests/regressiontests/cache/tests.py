@@ -4,33 +4,49 @@
 # Uses whatever cache backend is set in the test settings file.
 from __future__ import absolute_import
 
+import base64
+import datetime
 import hashlib
 import os
 import re
+import shutil
 import StringIO
 import tempfile
+import threading
 import time
 import warnings
 
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
 from django.conf import settings
 from django.core import management
 from django.core.cache import get_cache, DEFAULT_CACHE_ALIAS
+from django.core.cache.backends import memcached
+from django.core.cache.backends.memcached import BaseMemcachedCache
 from django.core.cache.backends.base import (CacheKeyWarning,
-    InvalidCacheBackendError)
-from django.db import router
-from django.http import HttpResponse, HttpRequest, QueryDict
+    InvalidCacheBackendError, reset_request_stats, send_request_stats)
+from django.core.cache.backends.tiered import GENERATION_KEY
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import cache_stats
+from django.db import models, router
+from django.http import (HttpResponse, HttpResponseServerError, HttpRequest,
+    QueryDict, Http404)
 from django.middleware.cache import (FetchFromCacheMiddleware,
     UpdateCacheMiddleware, CacheMiddleware)
-from django.template import Template
+from django.template import Context, Template
 from django.template.response import TemplateResponse
 from django.test import TestCase, TransactionTestCase, RequestFactory
 from django.test.utils import (get_warnings_state, restore_warnings_state,
     override_settings)
 from django.utils import timezone, translation, unittest
 from django.utils.cache import (patch_vary_headers, get_cache_key,
-    learn_cache_key, patch_cache_control, patch_response_headers)
+    learn_cache_key, patch_cache_control, patch_response_headers,
+    get_cache_lock_key)
 from django.utils.encoding import force_unicode
-from django.views.decorators.cache import cache_page
+from django.views.decorators.cache import cache_page, cache_control
 
 from .models import Poll, expensive_calculation
 
@@ -158,6 +174,13 @@ class DummyCacheTests(unittest.TestCase):
         "delete_many does nothing for the dummy cache backend"
         self.cache.delete_many(['a', 'b'])
 
+    def test_get_or_set(self):
+        "get_or_set always computes the value for the dummy cache backend"
+        calls = []
+        self.assertEqual(self.cache.get_or_set('answer', lambda: calls.append(1) or 42), 42)
+        self.assertEqual(self.cache.get_or_set('answer', lambda: calls.append(1) or 42), 42)
+        self.assertEqual(len(calls), 2)
+
     def test_clear(self):
         "clear does nothing for the dummy cache backend"
         self.cache.clear()
@@ -408,6 +431,63 @@ class BaseCacheTests(object):
         self.assertEqual(self.cache.get("key2"), None)
         self.assertEqual(self.cache.get("key3"), "ham")
 
+    def test_operation_stats(self):
+        # Operations are counted in the statistics of the cache
+        before = self.cache.stats()
+        self.cache.set('key', 'value')
+        self.cache.get('key')
+        self.cache.get('missing')
+        self.cache.get_many(['key', 'missing', 'missing2'])
+        self.cache.delete('key')
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'] - before['hits'], 2)
+        self.assertEqual(stats['misses'] - before['misses'], 3)
+        for operation, calls in (('set', 1), ('get', 2), ('get_many', 1), ('delete', 1)):
+            self.assertEqual(stats['calls'][operation] - before['calls'].get(operation, 0), calls)
+            self.assertTrue(stats['time'][operation] >= before['time'].get(operation, 0))
+
+    def test_get_or_set(self):
+        # get_or_set only computes missing values
+        calls = []
+        def compute():
+            calls.append(1)
+            return 'spam'
+        self.assertEqual(self.cache.get_or_set('key', compute), 'spam')
+        self.assertEqual(self.cache.get_or_set('key', compute), 'spam')
+        self.assertEqual(self.cache.get('key'), 'spam')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.get_or_set('other', 'eggs'), 'eggs')
+        self.assertEqual(self.cache.get('other'), 'eggs')
+        # Values set by other means are returned as is.
+        self.cache.set('plain', 'ham')
+        self.assertEqual(self.cache.get_or_set('plain', compute, beta=1e9), 'ham')
+        self.assertEqual(len(calls), 1)
+
+    def test_get_or_set_early_recompute(self):
+        # Slow values are recomputed before they expire, depending on beta
+        calls = []
+        def compute():
+            calls.append(1)
+            time.sleep(0.01)
+            return len(calls)
+        self.assertEqual(self.cache.get_or_set('key', compute), 1)
+        self.assertEqual(self.cache.get_or_set('key', compute, beta=0), 1)
+        self.assertEqual(self.cache.get_or_set('key', compute, beta=1e9), 2)
+        self.assertEqual(self.cache.get('key'), 2)
+
+    def test_get_or_set_locked(self):
+        # While another process holds the lock, the current value is
+        # returned, or the missing value is computed after waiting.
+        self.cache.get_or_set('key', lambda: time.sleep(0.01) or 'old')
+        self.cache.add('key:lock', True)
+        self.assertEqual(self.cache.get_or_set('key', 'new', beta=1e9), 'old')
+        self.cache.delete('key')
+        start = time.time()
+        self.assertEqual(self.cache.get_or_set('key', 'new', wait=0.1), 'new')
+        self.assertTrue(time.time() - start >= 0.1)
+        # The lock of the other process is left alone.
+        self.assertEqual(self.cache.get('key:lock'), True)
+
     def test_clear(self):
         # The cache can be emptied using clear
         self.cache.set("key1", "spam")
@@ -795,7 +875,7 @@ class DBCacheTests(BaseCacheTests, TransactionTestCase):
         # Spaces are used in the table name to ensure quoting/escaping is working
         self._table_name = 'test cache table'
         management.call_command('createcachetable', self._table_name, verbosity=0, interactive=False)
-        self.cache = get_cache(self.backend_name, LOCATION=self._table_name, OPTIONS={'MAX_ENTRIES': 30})
+        self.cache = get_cache(self.backend_name, LOCATION=self._table_name, OPTIONS={'MAX_ENTRIES': 30, 'CULL_PROBABILITY': 1})
         self.prefix_cache = get_cache(self.backend_name, LOCATION=self._table_name, KEY_PREFIX='cacheprefix')
         self.v2_cache = get_cache(self.backend_name, LOCATION=self._table_name, VERSION=2)
         self.custom_key_cache = get_cache(self.backend_name, LOCATION=self._table_name, KEY_FUNCTION=custom_key_func)
@@ -811,13 +891,92 @@ class DBCacheTests(BaseCacheTests, TransactionTestCase):
         self.perform_cull_test(50, 29)
 
     def test_zero_cull(self):
-        self.cache = get_cache(self.backend_name, LOCATION=self._table_name, OPTIONS={'MAX_ENTRIES': 30, 'CULL_FREQUENCY': 0})
+        self.cache = get_cache(self.backend_name, LOCATION=self._table_name, OPTIONS={'MAX_ENTRIES': 30, 'CULL_FREQUENCY': 0, 'CULL_PROBABILITY': 1})
         self.perform_cull_test(50, 18)
 
     def test_old_initialization(self):
-        self.cache = get_cache('db://%s?max_entries=30&cull_frequency=0' % self._table_name)
+        self.cache = get_cache('db://%s?max_entries=30&cull_frequency=0&cull_probability=1' % self._table_name)
         self.perform_cull_test(50, 18)
 
+    def test_cull_probability(self):
+        self.cache = get_cache(self.backend_name, LOCATION=self._table_name, OPTIONS={'MAX_ENTRIES': 30, 'CULL_PROBABILITY': 0})
+        self.perform_cull_test(50, 49)
+
+    def test_batched_queries(self):
+        cache = get_cache(self.backend_name, LOCATION=self._table_name, OPTIONS={'CULL_PROBABILITY': 0})
+        cache.get('warm-up')
+        # One query to find the existing keys, one to insert the new ones.
+        with self.assertNumQueries(2):
+            cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {'a': 1, 'b': 2, 'c': 3})
+        with self.assertNumQueries(1):
+            cache.delete_many(['a', 'b'])
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'c': 3})
+
+    def test_binary_table(self):
+        from django.db import connection
+        self.cache.set('key', {'a': [1, 2]})
+        cursor = connection.cursor()
+        cursor.execute("SELECT data FROM %s" % connection.ops.quote_name(self._table_name))
+        self.assertEqual(pickle.loads(str(cursor.fetchone()[0])), {'a': [1, 2]})
+
+    def test_text_table(self):
+        "Tables with a text value column created before Django 1.5 still work"
+        from django.db import connection
+        table = connection.ops.quote_name('test old cache table')
+        cursor = connection.cursor()
+        cursor.execute("CREATE TABLE %s (cache_key varchar(255) NOT NULL PRIMARY KEY, "
+                       "value text NOT NULL, expires %s NOT NULL)" %
+                       (table, models.DateTimeField().db_type(connection)))
+        try:
+            cache = get_cache(self.backend_name, LOCATION='test old cache table')
+            cache.set('key', {'a': [1, 2]})
+            self.assertEqual(cache.get('key'), {'a': [1, 2]})
+            cursor.execute("SELECT value FROM %s" % table)
+            value = cursor.fetchone()[0]
+            self.assertEqual(pickle.loads(base64.decodestring(value)), {'a': [1, 2]})
+        finally:
+            cursor.execute('DROP TABLE %s' % table)
+            connection.commit()
+
+    def test_unsupported_values(self):
+        cache = get_cache(self.backend_name, LOCATION=self._table_name,
+                          OPTIONS={'SERIALIZER': 'json'})
+        value = datetime.datetime(2012, 1, 1)
+        cache.set_many({'a': 1, 'b': value})
+        self.assertEqual(cache.get_many(['a', 'b']), {'a': 1})
+        self.assertFalse(cache.add('b', value))
+        self.assertEqual(cache.get('b'), None)
+
+    def test_recreated_table(self):
+        "The value column is looked up again when the table is recreated"
+        from django.db import connection
+        self.cache.set('key', 'value')
+        table = connection.ops.quote_name(self._table_name)
+        cursor = connection.cursor()
+        cursor.execute('DROP TABLE %s' % table)
+        cursor.execute("CREATE TABLE %s (cache_key varchar(255) NOT NULL PRIMARY KEY, "
+                       "value text NOT NULL, expires %s NOT NULL)" %
+                       (table, models.DateTimeField().db_type(connection)))
+        connection.commit()
+        # The first write fails with the "data" column of the old table.
+        self.assertFalse(self.cache.add('key', 'value'))
+        self.assertTrue(self.cache.add('key', 'value'))
+        self.assertEqual(self.cache.get('key'), 'value')
+
+    def test_binary_without_database_module(self):
+        "Backends that don't expose their driver get the values as buffers"
+        from django.db import connection
+        self.cache.set('key', 'value')
+
+        class Connection(object):
+            alias = connection.alias
+
+        data = self.cache._to_db(Connection(), 'value')
+        self.assertTrue(isinstance(data, buffer))
+        self.assertEqual(self.cache._decode(str(data)), 'value')
+
     def test_second_call_doesnt_crash(self):
         err = StringIO.StringIO()
         management.call_command('createcachetable', self._table_name, verbosity=0, interactive=False, stderr=err)
@@ -905,6 +1064,64 @@ class LocMemCacheTests(unittest.TestCase, BaseCacheTests):
         self.cache = get_cache('locmem://?max_entries=30&cull_frequency=0')
         self.perform_cull_test(50, 19)
 
+    def test_cull_keeps_recently_used(self):
+        "Culling evicts the entries that weren't read since they were set"
+        cache = get_cache(self.backend_name, LOCATION='lru', OPTIONS={'MAX_ENTRIES': 10})
+        for i in range(10):
+            cache.set('key%d' % i, i)
+        for i in range(0, 10, 2):
+            cache.get('key%d' % i)
+        cache.set('new', 'value')
+        self.assertEqual(
+            sorted(k for k in cache.get_many(['key%d' % i for i in range(10)])),
+            ['key0', 'key2', 'key4', 'key6', 'key7', 'key8', 'key9'])
+        cache.clear()
+
+    def test_cull_after_deletes(self):
+        "Deleted keys don't take the place of live entries"
+        cache = get_cache(self.backend_name, LOCATION='deletes', OPTIONS={'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 4})
+        for i in range(100):
+            cache.set('deleted%d' % i, i)
+            cache.delete('deleted%d' % i)
+        # The deleted keys are dropped from the insertion order over time.
+        self.assertTrue(len(cache._order) <= 8)
+        for i in range(5):
+            cache.set('key%d' % i, i)
+        self.assertEqual(sorted(cache.get_many(['key%d' % i for i in range(5)])),
+            ['key1', 'key2', 'key3', 'key4'])
+        self.assertEqual(cache.stats()['evictions'], 1)
+        cache.clear()
+
+    def test_cull_expired(self):
+        "Expired entries are removed by culling without counting as evictions"
+        cache = get_cache(self.backend_name, LOCATION='expired', OPTIONS={'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 4})
+        cache.set('expired', 2, timeout=-1)
+        cache.set('key1', 1)
+        cache.set('key3', 3)
+        cache.set('key4', 4)
+        cache.set('key5', 5)
+        self.assertEqual(cache.get_many(['key1', 'key3', 'key4', 'key5']),
+            {'key1': 1, 'key3': 3, 'key4': 4, 'key5': 5})
+        self.assertEqual(cache.stats()['evictions'], 0)
+        cache.clear()
+
+    def test_stats(self):
+        cache = get_cache(self.backend_name, LOCATION='stats', KEY_PREFIX='stats',
+                          OPTIONS={'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 2})
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.get('missing')
+        cache.set('c', 3)
+        stats = cache.stats()
+        self.assertEqual(
+            (stats['hits'], stats['misses'], stats['evictions'], stats['entries']),
+            (1, 1, 1, 2))
+        self.assertEqual(stats['calls'], {'get': 2, 'set': 3, '_cull': 1})
+        self.assertEqual(stats['bytes_written'], 3 * len(pickle.dumps(1, pickle.HIGHEST_PROTOCOL)))
+        self.assertEqual(stats['bytes_read'], len(pickle.dumps(1, pickle.HIGHEST_PROTOCOL)))
+        cache.clear()
+
     def test_multiple_caches(self):
         "Check that multiple locmem caches are isolated"
         mirror_cache = get_cache(self.backend_name)
@@ -962,6 +1179,182 @@ class MemcachedCacheTests(unittest.TestCase, BaseCacheTests):
         self.assertRaises(Exception, self.cache.set, 'a' * 251, 'value')
 
 
+class FakeServerError(Exception):
+    pass
+
+
+class FakeMemcachedServer(object):
+    "A memcached server storing values in a dictionary"
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+        self.down = False
+        # Like the hosts of python-memcache, which marks the servers it
+        # failed to reach as dead until this time instead of raising.
+        self.deaduntil = 0
+
+
+class FakeMemcachedClient(object):
+    "A client of the fake memcached library, connected to one server"
+    # The fake servers, by address.
+    registry = {}
+
+    def __init__(self, servers):
+        self.server = self.registry.setdefault(servers[0], FakeMemcachedServer())
+        self.servers = [self.server]
+
+    def _call(self, name):
+        if self.server.down:
+            raise FakeServerError
+        self.server.calls.append(name)
+
+    def get(self, key):
+        self._call('get')
+        return self.server.data.get(key)
+
+    def get_multi(self, keys):
+        self._call('get_multi')
+        return dict((key, self.server.data[key]) for key in keys if key in self.server.data)
+
+    def set(self, key, value, timeout):
+        self._call('set')
+        self.server.data[key] = value
+        return True
+
+    def set_multi(self, data, timeout):
+        self._call('set_multi')
+        self.server.data.update(data)
+        return []
+
+    def add(self, key, value, timeout):
+        self._call('add')
+        if key in self.server.data:
+            return False
+        self.server.data[key] = value
+        return True
+
+    def delete(self, key):
+        self._call('delete')
+        self.server.data.pop(key, None)
+
+    def delete_multi(self, keys):
+        self._call('delete_multi')
+        for key in keys:
+            self.server.data.pop(key, None)
+
+    def incr(self, key, delta):
+        self._call('incr')
+        if key not in self.server.data:
+            raise ValueError
+        self.server.data[key] += delta
+        return self.server.data[key]
+
+    def decr(self, key, delta):
+        return self.incr(key, -delta)
+
+    def flush_all(self):
+        self._call('flush_all')
+        self.server.data.clear()
+
+    def disconnect_all(self):
+        pass
+
+
+class FakeMemcachedCache(BaseMemcachedCache):
+    def __init__(self, server, params):
+        fake_memcache = type('fake_memcache', (object,), {'Client': FakeMemcachedClient})
+        super(FakeMemcachedCache, self).__init__(server, params,
+                                                 library=fake_memcache,
+                                                 value_not_found_exception=ValueError,
+                                                 server_error_exception=FakeServerError)
+
+
+class MemcachedServersTests(unittest.TestCase):
+    """
+    Tests for the distribution of keys over memcached servers, against fake
+    servers.
+    """
+    servers = ['server1:11211', 'server2:11211', 'server3:11211']
+
+    def setUp(self):
+        FakeMemcachedClient.registry.clear()
+        self.cache = FakeMemcachedCache(';'.join(self.servers), {})
+
+    def tearDown(self):
+        memcached._dead_servers.clear()
+
+    def server(self, server):
+        return FakeMemcachedClient.registry[server]
+
+    def test_distribution(self):
+        for i in range(300):
+            self.cache.set('key%d' % i, i)
+        for i in range(300):
+            self.assertEqual(self.cache.get('key%d' % i), i)
+        for server in self.servers:
+            self.assertTrue(50 < len(self.server(server).data) < 150)
+
+    def test_consistent_hashing(self):
+        # Adding a fourth server moves about a fourth of the keys
+        keys = ['key%d' % i for i in range(1000)]
+        ring = memcached.ConsistentHashRing(self.servers)
+        new_ring = memcached.ConsistentHashRing(self.servers + ['server4:11211'])
+        moved = [key for key in keys if ring.get_server(key) != new_ring.get_server(key)]
+        self.assertTrue(150 < len(moved) < 350)
+        for key in moved:
+            self.assertEqual(new_ring.get_server(key), 'server4:11211')
+
+    def test_unicode_keys(self):
+        ring = memcached.ConsistentHashRing(self.servers)
+        self.assertEqual(ring.get_server(u'clé'), ring.get_server(u'clé'.encode('utf-8')))
+        self.cache.set(u'clé', 'value')
+        self.assertEqual(self.cache.get(u'clé'), 'value')
+
+    def test_batched_operations(self):
+        # Operations on several keys make one call per server
+        data = dict(('key%d' % i, i) for i in range(30))
+        self.cache.set_many(data)
+        self.assertEqual(self.cache.get_many(data.keys() + ['missing']), data)
+        self.cache.delete_many(data.keys())
+        self.assertEqual(self.cache.get_many(data.keys()), {})
+        for server in self.servers:
+            self.assertEqual(self.server(server).calls, ['set_multi', 'get_multi', 'delete_multi', 'get_multi'])
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.decr('counter'), 2)
+        self.assertRaises(ValueError, self.cache.incr, 'missing')
+
+    def test_ejection(self):
+        # The keys of a failed server are moved to the other servers until
+        # the server is tried again.
+        key = 'key'
+        server = self.cache._server(self.cache.make_key(key))
+        self.cache.set(key, 'value')
+        self.server(server).down = True
+        self.assertEqual(self.cache.get(key), None)
+        self.assertTrue(memcached._dead_servers[server] > time.time())
+        self.cache.set(key, 'new value')
+        self.assertEqual(self.cache.get(key), 'new value')
+        self.assertNotEqual(self.cache._server(self.cache.make_key(key)), server)
+        # Once the ejection has expired, the server holds its keys again.
+        self.server(server).down = False
+        memcached._dead_servers[server] = time.time() - 1
+        self.assertEqual(self.cache._server(self.cache.make_key(key)), server)
+
+    def test_dead_server(self):
+        # Servers the library marked as dead are ejected too.
+        key = 'key'
+        server = self.cache._server(self.cache.make_key(key))
+        self.cache.set(key, 'value')
+        self.assertFalse(server in memcached._dead_servers)
+        self.server(server).deaduntil = time.time() + 30
+        self.cache.get(key)
+        self.assertTrue(memcached._dead_servers[server] > time.time())
+        self.assertNotEqual(self.cache._server(self.cache.make_key(key)), server)
+
+
 class FileBasedCacheTests(unittest.TestCase, BaseCacheTests):
     """
     Specific test cases for the file-based cache.
@@ -1005,10 +1398,235 @@ class FileBasedCacheTests(unittest.TestCase, BaseCacheTests):
     def test_cull(self):
         self.perform_cull_test(50, 29)
 
+    def test_removed_directory(self):
+        "The cache directory is recreated when it has been removed"
+        self.cache.set('a', 1)
+        shutil.rmtree(self.dirname)
+        self.cache.set('b', 2)
+        self.assertEqual(self.cache.get('b'), 2)
+
     def test_old_initialization(self):
         self.cache = get_cache('file://%s?max_entries=30' % self.dirname)
         self.perform_cull_test(50, 29)
 
+    def test_cull_least_recently_used(self):
+        self.cache.set('expired', 'value', -1)
+        for i in range(29):
+            self.cache.set('key%d' % i, i)
+        for i in range(0, 29, 2):
+            self.cache.get('key%d' % i)
+        self.cache.set('new', 'value')
+        self.assertEqual(self.cache._num_entries, 21)
+        # The expired entry and the 9 oldest entries that weren't read were
+        # culled.
+        remaining = self.cache.get_many(['key%d' % i for i in range(29)])
+        self.assertEqual(sorted(remaining.values()),
+            sorted(range(0, 29, 2) + range(19, 29, 2)))
+
+    def test_index_rebuilt(self):
+        "The index is rebuilt from the files in the directory if it's missing"
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        os.remove(os.path.join(self.dirname, 'index.sqlite'))
+        self.assertEqual(self.cache._num_entries, 2)
+        self.cache.delete('a')
+        self.assertEqual(self.cache._num_entries, 1)
+
+
+class TieredCacheTests(unittest.TestCase, BaseCacheTests):
+    backend_name = 'django.core.cache.backends.tiered.TieredCache'
+    shared_backend_name = 'django.core.cache.backends.locmem.LocMemCache'
+
+    def setUp(self):
+        self.cache = get_cache(self.backend_name, LOCATION=self.shared_backend_name, OPTIONS={'MAX_ENTRIES': 30})
+        self.prefix_cache = get_cache(self.backend_name, LOCATION=self.shared_backend_name, KEY_PREFIX='cacheprefix')
+        self.v2_cache = get_cache(self.backend_name, LOCATION=self.shared_backend_name, VERSION=2)
+        self.custom_key_cache = get_cache(self.backend_name, LOCATION=self.shared_backend_name, KEY_FUNCTION=custom_key_func)
+        self.custom_key_cache2 = get_cache(self.backend_name, LOCATION=self.shared_backend_name, KEY_FUNCTION='regressiontests.cache.tests.custom_key_func')
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def other_process_cache(self, **params):
+        "Returns a tiered cache with its own local-memory cache"
+        cache = get_cache(self.backend_name, LOCATION=self.shared_backend_name, **params)
+        cache._l1 = get_cache('django.core.cache.backends.locmem.LocMemCache', LOCATION='other process')
+        cache._l1.clear()
+        cache._generation = {'value': None, 'next_check': 0}
+        return cache
+
+    def test_cull(self):
+        # Only the local-memory cache is culled.
+        self.perform_cull_test(50, 49)
+        self.assertTrue(len(self.cache._l1._cache) <= 30)
+
+    def test_local_hits(self):
+        # Values are read from the local-memory cache first
+        self.cache.set('key', 'value')
+        self.cache.set('key2', 'value2')
+        self.cache._l2.delete_many([self.cache.make_key('key'), self.cache.make_key('key2')])
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get_many(['key', 'key2', 'key3']), {'key': 'value', 'key2': 'value2'})
+
+    def test_shared_misses(self):
+        # Values missing from the local-memory cache are read from the shared
+        # cache and kept locally.
+        other = self.other_process_cache()
+        self.cache.set_many({'key': 'value', 'key2': 'value2'})
+        self.assertEqual(other.get_many(['key', 'key2', 'key3']), {'key': 'value', 'key2': 'value2'})
+        self.assertEqual(other._l1.get(self.cache.make_key('key')), 'value')
+
+    def test_invalidation(self):
+        # Writes in other processes clear the local-memory cache once the
+        # generation of the shared cache has been checked.
+        other = self.other_process_cache(OPTIONS={'CHECK_INTERVAL': 60000})
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        self.cache.set('key', 'new value')
+        self.assertEqual(other.get('key'), 'value')
+        other._generation['next_check'] = 0
+        self.assertEqual(other.get('key'), 'new value')
+        self.cache.delete('key')
+        other._generation['next_check'] = 0
+        self.assertEqual(other.get('key'), None)
+
+    def test_key_layout(self):
+        # Keys are made once, by the tiered cache, and stored as is.
+        self.prefix_cache.set('key', 'value', version=3)
+        key = self.prefix_cache.make_key('key', version=3)
+        self.assertEqual(key, 'cacheprefix:3:key')
+        self.assertEqual(self.prefix_cache._l1._cache.keys(), [key])
+        shared = get_cache(self.shared_backend_name)
+        self.assertEqual(shared.get('key', version=3), None)
+        self.assertEqual(sorted(shared._cache.keys()), [key, GENERATION_KEY])
+        self.prefix_cache.clear()
+
+    def test_own_writes(self):
+        # Writes of the current process don't clear its local-memory cache
+        self.cache.set('key', 'value')
+        self.cache.set('key2', 'value2')
+        self.cache._l2.delete(self.cache.make_key('key'))
+        self.assertEqual(self.cache.get('key'), 'value')
+
+class CacheSerializationTests(unittest.TestCase):
+    """
+    Tests for the SERIALIZER and COMPRESS_MIN_LENGTH cache options.
+    """
+    backend_name = 'django.core.cache.backends.locmem.LocMemCache'
+
+    def test_serializers(self):
+        value = {'a': [1, 2.5, None], 'b': u'Iñtërnâtiônàlizætiøn'}
+        for serializer in ('pickle', 'marshal', 'json',
+                           'django.core.cache.serializers.JSONSerializer'):
+            cache = get_cache(self.backend_name, LOCATION='serialization',
+                              OPTIONS={'SERIALIZER': serializer})
+            cache.set('key', value)
+            self.assertEqual(cache.get('key'), value)
+            self.assertEqual(cache.get_many(['key']), {'key': value})
+            cache.clear()
+
+    def test_unsupported_values(self):
+        # Values the serializer can't store are skipped
+        value = datetime.datetime(2012, 1, 1)
+        dirname = tempfile.mkdtemp()
+        try:
+            for backend, location in ((self.backend_name, 'unsupported'),
+                ('django.core.cache.backends.filebased.FileBasedCache', dirname)):
+                for serializer in ('marshal', 'json'):
+                    cache = get_cache(backend, LOCATION=location,
+                                      OPTIONS={'SERIALIZER': serializer})
+                    cache.set('key', value)
+                    self.assertEqual(cache.get('key'), None)
+                    cache.add('key', value)
+                    self.assertEqual(cache.get('key'), None)
+                    cache.clear()
+        finally:
+            shutil.rmtree(dirname)
+
+    def test_unpicklable_values(self):
+        # Values of types pickle doesn't handle raise an error, while data
+        # which can't be unpickled is treated as missing.
+        cache = get_cache(self.backend_name, LOCATION='unpicklable')
+        self.assertRaises(TypeError, cache.set, 'key', threading.Lock())
+        self.assertRaises(TypeError, cache.add, 'key', threading.Lock())
+        cache.set('key', 'value')
+        cache._cache[cache.make_key('key')] = '-not a pickle'
+        self.assertEqual(cache.get('key'), None)
+        cache.clear()
+
+    def test_invalid_serializer(self):
+        self.assertRaises(ImproperlyConfigured, get_cache, self.backend_name,
+                          OPTIONS={'SERIALIZER': 'regressiontests.cache.tests.DoesNotExist'})
+
+    def test_compression(self):
+        # Values are only compressed above COMPRESS_MIN_LENGTH bytes
+        cache = get_cache(self.backend_name, LOCATION='compression',
+                          OPTIONS={'COMPRESS_MIN_LENGTH': 100})
+        cache.set('small', 'spam')
+        cache.set('large', 'spam' * 1000)
+        self.assertEqual(cache.get('small'), 'spam')
+        self.assertEqual(cache.get('large'), 'spam' * 1000)
+        small = cache._cache[cache.make_key('small')]
+        large = cache._cache[cache.make_key('large')]
+        self.assertEqual(small[0], '-')
+        self.assertEqual(large[0], 'z')
+        self.assertTrue(len(large) < 100)
+        cache.clear()
+
+    def test_file_compression(self):
+        dirname = tempfile.mkdtemp()
+        try:
+            cache = get_cache('django.core.cache.backends.filebased.FileBasedCache',
+                              LOCATION=dirname, OPTIONS={'COMPRESS_MIN_LENGTH': 100,
+                                                         'SERIALIZER': 'marshal'})
+            cache.set('large', ['spam'] * 1000)
+            self.assertEqual(cache.get('large'), ['spam'] * 1000)
+            self.assertTrue(os.path.getsize(cache._key_to_file(cache.make_key('large'))) < 200)
+        finally:
+            shutil.rmtree(dirname)
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+})
+class CacheStatsTests(TestCase):
+
+    def setUp(self):
+        self.stats = []
+        cache_stats.connect(self.receiver)
+        reset_request_stats()
+
+    def tearDown(self):
+        cache_stats.disconnect(self.receiver)
+        get_cache('default').clear()
+
+    def receiver(self, sender, stats, **kwargs):
+        self.stats.append(stats)
+
+    def test_request_stats(self):
+        # The operations of the cache middleware and the {% cache %} tag are
+        # counted in the statistics of the request, sent when it finishes.
+        view = cache_page(60)(hello_world_view)
+        request = RequestFactory().get('/view/')
+        view(request, '1')
+        view(request, '2')
+        template = Template('{% load cache %}{% cache 60 fragment %}spam{% endcache %}')
+        template.render(Context())
+        template.render(Context())
+        send_request_stats()
+        self.assertEqual(len(self.stats), 1)
+        stats = self.stats[0]['default']
+        # Each view lookup misses the headers or hits the page, and the
+        # fragment is missed once and hit once.
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['calls']['get'], 5)
+        self.assertTrue(stats['bytes_read'] > 0)
+        # Only requests which used the cache send the signal.
+        send_request_stats()
+        self.assertEqual(len(self.stats), 1)
+
 
 class CustomCacheKeyValidationTests(unittest.TestCase):
     """
@@ -1145,6 +1763,10 @@ class CacheUtils(TestCase):
             ('must-revalidate,max-age=60,private', {'public' : True}, set(['must-revalidate', 'max-age=60', 'public'])),
             ('must-revalidate,max-age=60,public', {'private' : True}, set(['must-revalidate', 'max-age=60', 'private'])),
             ('must-revalidate,max-age=60', {'public' : True}, set(['must-revalidate', 'max-age=60', 'public'])),
+
+            # The shortest grace periods are kept
+            ('max-age=60,stale-if-error=30', {'stale_if_error' : 60}, set(['max-age=60', 'stale-if-error=30'])),
+            ('stale-while-revalidate=60', {'stale_while_revalidate' : 30}, set(['stale-while-revalidate=30'])),
         )
 
         cc_delim_re = re.compile(r'\s*,\s*')
@@ -1658,6 +2280,179 @@ class CacheMiddlewareTest(TestCase):
         self.assertEqual(response.content, 'Hello World 18')
 
 
+def cookie_view(request, value):
+    response = HttpResponse('Hello World %s' % value)
+    response['Vary'] = 'Accept-Language'
+    response.set_cookie('visitor', value)
+    return response
+
+
+@override_settings(
+        CACHE_MIDDLEWARE_ALIAS='default',
+        CACHE_MIDDLEWARE_KEY_PREFIX='middlewareprefix',
+        CACHE_MIDDLEWARE_SECONDS=30,
+        CACHE_MIDDLEWARE_SINGLE_KEY=True,
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+        },
+        USE_I18N=False,
+)
+class SingleKeyCacheMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.cache = get_cache('default')
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def get_calls(self):
+        return self.cache.stats()['calls'].get('get', 0)
+
+    def test_single_lookup(self):
+        view = cache_page(cookie_view)
+        request = self.factory.get('/view/')
+        response = view(request, '1')
+        self.assertEqual(response.content, 'Hello World 1')
+        calls = self.get_calls()
+        response = view(request, '2')
+        self.assertEqual(response.content, 'Hello World 1')
+        # The hit costs one cache lookup.
+        self.assertEqual(self.get_calls() - calls, 1)
+
+    def test_cookies_not_cached(self):
+        view = cache_page(cookie_view)
+        request = self.factory.get('/view/')
+        response = view(request, '1')
+        self.assertTrue('visitor' in response.cookies)
+        response = view(request, '2')
+        self.assertEqual(response.content, 'Hello World 1')
+        self.assertFalse('visitor' in response.cookies)
+        self.assertEqual(response['Vary'], 'Accept-Language')
+        self.assertEqual(response['Content-Type'], settings.DEFAULT_CONTENT_TYPE + '; charset=utf-8')
+
+    def test_variants(self):
+        view = cache_page(cookie_view)
+        english = self.factory.get('/view/', HTTP_ACCEPT_LANGUAGE='en')
+        french = self.factory.get('/view/', HTTP_ACCEPT_LANGUAGE='fr')
+        self.assertEqual(view(english, '1').content, 'Hello World 1')
+        self.assertEqual(view(french, '2').content, 'Hello World 2')
+        self.assertEqual(view(english, '3').content, 'Hello World 1')
+        self.assertEqual(view(french, '4').content, 'Hello World 2')
+        # Both variants are stored in the same entry.
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_head(self):
+        view = cache_page(hello_world_view)
+        view(self.factory.get('/view/'), '1')
+        response = view(self.factory.head('/view/'), '2')
+        self.assertEqual(response.content, 'Hello World 1')
+
+    def test_template_response(self):
+        view = cache_page(lambda request, value:
+            TemplateResponse(request, Template('Hello World {{ value }}'), {'value': value}))
+        request = self.factory.get('/view/')
+        self.assertEqual(view(request, '1').render().content, 'Hello World 1')
+        self.assertEqual(view(request, '2').content, 'Hello World 1')
+
+    def test_middleware(self):
+        update_middleware = UpdateCacheMiddleware()
+        fetch_middleware = FetchFromCacheMiddleware()
+        request = self.factory.get('/view/')
+        self.assertEqual(fetch_middleware.process_request(request), None)
+        update_middleware.process_response(request, hello_world_view(request, '1'))
+        self.assertEqual(fetch_middleware.process_request(request).content, 'Hello World 1')
+        # Nothing is stored with the header-list and page keys.
+        self.assertEqual(get_cache_key(request, cache=self.cache), None)
+
+
+def error_view(request, value):
+    raise ValueError(value)
+
+def server_error_view(request, value):
+    return HttpResponseServerError('Server Error %s' % value)
+
+def not_found_view(request, value):
+    raise Http404(value)
+
+
+@override_settings(
+        CACHE_MIDDLEWARE_STALE_WHILE_REVALIDATE=30,
+        CACHE_MIDDLEWARE_STALE_IF_ERROR=60,
+        CACHES={
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+        },
+        USE_I18N=False,
+)
+class StaleCacheMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.cache = get_cache('default')
+
+    def tearDown(self):
+        self.cache.clear()
+
+    def cache_expired_page(self, request):
+        response = cache_page(1)(hello_world_view)(request, '1')
+        time.sleep(1.1)
+        return response
+
+    def test_grace_period_headers(self):
+        request = self.factory.get('/view/')
+        response = cache_page(1)(hello_world_view)(request, '1')
+        self.assertTrue('stale-while-revalidate=30' in response['Cache-Control'])
+        self.assertTrue('stale-if-error=60' in response['Cache-Control'])
+        # The directives set by the view are kept.
+        view = cache_control(stale_if_error=0)(hello_world_view)
+        response = cache_page(1)(view)(self.factory.get('/other/'), '1')
+        self.assertTrue('stale-if-error=0' in response['Cache-Control'])
+
+    def test_stale_while_revalidate(self):
+        request = self.factory.get('/view/')
+        self.cache_expired_page(request)
+        view = cache_page(1)(hello_world_view)
+        lock_key = get_cache_lock_key(request, '')
+        # While another request regenerates the page, the stale page is served.
+        self.assertTrue(self.cache.add(lock_key, True))
+        self.assertEqual(view(request, '2').content, 'Hello World 1')
+        self.cache.delete(lock_key)
+        # Otherwise, the page is regenerated, and the lock released.
+        self.assertEqual(view(request, '3').content, 'Hello World 3')
+        self.assertEqual(self.cache.get(lock_key), None)
+        self.assertEqual(view(request, '4').content, 'Hello World 3')
+
+    def test_stale_if_error(self):
+        request = self.factory.get('/view/')
+        self.cache_expired_page(request)
+        response = cache_page(1)(error_view)(request, '2')
+        self.assertEqual(response.content, 'Hello World 1')
+        response = cache_page(1)(server_error_view)(request, '3')
+        self.assertEqual(response.content, 'Hello World 1')
+        self.assertEqual(self.cache.get(get_cache_lock_key(request, '')), None)
+        # Missing pages aren't served stale.
+        self.assertRaises(Http404, cache_page(1)(not_found_view), request, '4')
+        # The stale page isn't cached as a fresh one.
+        response = cache_page(1)(hello_world_view)(request, '5')
+        self.assertEqual(response.content, 'Hello World 5')
+
+    @override_settings(CACHE_MIDDLEWARE_STALE_IF_ERROR=0,
+                       CACHE_MIDDLEWARE_STALE_WHILE_REVALIDATE=0)
+    def test_no_grace_periods(self):
+        request = self.factory.get('/view/')
+        self.cache_expired_page(request)
+        self.assertRaises(ValueError, cache_page(1)(error_view), request, '2')
+
+
+@override_settings(CACHE_MIDDLEWARE_SINGLE_KEY=True)
+class SingleKeyStaleCacheMiddlewareTest(StaleCacheMiddlewareTest):
+    pass
+
+
 @override_settings(
         CACHE_MIDDLEWARE_KEY_PREFIX='settingsprefix',
         CACHE_MIDDLEWARE_SECONDS=1,
@@ -0,0 +1,24 @@
+from django.db import models
+
+
+class Forum(models.Model):
+    name = models.CharField(max_length=20)
+    thread_count = models.CounterField('threads')
+
+    def __unicode__(self):
+        return self.name
+
+
+class Thread(models.Model):
+    forum = models.ForeignKey(Forum, related_name='threads', null=True,
+        on_delete=models.SET_NULL)
+    title = models.CharField(max_length=20)
+    post_count = models.CounterField('post_set')
+
+    def __unicode__(self):
+        return self.title
+
+
+class Post(models.Model):
+    thread = models.ForeignKey(Thread)
+    body = models.CharField(max_length=20)
@@ -0,0 +1,113 @@
+from __future__ import absolute_import
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .models import Forum, Thread, Post
+
+
+class CounterFieldTests(TestCase):
+    def setUp(self):
+        self.forum = Forum.objects.create(name='django')
+        self.other = Forum.objects.create(name='python')
+
+    def assertCount(self, obj, field, value):
+        obj = obj.__class__._base_manager.get(pk=obj.pk)
+        self.assertEqual(getattr(obj, field), value)
+
+    def test_default(self):
+        self.assertEqual(self.forum.thread_count, 0)
+
+    def test_save(self):
+        Thread.objects.create(forum=self.forum, title='a')
+        Thread.objects.create(forum=self.forum, title='b')
+        Thread.objects.create(forum=None, title='c')
+        self.assertCount(self.forum, 'thread_count', 2)
+        self.assertCount(self.other, 'thread_count', 0)
+
+    def test_save_moves_count(self):
+        thread = Thread.objects.create(forum=self.forum, title='a')
+        thread.forum = self.other
+        thread.save()
+        self.assertCount(self.forum, 'thread_count', 0)
+        self.assertCount(self.other, 'thread_count', 1)
+        thread.title = 'b'
+        thread.save()
+        self.assertCount(self.other, 'thread_count', 1)
+
+    def test_save_without_moves(self):
+        thread = Thread.objects.create(forum=self.forum, title='a')
+        thread = Thread.objects.get(pk=thread.pk)
+        thread.title = 'b'
+        # The stored foreign keys are only read when they changed.
+        self.assertNumQueries(2, thread.save)
+        thread.forum = self.other
+        self.assertNumQueries(5, thread.save)
+        thread.title = 'c'
+        self.assertNumQueries(2, thread.save)
+        self.assertCount(self.forum, 'thread_count', 0)
+        self.assertCount(self.other, 'thread_count', 1)
+        # Instances which weren't loaded from the database are checked.
+        Thread(pk=thread.pk, forum=self.forum, title='d').save()
+        self.assertCount(self.forum, 'thread_count', 1)
+        self.assertCount(self.other, 'thread_count', 0)
+
+    def test_related_manager(self):
+        thread = Thread.objects.create(title='a')
+        self.forum.threads.add(thread)
+        self.assertCount(self.forum, 'thread_count', 1)
+        self.forum.threads.remove(thread)
+        self.assertCount(self.forum, 'thread_count', 0)
+        self.forum.threads.create(title='b')
+        self.forum.threads.create(title='c')
+        self.assertCount(self.forum, 'thread_count', 2)
+        self.forum.threads.clear()
+        self.assertCount(self.forum, 'thread_count', 0)
+
+    def test_bulk_create(self):
+        Thread.objects.bulk_create([
+            Thread(forum=self.forum, title='a'),
+            Thread(forum=self.forum, title='b'),
+            Thread(forum=self.other, title='c'),
+        ])
+        self.assertCount(self.forum, 'thread_count', 2)
+        self.assertCount(self.other, 'thread_count', 1)
+
+    def test_delete(self):
+        thread = Thread.objects.create(forum=self.forum, title='a')
+        Thread.objects.create(forum=self.forum, title='b')
+        Thread.objects.create(forum=self.other, title='c')
+        thread.delete()
+        self.assertCount(self.forum, 'thread_count', 1)
+        Thread.objects.all().delete()
+        self.assertCount(self.forum, 'thread_count', 0)
+        self.assertCount(self.other, 'thread_count', 0)
+
+    def test_cascade(self):
+        thread = Thread.objects.create(forum=self.forum, title='a')
+        Post.objects.create(thread=thread, body='x')
+        Post.objects.create(thread=thread, body='y')
+        self.assertCount(thread, 'post_count', 2)
+        # SET_NULL on the forum's threads also moves them out of the count.
+        self.forum.delete()
+        self.assertCount(thread, 'post_count', 2)
+        self.assertEqual(Thread.objects.get(pk=thread.pk).forum, None)
+        thread.delete()
+        self.assertEqual(Post.objects.count(), 0)
+
+    def test_set_null(self):
+        Thread.objects.create(forum=self.forum, title='a')
+        Forum.objects.filter(pk=self.forum.pk).delete()
+        self.assertEqual(Thread.objects.filter(forum__isnull=True).count(), 1)
+
+    def test_rebuild_counters(self):
+        Thread.objects.create(forum=self.forum, title='a')
+        Thread.objects.create(forum=self.forum, title='b')
+        Thread.objects.create(forum=self.other, title='c')
+        Forum.objects.update(thread_count=42)
+        call_command('rebuild_counters', 'counters.Forum', verbosity=0)
+        self.assertCount(self.forum, 'thread_count', 2)
+        self.assertCount(self.other, 'thread_count', 1)
+        Forum.objects.update(thread_count=42)
+        call_command('rebuild_counters', verbosity=0)
+        self.assertCount(self.forum, 'thread_count', 2)
@@ -100,6 +100,7 @@ class Store(models.Model):
 
     def natural_key(self):
         return (self.name,)
+    natural_key.fields = ['name']
 
 
 class Person(models.Model):
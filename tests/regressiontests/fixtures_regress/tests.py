@@ -4,19 +4,25 @@ from __future__ import absolute_import
 
 import os
 import re
+import shutil
+import tempfile
 try:
     from cStringIO import StringIO
 except ImportError:
     from StringIO import StringIO
 
-from django.core import management
+from django.core import management, serializers
 from django.core.management.base import CommandError
-from django.core.management.commands.dumpdata import sort_dependencies
-from django.db import transaction
+from django.core.management.commands import loaddata
+from django.core.serializers.base import DeserializedObject
+from django.core.management.commands.dumpdata import (sort_dependencies,
+    sort_dependency_levels)
+from django.db import connection, transaction
 from django.db.models import signals
 from django.test import (TestCase, TransactionTestCase, skipIfDBFeature,
     skipUnlessDBFeature)
 from django.test.utils import override_settings
+from django.utils import unittest
 
 from .models import (Animal, Stuff, Absolute, Parent, Child, Article, Widget,
     Store, Person, Book, NKChild, RefToNKChild, Circle1, Circle2, Circle3,
@@ -527,6 +533,46 @@ class NaturalKeyFixtureTests(TestCase):
             """[{"pk": 2, "model": "fixtures_regress.store", "fields": {"name": "Amazon"}}, {"pk": 3, "model": "fixtures_regress.store", "fields": {"name": "Borders"}}, {"pk": 4, "model": "fixtures_regress.person", "fields": {"name": "Neal Stephenson"}}, {"pk": 1, "model": "fixtures_regress.book", "fields": {"stores": [["Amazon"], ["Borders"]], "name": "Cryptonomicon", "author": ["Neal Stephenson"]}}]"""
         )
 
+    def test_nk_batched_lookups(self):
+        """
+        Natural keys are resolved in batches: one query per model declaring
+        its natural key fields, and one query per distinct key otherwise.
+        """
+        Person.objects.create(name="Neal Stephenson")
+        Person.objects.create(name="Stephen King")
+        for name in ("Amazon", "Borders", "Barnes"):
+            Store.objects.create(name=name)
+        data = """[
+            {"pk": 1, "model": "fixtures_regress.book", "fields": {"name": "Cryptonomicon", "author": ["Neal Stephenson"], "stores": [["Amazon"], ["Borders"]]}},
+            {"pk": 2, "model": "fixtures_regress.book", "fields": {"name": "Anathem", "author": ["Neal Stephenson"], "stores": [["Amazon"], ["Barnes"]]}},
+            {"pk": 3, "model": "fixtures_regress.book", "fields": {"name": "It", "author": ["Stephen King"], "stores": []}}
+        ]"""
+        with self.assertNumQueries(3):
+            objects = list(serializers.deserialize('json', data))
+        for obj in objects:
+            obj.save()
+        self.assertQuerysetEqual(Book.objects.all(), [
+            '<Book: Anathem by Neal Stephenson (available at Amazon, Barnes)>',
+            '<Book: Cryptonomicon by Neal Stephenson (available at Amazon, Borders)>',
+            '<Book: It by Stephen King (available at )>',
+        ])
+
+    def test_nk_forward_reference_in_same_fixture(self):
+        """
+        Objects can refer to objects earlier in the same fixture by natural
+        key, as long as each object is saved before the next one is read.
+        """
+        data = """[
+            {"pk": 1, "model": "fixtures_regress.store", "fields": {"name": "Amazon"}},
+            {"pk": 1, "model": "fixtures_regress.person", "fields": {"name": "Neal Stephenson"}},
+            {"pk": 1, "model": "fixtures_regress.book", "fields": {"name": "Cryptonomicon", "author": ["Neal Stephenson"], "stores": [["Amazon"]]}}
+        ]"""
+        for obj in serializers.deserialize('json', data):
+            obj.save()
+        self.assertQuerysetEqual(Book.objects.all(), [
+            '<Book: Cryptonomicon by Neal Stephenson (available at Amazon)>',
+        ])
+
     def test_dependency_sorting(self):
         """
         Now lets check the dependency sorting explicitly
@@ -637,6 +683,22 @@ class NaturalKeyFixtureTests(TestCase):
             [Person, Book, ExternalDependency]
         )
 
+    def test_dependency_levels(self):
+        """
+        Models only depend on models of earlier levels, so the models of a
+        level can be loaded concurrently.
+        """
+        self.assertEqual(
+            sort_dependency_levels([Book, Person, Store, Circle3]),
+            [[[Store], [Circle3]], [[Person]], [[Book]]]
+        )
+
+    def test_dependency_levels_circular(self):
+        self.assertEqual(
+            sort_dependency_levels([Book, Circle1, Store, Circle2]),
+            [[[Store]], [[Book]], [[Circle1, Circle2]]]
+        )
+
     def test_normal_pk(self):
         """
         Check that normal primary keys still work
@@ -666,6 +728,109 @@ class NaturalKeyFixtureTests(TestCase):
             """[<Book: Cryptonomicon by Neal Stephenson (available at Amazon, Borders)>, <Book: Ender's Game by Orson Scott Card (available at Collins Bookstore)>, <Book: Permutation City by Greg Egan (available at Angus and Robertson)>]"""
         )
 
+    def test_parallel_natural_keys(self):
+        """
+        Natural keys are looked up when --parallel falls back to saving the
+        objects as they're read.
+        """
+        management.call_command('loaddata', 'forward_ref_lookup.json',
+            parallel=2, verbosity=0, commit=False)
+        self.assertEqual(Book.objects.get().author.name, 'Neal Stephenson')
+
+    @unittest.skipIf(connection.vendor == 'sqlite',
+                     "SQLite doesn't load fixtures in parallel")
+    def test_parallel_refuses_natural_keys(self):
+        """
+        Natural keys can't be used with --parallel, since the objects they
+        refer to aren't saved until every fixture has been read.
+        """
+        stderr = StringIO()
+        management.call_command('loaddata', 'forward_ref_lookup.json',
+            parallel=2, verbosity=0, stderr=stderr)
+        self.assertTrue("Natural keys can't be looked up" in stderr.getvalue())
+        self.assertEqual(Book.objects.count(), 0)
+
+
+class FixtureCacheTests(TestCase):
+    def setUp(self):
+        self.old_cache = loaddata.fixture_cache
+        self.cache = loaddata.fixture_cache = loaddata.FixtureCache()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        loaddata.fixture_cache = self.old_cache
+        shutil.rmtree(self.tmpdir)
+
+    def write_fixture(self, name):
+        path = os.path.join(self.tmpdir, 'thingy.json')
+        with open(path, 'w') as f:
+            f.write('[{"pk": 1, "model": "fixtures_regress.thingy", '
+                    '"fields": {"name": "%s"}}]' % name)
+        return path
+
+    def test_fixture_cache(self):
+        path = self.write_fixture('Whatchamacallit')
+        management.call_command('loaddata', path, verbosity=0, commit=False)
+        self.assertNotEqual(self.cache.get(path, 'json'), None)
+
+        # The cached objects are loaded again.
+        Thingy.objects.all().delete()
+        management.call_command('loaddata', path, verbosity=0, commit=False)
+        self.assertQuerysetEqual(Thingy.objects.all(), ['Whatchamacallit'],
+            lambda t: t.name)
+
+        # Changing the file invalidates the cache.
+        self.write_fixture('Thingamajig')
+        management.call_command('loaddata', path, verbosity=0, commit=False)
+        self.assertQuerysetEqual(Thingy.objects.all(), ['Thingamajig'],
+            lambda t: t.name)
+        self.assertEqual([obj.object.name for obj in self.cache.get(path, 'json')],
+            ['Thingamajig'])
+
+    def test_natural_keys_not_cached(self):
+        """
+        Fixtures that need database lookups to be deserialized aren't cached.
+        """
+        management.call_command('loaddata', 'forward_ref_lookup.json',
+            verbosity=0, commit=False)
+        self.assertEqual(self.cache.fixtures, {})
+        self.assertEqual(Book.objects.get().author.name, 'Neal Stephenson')
+
+    def test_resolved_natural_keys_not_cached(self):
+        """
+        Objects whose natural keys were resolved aren't cached, whichever
+        database the deserializer looked them up in.
+        """
+        path = self.write_fixture('Whatchamacallit')
+        objects = [DeserializedObject(Thingy(name='Whatchamacallit')),
+                   DeserializedObject(Thingy(name='Thingamajig'),
+                                      resolved_natural_keys=True)]
+        self.assertEqual(list(self.cache.record(path, 'json', objects)), objects)
+        self.assertEqual(self.cache.fixtures, {})
+
+    def test_xml_natural_keys_not_cached(self):
+        management.call_command('loaddata', 'forward_ref_lookup.xml',
+            verbosity=0, commit=False)
+        self.assertEqual(self.cache.fixtures, {})
+        self.assertEqual(Book.objects.get().author.name, 'Neal Stephenson')
+
+
+class ParallelLoadingTests(TransactionTestCase):
+
+    @unittest.skipIf(connection.vendor == 'sqlite',
+                     "SQLite doesn't load fixtures in parallel")
+    def test_failed_load_is_undone(self):
+        """
+        The rows committed by the other connections are deleted when loading
+        fails.
+        """
+        stderr = StringIO()
+        management.call_command('loaddata', 'forward_ref_bad_data.json',
+            parallel=2, verbosity=0, stderr=stderr)
+        self.assertTrue(stderr.getvalue().startswith('Problem installing fixture'))
+        self.assertEqual(Person.objects.count(), 0)
+        self.assertEqual(Book.objects.count(), 0)
+
 
 class TestTicket11101(TransactionTestCase):
 
@@ -0,0 +1,17 @@
+from django.db import models
+from django.db.sharding import ShardedManager
+
+
+class Order(models.Model):
+    tenant_id = models.IntegerField()
+    name = models.CharField(max_length=20)
+    amount = models.IntegerField()
+
+    objects = ShardedManager()
+
+    class Meta:
+        shard_key = 'tenant_id'
+        ordering = ('name',)
+
+    def __unicode__(self):
+        return self.name
@@ -0,0 +1,151 @@
+from __future__ import absolute_import
+
+import threading
+
+from django.db import router
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.sharding import ShardRouter, scatter, shard_for_key
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from .models import Order
+
+
+@override_settings(DATABASE_SHARDS=['default', 'other'])
+class ShardingTests(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        self.old_routers = router.routers
+        router.routers = [ShardRouter()]
+        # Tenants 1 and 2 live on 'other', 4 and 5 on 'default'. Primary
+        # keys must be unique across shards.
+        for pk, (tenant_id, name, amount) in enumerate([
+                (1, 'a', 10), (4, 'b', 20), (2, 'c', 30), (5, 'd', 40),
+                (1, 'e', 50)]):
+            Order.objects.create(id=pk + 1, tenant_id=tenant_id, name=name,
+                                 amount=amount)
+        self.orders = Order.objects.all()
+
+    def tearDown(self):
+        router.routers = self.old_routers
+
+    def test_shard_for_key(self):
+        self.assertEqual(shard_for_key(1), 'other')
+        self.assertEqual(shard_for_key('1'), 'other')
+        self.assertEqual(shard_for_key(4), 'default')
+
+    def test_routing(self):
+        self.assertEqual(Order.objects.using('other').count(), 3)
+        self.assertEqual(Order.objects.using('default').count(), 2)
+        order = self.orders.get(name='b')
+        self.assertEqual(order._state.db, 'default')
+
+    def test_filter_on_shard_key(self):
+        qs = self.orders.filter(tenant_id=1)
+        self.assertEqual(qs.db, 'other')
+        self.assertQuerysetEqual(qs, ['a', 'e'], lambda o: o.name)
+        qs = self.orders.filter(tenant_id__in=[4, 5])
+        self.assertEqual(qs.db, 'default')
+        self.assertQuerysetEqual(qs, ['b', 'd'], lambda o: o.name)
+        qs = self.orders.filter(tenant_id__in=[1, 4])
+        with self.assertNumQueries(1, using='default'):
+            with self.assertNumQueries(1, using='other'):
+                self.assertQuerysetEqual(qs, ['a', 'b', 'e'], lambda o: o.name)
+        self.assertQuerysetEqual(self.orders.filter(tenant_id__in=[]), [])
+
+    def test_scatter_gather(self):
+        self.assertQuerysetEqual(self.orders.all(),
+            ['a', 'b', 'c', 'd', 'e'], lambda o: o.name)
+        self.assertQuerysetEqual(self.orders.order_by('-amount'),
+            ['e', 'd', 'c', 'b', 'a'], lambda o: o.name)
+        self.assertQuerysetEqual(self.orders.order_by('tenant_id', '-name'),
+            ['e', 'a', 'c', 'b', 'd'], lambda o: o.name)
+        self.assertQuerysetEqual(self.orders.reverse(),
+            ['e', 'd', 'c', 'b', 'a'], lambda o: o.name)
+
+    def test_slicing(self):
+        self.assertQuerysetEqual(self.orders.all()[1:3],
+            ['b', 'c'], lambda o: o.name)
+        self.assertQuerysetEqual(self.orders.all()[3:],
+            ['d', 'e'], lambda o: o.name)
+        self.assertEqual(self.orders.order_by('-amount')[0].name, 'e')
+        self.assertEqual(self.orders.filter(amount__gt=15).count(), 4)
+        self.assertEqual(self.orders.all()[1:3].count(), 2)
+        self.assertEqual(self.orders.all()[4:].count(), 1)
+
+    def test_values(self):
+        self.assertEqual(list(self.orders.values('name', 'amount')[:2]),
+            [{'name': 'a', 'amount': 10}, {'name': 'b', 'amount': 20}])
+        self.assertEqual(list(self.orders.values_list('amount', flat=True)
+                              .order_by('-amount')),
+            [50, 40, 30, 20, 10])
+        self.assertEqual(list(self.orders.values_list('tenant_id', flat=True)
+                              .order_by('tenant_id').distinct()),
+            [1, 2, 4, 5])
+        with self.assertRaises(NotImplementedError):
+            list(self.orders.values_list('name').order_by('amount'))
+
+    def test_aggregate(self):
+        self.assertEqual(self.orders.count(), 5)
+        self.assertEqual(self.orders.aggregate(Sum('amount'), Count('id'),
+                                               Min('amount'), Max('amount')),
+            {'amount__sum': 150, 'id__count': 5,
+             'amount__min': 10, 'amount__max': 50})
+        self.assertEqual(self.orders.filter(amount__gt=100).aggregate(
+            Sum('amount'), Count('id')),
+            {'amount__sum': None, 'id__count': 0})
+        with self.assertRaises(NotImplementedError):
+            self.orders.aggregate(Avg('amount'))
+        with self.assertRaises(NotImplementedError):
+            self.orders.aggregate(Count('tenant_id', distinct=True))
+
+    def test_in_bulk(self):
+        objects = self.orders.in_bulk([1, 2, 3, 4, 5, 6])
+        self.assertEqual(len(objects), 5)
+        self.assertEqual(sorted(o.name for o in objects.values()),
+                         ['a', 'b', 'c', 'd', 'e'])
+
+    def test_exists_update_delete(self):
+        self.assertTrue(self.orders.filter(name='d').exists())
+        self.assertFalse(self.orders.filter(name='z').exists())
+        self.assertEqual(self.orders.filter(amount__lt=35).update(amount=0), 3)
+        self.assertEqual(self.orders.filter(amount=0).count(), 3)
+        self.orders.filter(amount=0).delete()
+        self.assertQuerysetEqual(self.orders.all(), ['d', 'e'], lambda o: o.name)
+
+    def test_get_or_create(self):
+        order, created = self.orders.get_or_create(tenant_id=2, name='f',
+                                                   defaults={'amount': 5})
+        self.assertTrue(created)
+        self.assertEqual(order._state.db, 'other')
+        order, created = self.orders.get_or_create(tenant_id=2, name='f',
+                                                   defaults={'amount': 5})
+        self.assertFalse(created)
+        self.assertRaises(ValueError, self.orders.get_or_create, name='g')
+
+    def test_parallel_in_transaction(self):
+        # The shards are queried in the calling thread, whose transaction
+        # holds the orders.
+        orders = Order.objects.parallel()
+        self.assertEqual(orders.count(), 5)
+        self.assertQuerysetEqual(orders.order_by('-amount'),
+            ['e', 'd', 'c', 'b', 'a'], lambda o: o.name)
+
+    def test_scatter(self):
+        class FakeQuerySet(object):
+            db = 'default'
+
+            def __init__(self, value):
+                self.value = value
+
+        def func(qs):
+            return qs.value, threading.current_thread().name
+        results = scatter(func, [FakeQuerySet(1), FakeQuerySet(2)])
+        self.assertEqual([value for value, thread in results], [1, 2])
+        self.assertNotEqual(results[0][1], results[1][1])
+
+        def fail(qs):
+            raise ValueError(qs.value)
+        self.assertRaises(ValueError, scatter, fail,
+                          [FakeQuerySet(1), FakeQuerySet(2)])
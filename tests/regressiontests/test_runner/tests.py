@@ -3,7 +3,14 @@ Tests for django test runner
 """
 from __future__ import absolute_import
 
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
 from optparse import make_option
+from StringIO import StringIO
 
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management import call_command
@@ -285,6 +292,198 @@ class Sqlite3InMemoryTestDbs(unittest.TestCase):
                 db.connections = old_db_connections
 
 
+class TestDatabaseReuseTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_name = os.path.join(self.tmpdir, 'test.db')
+        self.connection = db.ConnectionHandler({
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': self.db_name,
+            },
+        })['default']
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_fingerprint(self):
+        """
+        The schema fingerprint only depends on the installed models.
+        """
+        fingerprint = connection.creation.test_db_fingerprint()
+        self.assertEqual(len(fingerprint), 40)
+        self.assertEqual(self.connection.creation.test_db_fingerprint(), fingerprint)
+
+    def test_stored_fingerprint(self):
+        creation = self.connection.creation
+        self.assertIsNone(creation._get_test_db_fingerprint(self.db_name))
+        creation._set_test_db_fingerprint('f' * 40)
+        self.connection.close()
+        self.assertEqual(creation._get_test_db_fingerprint(self.db_name), 'f' * 40)
+        self.assertIsNone(creation._get_test_db_fingerprint(
+            os.path.join(self.tmpdir, 'other.db')))
+
+    def test_outdated_test_db_notice(self):
+        """
+        Recreating a kept test database whose models changed is reported.
+        """
+        class Recreated(Exception):
+            pass
+
+        def _create_test_db(verbosity, autoclobber):
+            raise Recreated
+
+        self.connection.settings_dict['TEST_NAME'] = self.db_name
+        creation = self.connection.creation
+        creation._set_test_db_fingerprint('f' * 40)
+        self.connection.close()
+        creation.test_db_fingerprint = lambda: 'e' * 40
+        creation._create_test_db = _create_test_db
+        old_stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.assertRaises(Recreated, creation.create_test_db, 1, keepdb=True)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = old_stdout
+        self.assertIn("The models have changed since the test database for "
+                      "alias 'default' was kept.", output)
+
+    def test_template_mode(self):
+        """
+        In template mode, the tests run on a copy of the kept test database.
+        """
+        def create_test_db(verbosity=1, autoclobber=False, keepdb=False):
+            self.assertTrue(keepdb)
+            self.connection.settings_dict['NAME'] = self.db_name
+            cursor = self.connection.cursor()
+            cursor.execute("CREATE TABLE template_test (value integer)")
+            self.connection._commit()
+            return self.db_name
+
+        self.connection.creation.create_test_db = create_test_db
+        old_db_connections = db.connections
+        db.connections = db.ConnectionHandler({'default': self.connection.settings_dict})
+        db.connections['default'] = self.connection
+        try:
+            runner = DjangoTestSuiteRunner(verbosity=0, interactive=False,
+                                           template=True)
+            old_config = runner.setup_databases()
+            copy_name = os.path.join(self.tmpdir, 'test_copy.db')
+            self.assertEqual(self.connection.settings_dict['NAME'], copy_name)
+            cursor = self.connection.cursor()
+            cursor.execute("INSERT INTO template_test (value) VALUES (42)")
+            self.connection._commit()
+            runner.teardown_databases(old_config)
+        finally:
+            db.connections = old_db_connections
+        self.assertFalse(os.path.exists(copy_name))
+        self.assertEqual(self.connection.settings_dict['NAME'], self.db_name)
+        kept = sqlite3.connect(self.db_name)
+        try:
+            self.assertEqual(kept.execute("SELECT value FROM template_test").fetchall(), [])
+        finally:
+            kept.close()
+
+    def test_clone_test_db(self):
+        self.assertTrue(self.connection.features.can_clone_databases)
+        cursor = self.connection.cursor()
+        cursor.execute("CREATE TABLE clone_test (value integer)")
+        cursor.execute("INSERT INTO clone_test (value) VALUES (42)")
+        self.connection._commit()
+
+        creation = self.connection.creation
+        settings_dict = creation.clone_test_db('1', verbosity=0)
+        self.assertEqual(settings_dict['NAME'], os.path.join(self.tmpdir, 'test_1.db'))
+        clone = sqlite3.connect(settings_dict['NAME'])
+        try:
+            self.assertEqual(clone.execute("SELECT value FROM clone_test").fetchall(), [(42,)])
+        finally:
+            clone.close()
+
+        creation.destroy_test_db_clone('1', verbosity=0)
+        self.assertFalse(os.path.exists(settings_dict['NAME']))
+
+    def test_clone_in_memory_test_db(self):
+        connection = db.ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+        })['default']
+        self.assertRaises(NotImplementedError, connection.creation.clone_test_db,
+                          '1', verbosity=0)
+
+
+class ParallelTestSuiteTests(unittest.TestCase):
+    def get_suite(self):
+        class Passing(unittest.TestCase):
+            def test_one(self):
+                pass
+
+            def test_two(self):
+                pass
+
+        class Failing(unittest.TestCase):
+            def test_failure(self):
+                self.fail("boom")
+
+            def test_error(self):
+                raise ValueError("bang")
+
+            @unittest.skip("not now")
+            def test_skip(self):
+                pass
+
+        class BrokenSetUp(unittest.TestCase):
+            @classmethod
+            def setUpClass(cls):
+                raise ValueError("no setup")
+
+            def test_never_run(self):
+                pass
+
+        loader = unittest.TestLoader()
+        return unittest.TestSuite([
+            loader.loadTestsFromTestCase(Passing),
+            loader.loadTestsFromTestCase(Failing),
+            loader.loadTestsFromTestCase(BrokenSetUp),
+        ])
+
+    def test_partition_suite_by_case(self):
+        subsuites = simple.partition_suite_by_case(self.get_suite())
+        self.assertEqual([subsuite.countTestCases() for subsuite in subsuites],
+                         [2, 3, 1])
+
+    def test_clone_slots(self):
+        """
+        Workers get the slots of workers which no longer exist, and never
+        those of running ones.
+        """
+        process = multiprocessing.Process(target=int)
+        process.start()
+        process.join()
+        owners = multiprocessing.Array('i', [os.getppid(), process.pid, 0])
+        self.assertEqual(simple._take_clone_slot(owners), 2)
+        self.assertEqual(simple._take_clone_slot(owners), 3)
+        self.assertEqual(list(owners), [os.getppid(), os.getpid(), os.getpid()])
+        self.assertRaises(RuntimeError, simple._take_clone_slot, owners)
+
+    def test_results_are_replayed(self):
+        suite = self.get_suite()
+        tests = list(simple.iter_tests(suite))
+        result = simple.ReplayTextTestResult(StringIO(), True, 0)
+        simple.ParallelTestSuite(suite, 2, {}).run(result)
+
+        self.assertEqual(result.testsRun, 5)
+        self.assertEqual([test for test, tb in result.failures], [tests[3]])
+        self.assertIn("boom", result.failures[0][1])
+        self.assertEqual(len(result.errors), 2)
+        errors = dict((str(test), tb) for test, tb in result.errors)
+        self.assertIn("bang", errors[str(tests[2])])
+        self.assertIn("no setup", [tb for test, tb in result.errors
+                                   if test not in tests][0])
+        self.assertEqual(result.skipped, [(tests[4], "not now")])
+
+
 class AutoIncrementResetTest(TransactionTestCase):
     """
     Here we test creating the same model two times in different test methods,
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import threading
+
+from django.db import connection, transaction
 from django.forms import EmailField, IntegerField
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 from django.test import SimpleTestCase, TestCase, skipUnlessDBFeature
+from django.test.testcases import real_commit
+from django.utils import unittest
 from django.utils.unittest import skip
 
 from .models import Person
@@ -463,6 +468,82 @@ class SkippingExtraTests(TestCase):
         pass
 
 
+class SetUpTestDataTests(TestCase):
+    fixtures = ['person.json']
+    setup_calls = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.setup_calls += 1
+        cls.person = Person.objects.create(name='Jerry Lee Lewis')
+
+    def test_1_modify_data(self):
+        self.person.name = 'Little Richard'
+        self.person.save()
+        Person.objects.filter(pk=1).delete()
+        Person.objects.create(name='Chuck Berry')
+        self.assertEqual(Person.objects.count(), 2)
+
+    def test_2_data_restored(self):
+        self.assertEqual(self.person.name, 'Jerry Lee Lewis')
+        self.assertQuerysetEqual(Person.objects.order_by('pk'),
+            ['Buddy Holly', 'Jerry Lee Lewis'], lambda p: p.name)
+
+    def test_3_data_copied(self):
+        "Each test gets its own copy of the objects created by setUpTestData."
+        self.assertIsNot(self.person, self.__class__.person)
+        self.assertEqual(self.person, self.__class__.person)
+
+    def test_setup_test_data_called_once(self):
+        if connection.features.uses_savepoints:
+            self.assertEqual(self.setup_calls, 1)
+
+
+class ClassTransactionTests(SimpleTestCase):
+
+    def test_failing_setup_class(self):
+        "A failing setUpClass() doesn't leave a transaction open."
+        class FailingSetUpClassTests(TestCase):
+            @classmethod
+            def setUpClass(cls):
+                super(FailingSetUpClassTests, cls).setUpClass()
+                raise ValueError
+
+            def test_nothing(self):
+                pass
+
+        result = unittest.TestResult()
+        unittest.TestSuite([FailingSetUpClassTests('test_nothing')]).run(result)
+        self.assertEqual(len(result.errors), 1)
+        self.assertFalse(FailingSetUpClassTests._class_transaction)
+        self.assertIs(transaction.commit, real_commit)
+        self.assertFalse(transaction.is_managed())
+
+    def test_uncopyable_test_data(self):
+        "Test data which can't be copied for each test is an error."
+        class UncopyableTestDataTests(TestCase):
+            class_transactions = []
+
+            @classmethod
+            def setUpTestData(cls):
+                cls.class_transactions.append(cls._class_transaction)
+                cls.lock = threading.Lock()
+
+            def test_nothing(self):
+                pass
+
+        result = unittest.TestResult()
+        unittest.TestSuite([UncopyableTestDataTests('test_nothing')]).run(result)
+        if UncopyableTestDataTests.class_transactions == [True]:
+            self.assertEqual(len(result.errors), 1)
+            self.assertIn('TypeError', result.errors[0][1])
+        else:
+            # The data is set up again for each test, and isn't copied.
+            self.assertEqual(len(result.errors), 0)
+        self.assertFalse(UncopyableTestDataTests._class_transaction)
+        self.assertFalse(transaction.is_managed())
+
+
 class AssertRaisesMsgTest(SimpleTestCase):
 
     def test_special_re_chars(self):